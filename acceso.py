@@ -0,0 +1,486 @@
+import time
+import threading
+from collections import Counter, deque
+
+import cv2
+import numpy as np
+
+from backends_modelo import cargar_modelo
+from calidad import calidad_roi
+from metricas import registro
+from ocr import crear_backend_ocr, filtrar_patentes
+from seguimiento import SeguidorIoU
+from movimiento import DetectorMovimiento
+from configuracion import (
+    MODELO_PLACAS_PATH, MODELO_VEHICULOS_PATH,
+    CONFIDENCE_THRESHOLD_PLACAS, CONFIDENCE_THRESHOLD_VEHICLE,
+    NOMBRES_VEHICULOS, CLASES_VEHICULOS_ACCESO, CONFIRMATION_THRESHOLD,
+    CONFIRMATION_THRESHOLD_REGISTRADA, AUTORIZACION_PUNTAJE_TEMPRANO,
+    VIDEO_DISPLAY_SIZE, COOLDOWN_SECONDS, PLATE_BATCH_IMGSZ, OCR_BACKEND,
+    MOTION_GATING, MOTION_HEARTBEAT_FRAMES,
+    CALIDAD_OCR, CALIDAD_MINIMA, CALIDAD_VENTANA_FRAMES, OCR_TOP_K,
+    ZONE_CROP_INFERENCE, ZONE_CROP_PADDING_PX, VEHICLE_INFER_SIZE
+)
+
+
+class AnilloFrames:
+    """
+    Buffer circular de frames preasignado entre etapas del pipeline (un productor, varios lectores).
+    El productor escribe directo sobre un slot (p. ej. `cap.read(slot)`) y lo publica; los lectores
+    toman prestado el frame más reciente, sin copiarlo, y lo devuelven al terminar. Un slot prestado
+    no se reescribe; los frames publicados que nadie llegó a tomar se pisan (siempre gana el último).
+    """
+    def __init__(self, slots):
+        self.n = slots
+        self._buffer = None            # ndarray (n, alto, ancho, canales); se asigna con la primera forma
+        self._secuencias = [0] * slots  # Secuencia del frame en cada slot (0 = vacío o en escritura)
+        self._prestados = Counter()     # secuencia -> lectores que la tienen tomada
+        self._cond = threading.Condition()
+        self.secuencia = 0
+        self.tomados = 0                # Frames distintos que algún lector llegó a ver
+        self._ultimo_tomado = 0
+        self.asignaciones = 0           # Veces que se (re)asignó el buffer: debería quedar en 1
+
+    @property
+    def descartados(self):
+        return self.secuencia - self.tomados
+
+    @property
+    def pendientes(self):
+        """Frames publicados que todavía ningún lector tomó (profundidad efectiva de la cola)."""
+        return sum(1 for s in self._secuencias if s > self._ultimo_tomado)
+
+    def _asignar(self, forma):
+        self._buffer = np.empty((self.n,) + tuple(forma), dtype=np.uint8)
+        self._secuencias = [0] * self.n
+        self.asignaciones += 1
+
+    def escribir(self, forma=None):
+        """
+        Reserva el slot más viejo que nadie tiene prestado y devuelve (indice, slot) para escribir en él.
+        `forma` (alto, ancho, canales) asigna o reasigna el buffer si aún no la tiene.
+        """
+        with self._cond:
+            if forma is not None and (self._buffer is None or self._buffer.shape[1:] != tuple(forma)):
+                self._asignar(forma)
+            libres = lambda: [i for i in range(self.n) if self._secuencias[i] not in self._prestados]
+            self._cond.wait_for(libres)
+            i = min(libres(), key=lambda k: self._secuencias[k])
+            self._secuencias[i] = 0
+            return i, (self._buffer[i] if self._buffer is not None else None)
+
+    def publicar(self, indice, frame):
+        """
+        Publica el slot `indice`. Si `frame` no es el propio slot (OpenCV asignó otro array porque la
+        forma cambió, o no había buffer), se reasigna el anillo con la nueva forma y se copia una vez.
+        """
+        with self._cond:
+            if self._buffer is None or not np.may_share_memory(frame, self._buffer[indice]):
+                if self._buffer is None or self._buffer.shape[1:] != frame.shape:
+                    self._asignar(frame.shape)
+                self._buffer[indice] = frame
+            self.secuencia += 1
+            self._secuencias[indice] = self.secuencia
+            self._cond.notify_all()
+
+    def tomar(self, despues_de=0, timeout=None):
+        """
+        Presta el frame más reciente con secuencia mayor a `despues_de`, como (secuencia, frame).
+        Espera hasta `timeout` segundos (0 = no espera); devuelve None si no hay uno nuevo.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: max(self._secuencias) > despues_de, timeout):
+                return None
+            i = max(range(self.n), key=lambda k: self._secuencias[k])
+            secuencia = self._secuencias[i]
+            self._prestados[secuencia] += 1
+            if secuencia > self._ultimo_tomado:
+                self._ultimo_tomado = secuencia
+                self.tomados += 1
+            return secuencia, self._buffer[i]
+
+    def devolver(self, secuencia):
+        with self._cond:
+            self._prestados[secuencia] -= 1
+            if self._prestados[secuencia] <= 0: del self._prestados[secuencia]
+            self._cond.notify_all()
+
+    def clear(self):
+        """Olvida los frames publicados (los prestados siguen siendo válidos hasta devolverse)."""
+        with self._cond:
+            self._secuencias = [s if s in self._prestados else 0 for s in self._secuencias]
+
+
+
+def letterbox(img, size, color=(114, 114, 114)):
+    """
+    Escala `img` manteniendo su proporción y la centra en un lienzo de size x size.
+    Devuelve (lienzo, escala, (pad_x, pad_y)) para poder deshacer la transformación.
+    """
+    h, w = img.shape[:2]
+    escala = min(size / w, size / h)
+    nw, nh = max(1, round(w * escala)), max(1, round(h * escala))
+    redimensionada = cv2.resize(img, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    pad_x, pad_y = (size - nw) // 2, (size - nh) // 2
+    lienzo = np.full((size, size, 3), color, dtype=img.dtype)
+    lienzo[pad_y:pad_y + nh, pad_x:pad_x + nw] = redimensionada
+    return lienzo, escala, (pad_x, pad_y)
+
+
+class ProcesadorAcceso:
+    """
+    Lógica de detección de la pestaña de acceso, sin dependencias de Qt.
+    Corre en el hilo de inferencia: detección de vehículos, placas, OCR y votación.
+    El cooldown de patentes se comparte con la interfaz y se protege con un lock.
+    """
+    def __init__(self, ocr_backend=None, servidor=None, indice_autorizacion=None):
+        self._cargar_modelos(servidor)
+        self._servidor = servidor
+        # Con un IndiceAutorizacion, las lecturas casi idénticas a una patente registrada se confirman antes
+        self.indice_autorizacion = indice_autorizacion
+        # `ocr_backend` puede ser una instancia de BackendOCR o el nombre de uno registrado;
+        # con un nombre, el backend (y el import de paddleocr) se crea en el primer uso o en preparar()
+        if ocr_backend is None or isinstance(ocr_backend, str):
+            self._ocr_nombre, self._ocr_backend = ocr_backend or OCR_BACKEND, None
+        else:
+            self._ocr_nombre, self._ocr_backend = ocr_backend.nombre, ocr_backend
+        self._ocr_lock = threading.Lock()
+
+        # Zona de detección, en coordenadas de pantalla (VIDEO_DISPLAY_SIZE)
+        w, h = VIDEO_DISPLAY_SIZE
+        zone_width = int(w * 0.4)
+        self.detection_zone = ((w - zone_width) // 2, 200, zone_width, (h - zone_width) // 2)
+
+        # Reloj del cooldown y del tiempo hasta confirmación (la reproducción usa el de la grabación)
+        self.reloj = time.time
+
+        # Los votos de OCR viven en cada track: dos autos en la zona no se mezclan
+        self.tracker = SeguidorIoU(reloj=lambda: self.reloj())
+        self.recent_plates = {}
+
+        self.zone_crop_inference = ZONE_CROP_INFERENCE
+
+        # Compuerta de movimiento: con la zona quieta solo corre un latido cada N frames
+        self.motion_gating = MOTION_GATING
+        self.detector_movimiento = DetectorMovimiento()
+        self.frames_omitidos = 0
+        self._frames_sin_deteccion = 0
+
+        # Compuerta de calidad: solo las mejores tomas de cada vehículo llegan al OCR
+        self.calidad_ocr = CALIDAD_OCR
+
+        # Instrumentación: callback(etapa, segundos), ROIs enviados a OCR y los que se evitaron,
+        # y por cada confirmación (segundos desde que apareció el track, lecturas de OCR usadas)
+        self.on_tiempo = None
+        self.ocr_llamadas = 0
+        self.rois_evaluados = 0
+        self.ocr_evitadas_calidad = 0
+        self.ocr_evitadas_topk = 0
+        self.confirmaciones = deque(maxlen=1000)
+        self._lock = threading.Lock()
+
+    def _cargar_modelos(self, servidor):
+        # Con un ServidorInferencia los modelos se comparten y sus llamadas se agrupan en batches
+        if servidor is not None:
+            self.model_placas = servidor.modelo("placas")
+            self.model_vehiculos = servidor.modelo("vehiculos")
+        else:
+            print("[INFO] [Acceso] Cargando modelos...")
+            self.model_placas = cargar_modelo(MODELO_PLACAS_PATH)
+            self.model_vehiculos = cargar_modelo(MODELO_VEHICULOS_PATH)
+
+    def process_frame_with_zone(self, frame_original, frame_to_annotate):
+        """
+        Procesa un frame y anota `frame_to_annotate`.
+        `frame_original` puede venir a la resolución de la fuente: la detección y los recortes
+        de placas se hacen sobre él, y las anotaciones se escalan al tamaño de `frame_to_annotate`.
+        Devuelve (patente, tipo_vehiculo, confianza) cuando una patente alcanza CONFIRMATION_THRESHOLD
+        (o CONFIRMATION_THRESHOLD_REGISTRADA si coincide con una registrada), si no None.
+        Los modelos solo se usan a través de hay_movimiento, detectar_vehiculos, recortar_placas y leer_rois,
+        que grabacion.py reemplaza para grabar y reproducir; `frame_to_annotate` puede ser None.
+        """
+        zona = self.zona_en_fuente(frame_original)
+        t0 = time.perf_counter()
+        procesar = self.debe_procesar(frame_original, zona)
+        self._medir("compuerta_movimiento", t0)
+        if not procesar:
+            return None
+
+        # 1. Reunir todos los vehículos dentro de la zona y asociarlos a sus tracks
+        t0 = time.perf_counter()
+        detecciones = self.detectar_vehiculos(frame_original, zona)
+        self._medir("deteccion_vehiculos", t0)
+        tracks = self.tracker.update(detecciones)
+
+        # Solo los tracks sin patente confirmada pasan por placas y OCR
+        pendientes = []
+        for track in tracks:
+            if frame_to_annotate is not None:
+                self.anotar_track(frame_to_annotate, frame_original.shape, track)
+            if not track.confirmado: pendientes.append(track)
+
+        # 2. Una sola llamada al modelo de placas para todos los vehículos pendientes
+        t0 = time.perf_counter()
+        rois_placa = self.recortar_placas(frame_original, [track.box for track in pendientes])
+        if pendientes: self._medir("deteccion_placas", t0)
+
+        # 3. OCR en batch sobre la primera placa de cada vehículo (o sus mejores tomas), luego votación por track
+        t0 = time.perf_counter()
+        candidatos, rois = [], []
+        for track, roi in zip(pendientes, rois_placa):
+            if roi is None: continue
+            if not self.calidad_ocr:
+                candidatos.append(track); rois.append(roi)
+                continue
+            for roi_mejor in self.seleccionar_tomas(track, roi):
+                candidatos.append(track); rois.append(roi_mejor)
+        if self.calidad_ocr: self._medir("calidad_placas", t0)
+
+        if not rois: return None
+        t0 = time.perf_counter()
+        lecturas = self.leer_rois(rois)
+        self._medir("ocr", t0)
+        self.ocr_llamadas += len(rois)
+        registro.incrementar("ocr_llamadas", len(rois))
+        for track in candidatos: track.lecturas_ocr += 1
+        t0 = time.perf_counter()
+        patentes = self.ocr_backend.postprocesar(lecturas)
+        self._medir("filtrar_patentes", t0)
+
+        for track, plate_found in zip(candidatos, patentes):
+            if not plate_found: continue
+            umbral = CONFIRMATION_THRESHOLD
+            if self.indice_autorizacion is not None:
+                coincidencia = self.indice_autorizacion.buscar(plate_found)
+                if coincidencia and coincidencia.puntaje >= AUTORIZACION_PUNTAJE_TEMPRANO:
+                    # Los votos van a la patente registrada: una confusión O/0 no reparte la votación
+                    plate_found, umbral = coincidencia.patente, CONFIRMATION_THRESHOLD_REGISTRADA
+            if self.is_recent(plate_found):
+                # Vehículo ya procesado (p. ej. el track se perdió y reapareció): no repetir OCR
+                track.patente_confirmada = plate_found
+                continue
+            track.votos[plate_found] += 1
+            if track.votos[plate_found] >= umbral:
+                track.patente_confirmada = plate_found
+                cls_id = track.cls_id
+                tipo_vehiculo = NOMBRES_VEHICULOS[cls_id] if cls_id < len(NOMBRES_VEHICULOS) else "Desconocido"
+                # Confianza de la confirmación: fracción de lecturas del track que coinciden con la patente
+                confianza = track.votos[plate_found] / sum(track.votos.values())
+                self.confirmaciones.append((self.reloj() - track.inicio, track.lecturas_ocr))
+                registro.incrementar("confirmaciones")
+                registro.observar("tiempo_confirmacion", self.confirmaciones[-1][0])
+                return plate_found, tipo_vehiculo, confianza
+        return None
+
+    def anotar_track(self, frame_to_annotate, forma_fuente, track):
+        """Dibuja la caja y el ID (y la patente, si ya se confirmó) de un track, escalados a la pantalla."""
+        ax = frame_to_annotate.shape[1] / forma_fuente[1]
+        ay = frame_to_annotate.shape[0] / forma_fuente[0]
+        x1v, y1v, x2v, y2v = track.box
+        p1, p2 = (int(x1v * ax), int(y1v * ay)), (int(x2v * ax), int(y2v * ay))
+        cv2.rectangle(frame_to_annotate, p1, p2, (0, 255, 0), 3)
+        etiqueta = f"#{track.track_id} {track.patente_confirmada}" if track.confirmado else f"#{track.track_id}"
+        cv2.putText(frame_to_annotate, etiqueta, (p1[0], max(p1[1] - 8, 15)), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+
+    def seleccionar_tomas(self, track, roi):
+        """
+        Compuerta de calidad y mejor toma: descarta recortes bajo CALIDAD_MINIMA y junta los demás
+        en el track; cada CALIDAD_VENTANA_FRAMES tomas devuelve las OCR_TOP_K mejores para el OCR.
+        """
+        self.rois_evaluados += 1
+        puntaje = calidad_roi(roi)
+        if puntaje < CALIDAD_MINIMA:
+            self.ocr_evitadas_calidad += 1
+            registro.incrementar("ocr_evitadas_calidad")
+            return []
+        track.tomas.append((puntaje, roi.copy()))  # Copia: el frame de origen no se retiene
+        if len(track.tomas) < CALIDAD_VENTANA_FRAMES:
+            return []
+        mejores = sorted(track.tomas, key=lambda t: t[0], reverse=True)[:OCR_TOP_K]
+        self.ocr_evitadas_topk += len(track.tomas) - len(mejores)
+        registro.incrementar("ocr_evitadas_topk", len(track.tomas) - len(mejores))
+        track.tomas.clear()
+        return [r for _, r in mejores]
+
+    def estadisticas_ocr(self):
+        """Llamadas de OCR hechas y evitadas, y tiempo/lecturas hasta cada confirmación."""
+        tiempos = sorted(t for t, _ in self.confirmaciones)
+        lecturas = [n for _, n in self.confirmaciones]
+        return {
+            "rois_evaluados": self.rois_evaluados,
+            "ocr_llamadas": self.ocr_llamadas,
+            "ocr_evitadas_calidad": self.ocr_evitadas_calidad,
+            "ocr_evitadas_topk": self.ocr_evitadas_topk,
+            "confirmaciones": len(tiempos),
+            "tiempo_confirmacion_p50_s": round(tiempos[len(tiempos) // 2], 3) if tiempos else None,
+            "tiempo_confirmacion_medio_s": round(sum(tiempos) / len(tiempos), 3) if tiempos else None,
+            "lecturas_ocr_por_confirmacion": round(sum(lecturas) / len(lecturas), 2) if lecturas else None,
+        }
+
+    @property
+    def ocr_backend(self):
+        if self._ocr_backend is None:
+            with self._ocr_lock:
+                if self._ocr_backend is None:
+                    self._ocr_backend = crear_backend_ocr(self._ocr_nombre)
+        return self._ocr_backend
+
+    def preparar(self):
+        """
+        Carga el OCR y hace inferencias de calentamiento, para correr en un hilo de fondo al arrancar.
+        Con un ServidorInferencia los modelos YOLO se calientan en el servidor; sin él, aquí.
+        """
+        if self._servidor is None:
+            negro = np.zeros((VEHICLE_INFER_SIZE, VEHICLE_INFER_SIZE, 3), dtype=np.uint8)
+            self.model_vehiculos(negro, imgsz=VEHICLE_INFER_SIZE, verbose=False)
+            self.model_placas([negro], imgsz=PLATE_BATCH_IMGSZ, verbose=False)
+        self.ocr_backend.reconocer([np.zeros((48, 160, 3), dtype=np.uint8)])
+
+    def _medir(self, etapa, t0):
+        self._observar_tiempo(etapa, time.perf_counter() - t0)
+
+    def _observar_tiempo(self, etapa, segundos):
+        registro.observar(etapa, segundos)
+        if self.on_tiempo is not None:
+            self.on_tiempo(etapa, segundos)
+
+    def zona_en_fuente(self, frame):
+        """Escala la zona de detección (definida en VIDEO_DISPLAY_SIZE) a la resolución de `frame`."""
+        sx = frame.shape[1] / VIDEO_DISPLAY_SIZE[0]
+        sy = frame.shape[0] / VIDEO_DISPLAY_SIZE[1]
+        zx, zy, zw, zh = self.detection_zone
+        return int(zx * sx), int(zy * sy), int(zw * sx), int(zh * sy)
+
+    def detectar_vehiculos(self, frame, zona):
+        """
+        Corre el detector de vehículos a VEHICLE_INFER_SIZE y devuelve [(box, cls_id)] de los que tocan la zona,
+        en coordenadas de `frame`. En modo recorte solo se infiere sobre la zona más un margen.
+        """
+        x0, y0 = 0, 0
+        entrada = frame
+        if self.zone_crop_inference:
+            zx, zy, zw, zh = zona
+            px = int(ZONE_CROP_PADDING_PX * frame.shape[1] / VIDEO_DISPLAY_SIZE[0])
+            py = int(ZONE_CROP_PADDING_PX * frame.shape[0] / VIDEO_DISPLAY_SIZE[1])
+            x0, y0 = max(zx - px, 0), max(zy - py, 0)
+            x1, y1 = min(zx + zw + px, frame.shape[1]), min(zy + zh + py, frame.shape[0])
+            entrada = frame[y0:y1, x0:x1]
+
+        resultados_veh = self.model_vehiculos(entrada, conf=CONFIDENCE_THRESHOLD_VEHICLE, imgsz=VEHICLE_INFER_SIZE,
+                                              verbose=False, classes=CLASES_VEHICULOS_ACCESO)[0]
+        detecciones = []
+        for box in resultados_veh.boxes:
+            x1, y1, x2, y2 = box.xyxy[0].int().tolist()
+            coords = [x1 + x0, y1 + y0, x2 + x0, y2 + y0]
+            if self.box_intersects_zone(coords, zona):
+                detecciones.append((coords, int(box.cls[0])))
+        return detecciones
+
+    def hay_movimiento(self, frame, zona):
+        zx, zy, zw, zh = zona
+        return self.detector_movimiento.hay_movimiento(frame[zy:zy + zh, zx:zx + zw])
+
+    def debe_procesar(self, frame, zona):
+        """
+        Decide si el frame pasa por los modelos. Se omite cuando la zona está quieta,
+        no hay tracks esperando patente y no toca el latido de MOTION_HEARTBEAT_FRAMES.
+        """
+        if not self.motion_gating: return True
+        movimiento = self.hay_movimiento(frame, zona)
+        hay_pendientes = any(not t.confirmado for t in self.tracker.tracks.values())
+
+        if movimiento or hay_pendientes or self._frames_sin_deteccion >= MOTION_HEARTBEAT_FRAMES:
+            self._frames_sin_deteccion = 0
+            return True
+        self._frames_sin_deteccion += 1
+        self.frames_omitidos += 1
+        registro.incrementar("frames_omitidos")
+        return False
+
+    def detect_plates_batch(self, vehicle_crops):
+        """
+        Detecta placas en todos los recortes de vehículos con una sola inferencia.
+        Cada recorte se escala con letterbox a PLATE_BATCH_IMGSZ para formar un batch uniforme,
+        y las cajas se devuelven en coordenadas del recorte original: una lista por vehículo.
+        """
+        if not vehicle_crops: return []
+        lienzos, transformaciones = [], []
+        for crop in vehicle_crops:
+            lienzo, escala, padding = letterbox(crop, PLATE_BATCH_IMGSZ)
+            lienzos.append(lienzo)
+            transformaciones.append((escala, padding, crop.shape[:2]))
+
+        resultados = self.model_placas(lienzos, conf=CONFIDENCE_THRESHOLD_PLACAS, imgsz=PLATE_BATCH_IMGSZ, verbose=False)
+
+        placas_por_vehiculo = []
+        for resultado, (escala, (pad_x, pad_y), (h, w)) in zip(resultados, transformaciones):
+            placas = []
+            for box_placa in resultado.boxes:
+                x1, y1, x2, y2 = box_placa.xyxy[0].tolist()
+                x1 = min(max(int((x1 - pad_x) / escala), 0), w); x2 = min(max(int((x2 - pad_x) / escala), 0), w)
+                y1 = min(max(int((y1 - pad_y) / escala), 0), h); y2 = min(max(int((y2 - pad_y) / escala), 0), h)
+                if x2 > x1 and y2 > y1:
+                    placas.append((x1, y1, x2, y2))
+            placas_por_vehiculo.append(placas)
+        return placas_por_vehiculo
+
+    def recortar_placas(self, frame, cajas):
+        """
+        ROI de la primera placa de cada vehículo (cajas en coordenadas de `frame`), o None si no tiene.
+        Las placas de todos los vehículos se detectan con una sola inferencia.
+        """
+        recortes = [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in cajas]
+        validos = [i for i, recorte in enumerate(recortes) if recorte.size]
+        rois = [None] * len(cajas)
+        for i, placas in zip(validos, self.detect_plates_batch([recortes[i] for i in validos])):
+            if placas:
+                x1p, y1p, x2p, y2p = placas[0]
+                rois[i] = recortes[i][y1p:y2p, x1p:x2p]
+        return rois
+
+    def leer_rois(self, rois):
+        """Lecturas crudas del OCR por ROI: [(texto, score)] cada uno."""
+        return self.ocr_backend.reconocer(rois)
+
+    def box_intersects_zone(self, box_coords, zona=None):
+        zx, zy, zw, zh = zona or self.detection_zone; zx2, zy2 = zx + zw, zy + zh
+        bx1, by1, bx2, by2 = box_coords
+        return bx1 < zx2 and bx2 > zx and by1 < zy2 and by2 > zy
+
+    def ocr_on_plate(self, roi):
+        return self.ocr_backend.leer_patentes([roi])[0]
+
+    def filtrar_patentes(self, textos):
+        return filtrar_patentes(textos)
+
+    # --- Cooldown de patentes (compartido con el hilo de la interfaz) ---
+    def is_recent(self, plate):
+        with self._lock:
+            return plate in self.recent_plates
+
+    def claim_cooldown(self, plate):
+        """Registra la patente como recién procesada. Devuelve False si ya estaba en cooldown."""
+        current_time = self.reloj()
+        with self._lock:
+            if plate in self.recent_plates and current_time - self.recent_plates[plate] < COOLDOWN_SECONDS:
+                return False
+            self.recent_plates[plate] = current_time
+            return True
+
+    def clean_cooldown_list(self):
+        current_time = self.reloj()
+        with self._lock:
+            keys_to_delete = [p for p, ts in self.recent_plates.items() if current_time - ts > COOLDOWN_SECONDS]
+            for key in keys_to_delete:
+                del self.recent_plates[key]
+
+    def reset(self):
+        with self._lock:
+            self.tracker.reset()
+            self.recent_plates.clear()
+        self.detector_movimiento.reset()
+        self.frames_omitidos = 0
+        self._frames_sin_deteccion = 0
+        self.ocr_llamadas = 0
+        self.rois_evaluados = self.ocr_evitadas_calidad = self.ocr_evitadas_topk = 0
+        self.confirmaciones.clear()
@@ -0,0 +1,274 @@
+"""
+Análisis de ocupación por lotes sobre archivos de imágenes y videos grabados.
+
+Usa el mapa calibrado de espacios y la misma clasificación que la pestaña de monitoreo
+(process_image_and_update_db): estado físico por espacio, más el estado suavizado por mayoría
+que usaría el monitoreo continuo. No toca la ocupación en la BD; cada muestra se escribe como
+una fila por espacio en una serie temporal CSV o Parquet (según la extensión de --salida).
+
+La decodificación y el recorte de los espacios corren en un pool de procesos; la inferencia se
+agrupa en lotes de --batch imágenes en el proceso principal. Solo hay unas pocas tareas en vuelo
+a la vez, así que miles de archivos se recorren sin cargarlos en memoria.
+
+Uso:
+    python analisis_lote.py grabaciones/ --salida ocupacion.parquet --intervalo-s 10
+    python analisis_lote.py fotos/ otra_foto.jpg --salida ocupacion.csv --procesos 8 --batch 16
+"""
+import argparse
+import csv
+import itertools
+import multiprocessing as mp
+import os
+import time
+from collections import deque
+
+import cv2
+
+from backends_modelo import cargar_modelo
+from base_datos import asegurar_esquema, conectar
+from configuracion import (
+    DATABASE_PATH, CAMARA_MONITOREO, MONITOREO_MODO, MONITOREO_INTERVALO_S,
+    MODELO_PARKING_SLOTS_PATH, MODELO_CLASIFICADOR_ESPACIOS_PATH
+)
+from monitoreo import (
+    MODOS_MONITOREO, MapaEspacios, SuavizadorEstados, clasificar_recortes, detectar_espacios, detectar_espacios_lote,
+    validar_modo
+)
+
+EXTENSIONES_IMAGEN = (".jpg", ".jpeg", ".png", ".bmp")
+EXTENSIONES_VIDEO = (".mp4", ".avi", ".mov", ".mkv")
+COLUMNAS = ["fuente", "frame", "segundo", "id_espacio", "estado", "estado_suavizado"]
+
+
+def listar_archivos(rutas):
+    """Genera, en orden, las imágenes y videos de `rutas` (archivos o directorios, recorridos de a uno)."""
+    for ruta in rutas:
+        if not os.path.isdir(ruta):
+            if ruta.lower().endswith(EXTENSIONES_IMAGEN + EXTENSIONES_VIDEO): yield ruta
+            continue
+        for raiz, directorios, archivos in os.walk(ruta):
+            directorios.sort()
+            for nombre in sorted(archivos):
+                if nombre.lower().endswith(EXTENSIONES_IMAGEN + EXTENSIONES_VIDEO):
+                    yield os.path.join(raiz, nombre)
+
+
+def fps_valido(cap):
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    return fps if 0 < fps <= 120 else 30.0
+
+
+def generar_tareas(archivos, intervalo_s, muestras_por_tarea):
+    """
+    Tareas (ruta, inicio, fin, paso) para el pool: una por imagen, y los videos partidos en tramos
+    de `muestras_por_tarea` muestras (una cada `intervalo_s`) para repartir un video largo entre procesos.
+    """
+    for ruta in archivos:
+        if ruta.lower().endswith(EXTENSIONES_IMAGEN):
+            yield ruta, 0, 1, 1
+            continue
+        cap = cv2.VideoCapture(ruta)
+        fps, total = fps_valido(cap), int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+        if total <= 0:
+            print(f"[WARN] [Lote] No se pudo leer el video (se omite): {ruta}")
+            continue
+        paso = max(1, int(round(intervalo_s * fps)))
+        tramo = paso * muestras_por_tarea
+        for inicio in range(0, total, tramo):
+            yield ruta, inicio, min(inicio + tramo, total), paso
+
+
+# --- Procesos de decodificación ---
+_mapa = _modo = None
+
+
+def _iniciar_trabajador(camara, espacios, modo):
+    global _mapa, _modo
+    cv2.setNumThreads(1)  # El paralelismo lo da el pool: un hilo de OpenCV por proceso
+    _mapa, _modo = MapaEspacios(camara, espacios), modo
+
+
+def _preparar(imagen):
+    # En modo recortes solo viajan al proceso principal los recortes de los espacios, no el frame
+    return _mapa.recortes(imagen) if _modo == "recortes" else imagen
+
+
+def decodificar(tarea):
+    """Decodifica una tarea en un proceso del pool. Devuelve [(fuente, frame, segundo, datos)]."""
+    ruta, inicio, fin, paso = tarea
+    if ruta.lower().endswith(EXTENSIONES_IMAGEN):
+        imagen = cv2.imread(ruta)
+        return [] if imagen is None else [(ruta, 0, 0.0, _preparar(imagen))]
+
+    cap = cv2.VideoCapture(ruta)
+    fps = fps_valido(cap)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, inicio)
+    muestras = []
+    for n in range(inicio, fin):
+        if (n - inicio) % paso:
+            if not cap.grab(): break  # Frames intermedios: se avanzan sin convertirlos
+            continue
+        ret, frame = cap.read()
+        if not ret: break
+        muestras.append((ruta, n, round(n / fps, 3), _preparar(frame)))
+    cap.release()
+    return muestras
+
+
+def mapear_acotado(pool, funcion, tareas, en_vuelo):
+    """Como pool.imap (mismo orden), pero con a lo sumo `en_vuelo` tareas pendientes: imap consume toda la entrada."""
+    pendientes = deque()
+    for tarea in tareas:
+        pendientes.append(pool.apply_async(funcion, (tarea,)))
+        if len(pendientes) >= en_vuelo:
+            yield pendientes.popleft().get()
+    while pendientes:
+        yield pendientes.popleft().get()
+
+
+# --- Inferencia y salida ---
+def inferir(lote, mapa, modelo, modo):
+    """Estados físicos {id_espacio: estado} de cada muestra del lote, con una sola llamada al modelo."""
+    if modo == "recortes":
+        estados = clasificar_recortes(modelo, [recorte for *_, recortes in lote for recorte in recortes])
+        n = len(mapa.espacios)
+        return [{id_espacio: estado for (id_espacio, _), estado in zip(mapa.espacios, estados[i * n:(i + 1) * n]) if estado}
+                for i in range(len(lote))]
+    return [mapa.emparejar(detecciones) for detecciones in detectar_espacios_lote(modelo, [frame for *_, frame in lote])]
+
+
+class EscritorSerie:
+    """Serie temporal de ocupación en CSV o Parquet (por la extensión), escrita en bloques de filas."""
+    def __init__(self, ruta, filas_por_bloque=50000):
+        self.filas_por_bloque = filas_por_bloque
+        self.filas = 0
+        self._bloque = []
+        self.parquet = ruta.lower().endswith(".parquet")
+        if self.parquet:
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise SystemExit("[ERROR] La salida Parquet requiere pyarrow (pip install pyarrow); use una salida .csv.")
+            self._pa = pa
+            self._esquema = pa.schema([("fuente", pa.string()), ("frame", pa.int64()), ("segundo", pa.float32()),
+                                       ("id_espacio", pa.string()), ("estado", pa.string()),
+                                       ("estado_suavizado", pa.string())])
+            self._escritor = pq.ParquetWriter(ruta, self._esquema, compression="zstd")
+        else:
+            self._archivo = open(ruta, "w", newline="", encoding="utf-8")
+            self._escritor = csv.writer(self._archivo)
+            self._escritor.writerow(COLUMNAS)
+
+    def agregar(self, fila):
+        self._bloque.append(fila)
+        if len(self._bloque) >= self.filas_por_bloque: self._volcar()
+
+    def _volcar(self):
+        if not self._bloque: return
+        if self.parquet:
+            columnas = dict(zip(COLUMNAS, map(list, zip(*self._bloque))))
+            self._escritor.write_table(self._pa.table(columnas, schema=self._esquema))
+        else:
+            self._escritor.writerows(self._bloque)
+        self.filas += len(self._bloque)
+        self._bloque.clear()
+
+    def cerrar(self):
+        self._volcar()
+        (self._escritor if self.parquet else self._archivo).close()
+
+
+def primera_imagen(ruta):
+    if ruta.lower().endswith(EXTENSIONES_IMAGEN): return cv2.imread(ruta)
+    cap = cv2.VideoCapture(ruta)
+    ret, frame = cap.read()
+    cap.release()
+    return frame if ret else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Series de ocupación por espacio sobre archivos de imágenes y videos.")
+    parser.add_argument("rutas", nargs="+", help="Imágenes, videos o directorios (se recorren recursivamente)")
+    parser.add_argument("--salida", required=True, help="Archivo .csv o .parquet de salida")
+    parser.add_argument("--db", default=DATABASE_PATH, help="BD con la geometría calibrada de los espacios")
+    parser.add_argument("--camara", default=CAMARA_MONITOREO)
+    parser.add_argument("--modo", default=MONITOREO_MODO, choices=MODOS_MONITOREO)
+    parser.add_argument("--intervalo-s", type=float, default=MONITOREO_INTERVALO_S, help="Una muestra de video cada N segundos")
+    parser.add_argument("--procesos", type=int, default=max(1, (os.cpu_count() or 2) - 1), help="Procesos de decodificación")
+    parser.add_argument("--batch", type=int, default=8, help="Imágenes por llamada al modelo")
+    parser.add_argument("--muestras-por-tarea", type=int, default=16, help="Muestras de video por tarea del pool")
+    parser.add_argument("--guardar-calibracion", action="store_true",
+                        help="Sin geometría guardada, persistir la calibrada con el primer archivo")
+    args = parser.parse_args()
+
+    try:
+        validar_modo(args.modo)
+    except ValueError as e:
+        parser.error(str(e))
+
+    archivos = listar_archivos(args.rutas)
+    primero = next(archivos, None)
+    if primero is None: parser.error("No se encontraron imágenes ni videos en las rutas indicadas")
+    archivos = itertools.chain([primero], archivos)
+
+    detector = cargar_modelo(MODELO_PARKING_SLOTS_PATH)
+    modelo = detector
+    if args.modo == "recortes":
+        modelo = cargar_modelo(MODELO_CLASIFICADOR_ESPACIOS_PATH)
+
+    # Misma regla que la GUI: sin geometría guardada, el primer archivo sirve de calibración
+    asegurar_esquema(args.db)  # Una BD nueva o anterior a la geometría persistida no tiene sus tablas
+    conn = conectar(args.db)
+    mapa = MapaEspacios.cargar(conn, args.camara)
+    if mapa is None:
+        imagen = primera_imagen(primero)
+        cajas = [caja for caja, _ in detectar_espacios(detector, imagen)] if imagen is not None else []
+        if not cajas: raise SystemExit(f"[ERROR] No se pudieron calibrar los espacios con {primero}")
+        mapa = MapaEspacios.desde_detecciones(args.camara, cajas)
+        if args.guardar_calibracion: mapa.guardar(conn)
+        print(f"[INFO] [Lote] Calibrados {len(mapa)} espacios con {primero}.")
+    conn.close()
+
+    escritor = EscritorSerie(args.salida)
+    suavizadores = {}  # Una secuencia por video, o por directorio de imágenes
+    lote, muestras, t_inferencia, proximo_reporte = [], 0, 0.0, 500
+    inicio = time.perf_counter()
+
+    def procesar_lote():
+        nonlocal muestras, t_inferencia, proximo_reporte
+        t0 = time.perf_counter()
+        estados = inferir(lote, mapa, modelo, args.modo)
+        t_inferencia += time.perf_counter() - t0
+        for (fuente, frame, segundo, _), fisicos in zip(lote, estados):
+            clave = fuente if fuente.lower().endswith(EXTENSIONES_VIDEO) else os.path.dirname(fuente)
+            suavizador = suavizadores.setdefault(clave, SuavizadorEstados())
+            suavizador.actualizar(fisicos)
+            for id_espacio, estado in fisicos.items():
+                escritor.agregar((fuente, frame, segundo, id_espacio, estado, suavizador.estados.get(id_espacio, "")))
+        muestras += len(lote)
+        lote.clear()
+        if muestras >= proximo_reporte:
+            proximo_reporte += 500
+            print(f"[INFO] [Lote] {muestras} imágenes, {muestras / (time.perf_counter() - inicio):.1f} img/s")
+
+    contexto = mp.get_context("spawn")  # fork tras cargar torch/OpenCV puede colgar los procesos
+    with contexto.Pool(args.procesos, initializer=_iniciar_trabajador, initargs=(mapa.camara, mapa.espacios, args.modo)) as pool:
+        tareas = generar_tareas(archivos, args.intervalo_s, args.muestras_por_tarea)
+        for resultado in mapear_acotado(pool, decodificar, tareas, en_vuelo=args.procesos * 2):
+            for muestra in resultado:
+                lote.append(muestra)
+                if len(lote) >= args.batch: procesar_lote()
+        if lote: procesar_lote()
+    escritor.cerrar()
+
+    duracion = time.perf_counter() - inicio
+    print(f"\n=== Análisis por lotes ({args.modo}, {args.procesos} procesos, batch {args.batch}) ===")
+    print(f"  Imágenes analizadas: {muestras} en {duracion:.1f} s -> {muestras / duracion if duracion else 0:.1f} img/s")
+    print(f"  Inferencia: {t_inferencia:.1f} s ({100 * t_inferencia / duracion if duracion else 0:.0f}% del total)")
+    print(f"  Filas escritas: {escritor.filas} en {args.salida}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,252 @@
+"""
+API local (HTTP + WebSocket) del servicio sin interfaz, solo con la biblioteca estándar.
+
+    GET /ocupacion          estado completo de los espacios y la secuencia del último delta
+    GET /eventos?desde_id=N registro de accesos persistido (paginado por id)
+    GET /metricas           métricas del servicio (ver `metricas` de ServidorAPI)
+    GET /metrics            las mismas métricas e histogramas por etapa en formato de texto de Prometheus
+    GET /ws                 WebSocket: primero un snapshot, luego solo los deltas
+
+Cada mensaje publicado lleva una `secuencia` creciente. Un cliente aplica los deltas con
+secuencia mayor a la de su snapshot; si detecta un salto (o el servidor lo desconecta por
+lento), vuelve a pedir el snapshot.
+"""
+import base64
+import hashlib
+import json
+import queue
+import select
+import struct
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from base_datos import conectar
+from configuracion import DATABASE_PATH, API_COLA_CLIENTE
+from metricas import registro
+
+_GUID_WEBSOCKET = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+class BusDeltas:
+    """Difunde mensajes a los suscriptores, cada uno con su propia cola acotada."""
+    def __init__(self, max_cola=API_COLA_CLIENTE):
+        self.max_cola = max_cola
+        self.secuencia = 0
+        self.publicados = 0
+        self.desfasados = 0
+        self._suscriptores = set()
+        self._lock = threading.Lock()
+
+    def publicar(self, tipo, datos):
+        with self._lock:
+            self.secuencia += 1
+            self.publicados += 1
+            mensaje = {"tipo": tipo, "secuencia": self.secuencia, "datos": datos}
+            for cola in list(self._suscriptores):
+                try:
+                    cola.put_nowait(mensaje)
+                except queue.Full:
+                    # Cliente demasiado lento: se le corta para que se resincronice con un snapshot
+                    self._suscriptores.discard(cola)
+                    cola.desfasado = True
+                    self.desfasados += 1
+
+    def suscribir(self):
+        cola = queue.Queue(maxsize=self.max_cola)
+        cola.desfasado = False
+        with self._lock:
+            self._suscriptores.add(cola)
+        return cola
+
+    def desuscribir(self, cola):
+        with self._lock:
+            self._suscriptores.discard(cola)
+
+    @property
+    def suscriptores(self):
+        return len(self._suscriptores)
+
+
+def snapshot_ocupacion(conn):
+    filas = conn.execute("SELECT id_espacio, estado, patente_ocupante, hora_ingreso FROM estacionamientos ORDER BY id_espacio").fetchall()
+    espacios = {f[0]: {"estado": f[1], "patente_ocupante": f[2], "hora_ingreso": f[3]} for f in filas}
+    conteos = {}
+    for e in espacios.values():
+        conteos[e["estado"]] = conteos.get(e["estado"], 0) + 1
+    return {"espacios": espacios, "conteos": conteos}
+
+
+# --- WebSocket mínimo (RFC 6455): solo mensajes de texto del servidor y control del cliente ---
+def _trama(opcode, payload=b""):
+    cabecera = bytes([0x80 | opcode])
+    n = len(payload)
+    if n < 126:
+        cabecera += bytes([n])
+    elif n < 1 << 16:
+        cabecera += bytes([126]) + struct.pack("!H", n)
+    else:
+        cabecera += bytes([127]) + struct.pack("!Q", n)
+    return cabecera + payload
+
+
+def _leer_exacto(archivo, n):
+    datos = b""
+    while len(datos) < n:
+        parte = archivo.read(n - len(datos))
+        if not parte: raise ConnectionError("WebSocket cerrado")
+        datos += parte
+    return datos
+
+
+def _leer_trama(archivo):
+    """Lee una trama del cliente (siempre enmascarada). Devuelve (opcode, payload)."""
+    b0, b1 = _leer_exacto(archivo, 2)
+    n = b1 & 0x7F
+    if n == 126: n = struct.unpack("!H", _leer_exacto(archivo, 2))[0]
+    elif n == 127: n = struct.unpack("!Q", _leer_exacto(archivo, 8))[0]
+    mascara = _leer_exacto(archivo, 4) if b1 & 0x80 else b"\0\0\0\0"
+    payload = bytes(b ^ mascara[i % 4] for i, b in enumerate(_leer_exacto(archivo, n)))
+    return b0 & 0x0F, payload
+
+
+class _ManejadorAPI(BaseHTTPRequestHandler):
+    server_version = "ResiPark/1.0"
+    protocol_version = "HTTP/1.1"  # Los navegadores exigen 1.1 para el upgrade a WebSocket
+    rbufsize = 0  # Sin buffer de lectura: select() sobre el socket ve todo lo que envía el cliente
+    api = None  # ServidorAPI, asignado al crear el servidor
+
+    def log_message(self, formato, *args):
+        pass  # Sin una línea por solicitud; los errores se reportan aparte
+
+    def _json(self, cuerpo, estado=200):
+        self._responder(json.dumps(cuerpo, ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8", estado)
+
+    def _responder(self, datos, tipo, estado=200):
+        self.send_response(estado)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        if url.path == "/ocupacion":
+            self._json(self.api.ocupacion())
+        elif url.path == "/eventos":
+            try:
+                desde_id = int(params.get("desde_id", ["0"])[0])
+                limite = min(int(params.get("limite", ["100"])[0]), 1000)
+            except ValueError:
+                self._json({"error": "desde_id y limite deben ser enteros"}, 400)
+                return
+            self._json(self.api.eventos(desde_id, limite))
+        elif url.path == "/metricas":
+            self._json(self.api.metricas())
+        elif url.path == "/metrics":
+            self._responder(self.api.metricas_prometheus().encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8")
+        elif url.path == "/ws" and self.headers.get("Upgrade", "").lower() == "websocket":
+            self._websocket()
+        else:
+            self._json({"error": f"Ruta desconocida: {url.path}"}, 404)
+
+    def _websocket(self):
+        clave = self.headers.get("Sec-WebSocket-Key", "")
+        aceptar = base64.b64encode(hashlib.sha1((clave + _GUID_WEBSOCKET).encode()).digest()).decode()
+        self.send_response(101, "Switching Protocols")
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", aceptar)
+        self.end_headers()
+        self.wfile.flush()
+
+        # Suscribirse antes de leer el snapshot: ningún delta se pierde entre ambos pasos
+        # (los deltas son idempotentes, así que repetir uno ya incluido en el snapshot no daña)
+        cola = self.api.bus.suscribir()
+        try:
+            self._enviar({"tipo": "snapshot", "secuencia": self.api.bus.secuencia, "datos": self.api.ocupacion()})
+            while not cola.desfasado:
+                try:
+                    self._enviar(cola.get(timeout=0.5))
+                except queue.Empty:
+                    pass
+                # Atender tramas de control del cliente sin bloquear el envío
+                if select.select([self.connection], [], [], 0)[0]:
+                    opcode, payload = _leer_trama(self.rfile)
+                    if opcode == 0x8:
+                        self.wfile.write(_trama(0x8, payload[:2]))
+                        break
+                    if opcode == 0x9:
+                        self.wfile.write(_trama(0xA, payload))
+            if cola.desfasado:
+                self.wfile.write(_trama(0x8, struct.pack("!H", 1008) + b"desfasado"))
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self.api.bus.desuscribir(cola)
+            self.close_connection = True
+
+    def _enviar(self, mensaje):
+        self.wfile.write(_trama(0x1, json.dumps(mensaje, ensure_ascii=False).encode("utf-8")))
+        self.wfile.flush()
+
+
+class ServidorAPI:
+    """
+    Servidor HTTP/WebSocket local en su propio hilo. Los productores llaman a `bus.publicar()`;
+    `fuentes_metricas` es un dict {nombre: callable} cuyos resultados se incluyen en /metricas.
+    """
+    def __init__(self, host, puerto, db_path=DATABASE_PATH, fuentes_metricas=None):
+        self.db_path = db_path
+        self.bus = BusDeltas()
+        self.fuentes_metricas = fuentes_metricas or {}
+        manejador = type("ManejadorAPI", (_ManejadorAPI,), {"api": self})
+        self.httpd = ThreadingHTTPServer((host, puerto), manejador)
+        self.httpd.daemon_threads = True
+        self._hilo = threading.Thread(target=self.httpd.serve_forever, name="api-local", daemon=True)
+
+    @property
+    def direccion(self):
+        host, puerto = self.httpd.server_address[:2]
+        return f"http://{host}:{puerto}"
+
+    def iniciar(self):
+        self._hilo.start()
+
+    def detener(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def ocupacion(self):
+        conn = conectar(self.db_path)
+        try:
+            return snapshot_ocupacion(conn)
+        finally:
+            conn.close()
+
+    def eventos(self, desde_id, limite):
+        conn = conectar(self.db_path)
+        try:
+            filas = conn.execute("""SELECT id, ts, patente, tipo_vehiculo, tipo_usuario, id_espacio, camara, confianza
+                                    FROM eventos WHERE id > ? ORDER BY id LIMIT ?""", (desde_id, limite)).fetchall()
+        finally:
+            conn.close()
+        campos = ("id", "ts", "patente", "tipo_vehiculo", "tipo_usuario", "id_espacio", "camara", "confianza")
+        return {"eventos": [dict(zip(campos, f)) for f in filas]}
+
+    def _metricas_servicio(self):
+        resultado = {"api": {"suscriptores": self.bus.suscriptores, "secuencia": self.bus.secuencia,
+                             "publicados": self.bus.publicados, "clientes_desfasados": self.bus.desfasados}}
+        for nombre, fuente in self.fuentes_metricas.items():
+            resultado[nombre] = fuente()
+        return resultado
+
+    def metricas(self):
+        resultado = self._metricas_servicio()
+        resultado["pipeline"] = registro.resumen()
+        return resultado
+
+    def metricas_prometheus(self):
+        """Histogramas y contadores del registro; las métricas numéricas del servicio van como gauges."""
+        return registro.texto_prometheus(extra=self._metricas_servicio())
@@ -0,0 +1,162 @@
+import threading
+import time
+from collections import defaultdict, namedtuple
+
+from base_datos import conexion_hilo
+from configuracion import (
+    DATABASE_PATH, AUTORIZACION_MAX_EDICIONES, AUTORIZACION_PUNTAJE_MINIMO, AUTORIZACION_REVISION_S
+)
+
+# Pares que el OCR confunde a menudo en patentes: sustituirlos cuesta menos que un error cualquiera
+CONFUSIONES_OCR = {
+    ("O", "0"): 0.3, ("D", "0"): 0.4, ("Q", "0"): 0.4, ("B", "8"): 0.3, ("I", "1"): 0.3,
+    ("L", "1"): 0.5, ("S", "5"): 0.3, ("Z", "2"): 0.4, ("G", "6"): 0.4, ("A", "4"): 0.5, ("T", "7"): 0.5,
+}
+_COSTO_SUSTITUCION = {}
+_REPRESENTANTE = {}  # Carácter -> representante de su clase de confusión (O, D, Q, 0 -> '0')
+for (_a, _b), _costo in CONFUSIONES_OCR.items():
+    _COSTO_SUSTITUCION[_a, _b] = _COSTO_SUSTITUCION[_b, _a] = _costo
+    _REPRESENTANTE[_a] = _REPRESENTANTE.get(_b, _b)
+    _REPRESENTANTE.setdefault(_b, _REPRESENTANTE[_a])
+
+# Resultado de una búsqueda; `puntaje` = 1 - distancia_ponderada / largo (1.0 es coincidencia exacta)
+Coincidencia = namedtuple("Coincidencia", ["patente", "tipo", "distancia", "puntaje"])
+
+
+def forma_canonica(patente):
+    """
+    Colapsa los caracteres confundibles en su representante. La distancia de Levenshtein entre
+    formas canónicas nunca supera a distancia_ponderada, así que sirve de cota para podar.
+    """
+    return "".join(_REPRESENTANTE.get(c, c) for c in patente)
+
+
+def levenshtein(a, b):
+    """Distancia de edición entera: la métrica del árbol BK."""
+    previa = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        actual = [i]
+        for j, cb in enumerate(b, start=1):
+            actual.append(min(previa[j] + 1, actual[j - 1] + 1, previa[j - 1] + (ca != cb)))
+        previa = actual
+    return previa[-1]
+
+
+def distancia_ponderada(a, b):
+    """Levenshtein donde sustituir caracteres confundibles (O/0, B/8, ...) cuesta CONFUSIONES_OCR."""
+    previa = [float(j) for j in range(len(b) + 1)]
+    for i, ca in enumerate(a, start=1):
+        actual = [float(i)]
+        for j, cb in enumerate(b, start=1):
+            sustitucion = 0.0 if ca == cb else _COSTO_SUSTITUCION.get((ca, cb), 1.0)
+            actual.append(min(previa[j] + 1, actual[j - 1] + 1, previa[j - 1] + sustitucion))
+        previa = actual
+    return previa[-1]
+
+
+class ArbolBK:
+    """Árbol BK sobre Levenshtein: encuentra todas las palabras a <= k ediciones sin comparar contra todas."""
+    def __init__(self, palabras=()):
+        self.raiz = None
+        for palabra in palabras:
+            self.agregar(palabra)
+
+    def agregar(self, palabra):
+        if self.raiz is None:
+            self.raiz = (palabra, {})
+            return
+        nodo = self.raiz
+        while True:
+            d = levenshtein(palabra, nodo[0])
+            if d == 0: return
+            if d not in nodo[1]:
+                nodo[1][d] = (palabra, {})
+                return
+            nodo = nodo[1][d]
+
+    def buscar(self, palabra, k):
+        """Devuelve [(distancia, palabra)] con distancia <= k."""
+        if self.raiz is None: return []
+        encontrados, pendientes = [], [self.raiz]
+        while pendientes:
+            actual, hijos = pendientes.pop()
+            d = levenshtein(palabra, actual)
+            if d <= k: encontrados.append((d, actual))
+            # Desigualdad triangular: solo los hijos con arista en [d - k, d + k] pueden estar a <= k
+            pendientes.extend(hijo for arista, hijo in hijos.items() if d - k <= arista <= d + k)
+        return encontrados
+
+
+class IndiceAutorizacion:
+    """
+    Índice en memoria de las patentes activas de `usuarios`, tolerante a confusiones de OCR.
+    Se recarga solo cuando la tabla cambia: los triggers de usuarios incrementan su versión en
+    versiones_tablas, que se revisa como máximo cada AUTORIZACION_REVISION_S segundos.
+    Puede usarse desde varios hilos.
+    """
+    def __init__(self, db_path=DATABASE_PATH, max_ediciones=AUTORIZACION_MAX_EDICIONES,
+                 puntaje_minimo=AUTORIZACION_PUNTAJE_MINIMO, revision_s=AUTORIZACION_REVISION_S):
+        self.db_path = db_path
+        self.max_ediciones = max_ediciones
+        self.puntaje_minimo = puntaje_minimo
+        self.revision_s = revision_s
+        self._lock = threading.Lock()
+        self._version = None
+        self._revisado = 0.0
+        self._datos = ({}, {}, ArbolBK())  # (tipos, patentes por forma canónica, árbol); se reemplaza entero
+        self.recargas = 0
+
+    def _version_actual(self):
+        row = conexion_hilo(self.db_path).execute(
+            "SELECT version FROM versiones_tablas WHERE tabla = 'usuarios'").fetchone()
+        return row[0] if row else 0
+
+    def _asegurar_vigente(self):
+        ahora = time.monotonic()
+        if self._version is not None and ahora - self._revisado < self.revision_s: return
+        with self._lock:
+            if self._version is not None and ahora - self._revisado < self.revision_s: return
+            version = self._version_actual()
+            if version != self._version:
+                filas = conexion_hilo(self.db_path).execute("SELECT patente, tipo FROM usuarios WHERE activo = 1").fetchall()
+                tipos = dict(filas)
+                por_forma = defaultdict(list)
+                for patente in tipos:
+                    por_forma[forma_canonica(patente)].append(patente)
+                self._datos = (tipos, dict(por_forma), ArbolBK(por_forma))
+                self._version = version
+                self.recargas += 1
+            self._revisado = ahora
+
+    def invalidar(self):
+        """Fuerza la revisión de la versión en la próxima búsqueda."""
+        self._revisado = 0.0
+
+    def buscar(self, patente):
+        """
+        Mejor patente registrada para una lectura de OCR, como Coincidencia, o None.
+        Si dos patentes registradas quedan igual de cerca, la lectura es ambigua y no se acepta.
+        """
+        self._asegurar_vigente()
+        tipos, por_forma, arbol = self._datos
+        tipo = tipos.get(patente)
+        if tipo is not None:
+            return Coincidencia(patente, tipo, 0.0, 1.0)
+
+        # Distancia ponderada máxima que aún alcanza el puntaje mínimo; como la distancia entre formas
+        # canónicas es una cota inferior, basta buscar en el árbol con ese radio (0 = búsqueda directa)
+        forma = forma_canonica(patente)
+        radio = min(self.max_ediciones, int((1.0 - self.puntaje_minimo) * len(patente) + 1e-9))
+        formas = [forma] if radio == 0 else [f for _, f in arbol.buscar(forma, radio)]
+        candidatos = sorted((distancia_ponderada(patente, p), p) for f in formas for p in por_forma.get(f, ()))
+        if not candidatos: return None
+        distancia, mejor = candidatos[0]
+        if len(candidatos) > 1 and candidatos[1][0] == distancia: return None
+        puntaje = 1.0 - distancia / max(len(patente), len(mejor))
+        if puntaje < self.puntaje_minimo: return None
+        return Coincidencia(mejor, tipos[mejor], distancia, puntaje)
+
+    def tipo_usuario(self, patente):
+        """Reemplazo de check_user_in_db con tolerancia a confusiones. Devuelve (patente_registrada, tipo) o (patente, None)."""
+        coincidencia = self.buscar(patente)
+        return (coincidencia.patente, coincidencia.tipo) if coincidencia else (patente, None)
@@ -0,0 +1,38 @@
+import os
+
+from configuracion import MODEL_BACKEND, MODEL_INT8
+
+# Runtimes de inferencia para los modelos YOLO; los exportados se generan con exportar_modelos.py
+BACKENDS_MODELO = ("pytorch", "onnx", "openvino")
+
+
+def ruta_exportada(ruta_pt, backend, int8=False):
+    """Ruta del modelo exportado para `backend`, junto al .pt original (misma convención que ultralytics)."""
+    base = os.path.splitext(ruta_pt)[0]
+    if backend == "pytorch":
+        return ruta_pt
+    if backend == "onnx":
+        return base + ("_int8.onnx" if int8 else ".onnx")
+    if backend == "openvino":
+        return base + ("_int8_openvino_model" if int8 else "_openvino_model")
+    raise ValueError(f"Backend de modelo desconocido: '{backend}'. Opciones: {', '.join(BACKENDS_MODELO)}")
+
+
+def cargar_modelo(ruta_pt, backend=None, int8=None):
+    """
+    Carga un modelo YOLO con el runtime configurado (MODEL_BACKEND / MODEL_INT8).
+    Si la variante pedida no se ha exportado, cae a la versión FP32 del mismo backend y luego al .pt.
+    """
+    from ultralytics import YOLO  # Import diferido: torch tarda segundos en cargarse
+
+    backend = backend or MODEL_BACKEND
+    int8 = MODEL_INT8 if int8 is None else int8
+    candidatas = [ruta_exportada(ruta_pt, backend, True)] if int8 else []
+    candidatas.append(ruta_exportada(ruta_pt, backend, False))
+    for ruta in candidatas:
+        if os.path.exists(ruta):
+            return YOLO(ruta)
+    if backend != "pytorch":
+        print(f"[WARN] [Modelos] No hay modelo '{backend}' exportado para {ruta_pt} "
+              f"(ejecute exportar_modelos.py); se usa PyTorch.")
+    return YOLO(ruta_pt)
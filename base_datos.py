@@ -0,0 +1,188 @@
+import os
+import sqlite3
+import threading
+
+from configuracion import DATABASE_PATH, DB_BUSY_TIMEOUT_S
+from metricas import cronometrado
+
+# RETURNING llegó en SQLite 3.35; en versiones anteriores se reserva con SELECT + UPDATE
+_SOPORTA_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+_conexiones_hilo = threading.local()
+
+
+# --- Conexiones ---
+def conectar(db_path=DATABASE_PATH):
+    """
+    Abre una conexión configurada para varios escritores: WAL (los lectores no bloquean al
+    escritor) y busy_timeout para esperar el lock en lugar de fallar con 'database is locked'.
+    """
+    conn = sqlite3.connect(db_path, timeout=DB_BUSY_TIMEOUT_S)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def conexion_hilo(db_path=DATABASE_PATH):
+    """Devuelve la conexión propia del hilo actual (sqlite3 no permite compartirlas entre hilos)."""
+    conexiones = getattr(_conexiones_hilo, "conexiones", None)
+    if conexiones is None:
+        conexiones = _conexiones_hilo.conexiones = {}
+    if db_path not in conexiones:
+        conexiones[db_path] = conectar(db_path)
+    return conexiones[db_path]
+
+
+# --- Esquema ---
+def crear_esquema(conn):
+    cursor = conn.cursor()
+
+    # Crear tablas si no existen (no hará nada si ya existen)
+    cursor.execute('''CREATE TABLE IF NOT EXISTS usuarios (
+        patente TEXT PRIMARY KEY,
+        tipo TEXT NOT NULL CHECK(tipo IN ('Estudiante', 'Profesor')),
+        activo INTEGER NOT NULL DEFAULT 1
+    )''')
+
+    cursor.execute('''CREATE TABLE IF NOT EXISTS estacionamientos (
+        id_espacio TEXT PRIMARY KEY,
+        estado TEXT NOT NULL CHECK(estado IN ('Libre', 'Ocupado', 'Reservado')),
+        patente_ocupante TEXT,
+        hora_ingreso TEXT,
+        FOREIGN KEY (patente_ocupante) REFERENCES usuarios(patente)
+    )''')
+
+    # Versión de las tablas cacheadas en memoria: los triggers la incrementan con cada cambio
+    cursor.execute('''CREATE TABLE IF NOT EXISTS versiones_tablas (
+        tabla TEXT PRIMARY KEY,
+        version INTEGER NOT NULL
+    )''')
+    cursor.execute("INSERT OR IGNORE INTO versiones_tablas (tabla, version) VALUES ('usuarios', 0)")
+    for operacion in ("INSERT", "UPDATE", "DELETE"):
+        cursor.execute(f'''CREATE TRIGGER IF NOT EXISTS usuarios_version_{operacion.lower()}
+            AFTER {operacion} ON usuarios
+            BEGIN UPDATE versiones_tablas SET version = version + 1 WHERE tabla = 'usuarios'; END''')
+
+    # Geometría calibrada de cada espacio, por cámara (polígono en JSON)
+    cursor.execute('''CREATE TABLE IF NOT EXISTS geometria_espacios (
+        camara TEXT NOT NULL,
+        id_espacio TEXT NOT NULL,
+        poligono TEXT NOT NULL,
+        PRIMARY KEY (camara, id_espacio)
+    )''')
+
+    # Registro histórico de accesos (solo inserciones) y sus agregados por hora
+    cursor.execute('''CREATE TABLE IF NOT EXISTS eventos (
+        id INTEGER PRIMARY KEY,
+        ts TEXT NOT NULL,
+        patente TEXT NOT NULL,
+        tipo_vehiculo TEXT,
+        tipo_usuario TEXT,
+        id_espacio TEXT,
+        camara TEXT,
+        confianza REAL
+    )''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_eventos_ts ON eventos(ts)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_eventos_patente ON eventos(patente, ts)")
+    cursor.execute('''CREATE TABLE IF NOT EXISTS eventos_por_hora (
+        hora TEXT NOT NULL,
+        camara TEXT NOT NULL DEFAULT '',
+        ingresos INTEGER NOT NULL DEFAULT 0,
+        autorizados INTEGER NOT NULL DEFAULT 0,
+        asignados INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (hora, camara)
+    )''')
+
+    # Índice parcial: la búsqueda del primer espacio libre no recorre la tabla completa
+    cursor.execute('''CREATE INDEX IF NOT EXISTS idx_estacionamientos_libres
+        ON estacionamientos(id_espacio) WHERE estado = 'Libre' ''')
+    conn.commit()
+
+
+def asegurar_esquema(db_path=DATABASE_PATH):
+    """Crea las tablas, índices y triggers que falten, sin tocar la ocupación (a diferencia de inicializar_base_de_datos)."""
+    db_dir = os.path.dirname(db_path)
+    if db_dir: os.makedirs(db_dir, exist_ok=True)
+    conn = conectar(db_path)
+    try:
+        crear_esquema(conn)
+    finally:
+        conn.close()
+
+
+def inicializar_base_de_datos(db_path=DATABASE_PATH):
+    """
+    Inicializa la base de datos.
+    1. Asegura que el directorio, las tablas y los índices existan.
+    2. Limpia todos los estacionamientos, poniéndolos en estado 'Libre'.
+    """
+    db_dir = os.path.dirname(db_path)
+    if db_dir: os.makedirs(db_dir, exist_ok=True)
+
+    conn = conectar(db_path)
+    crear_esquema(conn)
+
+    # Limpiar el estado de todos los estacionamientos al iniciar la aplicación.
+    # Esto elimina reservas y ocupaciones de la sesión anterior.
+    print("[INFO] Limpiando estados de estacionamiento de la sesión anterior...")
+    conn.execute("""
+        UPDATE estacionamientos
+        SET
+            estado = 'Libre',
+            patente_ocupante = NULL,
+            hora_ingreso = NULL
+    """)
+
+    conn.commit()
+    conn.close()
+    print("[INFO] Base de datos inicializada y limpia en:", db_path)
+
+
+# --- Consultas de Acceso ---
+def check_user_in_db(conn, patente):
+    """Devuelve el tipo de usuario ('Estudiante'/'Profesor') de una patente activa, o None."""
+    cursor = conn.cursor()
+    cursor.execute("SELECT tipo FROM usuarios WHERE patente = ? AND activo = 1", (patente,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+@cronometrado("bd_reclamo_espacio")
+def reclamar_espacio_libre(conn, patente, hora):
+    """
+    Reserva atómicamente el primer espacio libre y devuelve su ID (o None si no hay).
+    Corre en una transacción IMMEDIATE: el lock de escritura se toma antes de elegir el
+    espacio, así dos escritores concurrentes nunca reservan el mismo.
+    """
+    propia = not conn.in_transaction
+    if propia: conn.execute("BEGIN IMMEDIATE")
+    try:
+        if _SOPORTA_RETURNING:
+            row = conn.execute("""
+                UPDATE estacionamientos
+                SET estado = 'Reservado', patente_ocupante = ?, hora_ingreso = ?
+                WHERE id_espacio = (
+                    SELECT id_espacio FROM estacionamientos
+                    WHERE estado = 'Libre' ORDER BY id_espacio LIMIT 1
+                )
+                RETURNING id_espacio
+            """, (patente, hora)).fetchone()
+        else:
+            row = conn.execute("SELECT id_espacio FROM estacionamientos WHERE estado = 'Libre' ORDER BY id_espacio LIMIT 1").fetchone()
+            if row:
+                conn.execute("UPDATE estacionamientos SET estado = 'Reservado', patente_ocupante = ?, hora_ingreso = ? WHERE id_espacio = ?",
+                             (patente, hora, row[0]))
+        if propia: conn.commit()
+    except Exception:
+        if propia: conn.rollback()
+        raise
+    return row[0] if row else None
+
+
+def asignar_espacio_libre(conn, patente, hora):
+    """Busca un espacio libre en la DB, lo ocupa y devuelve su ID."""
+    id_espacio = reclamar_espacio_libre(conn, patente, hora)
+    if id_espacio:
+        print(f"[INFO] [Acceso] Reservando espacio '{id_espacio}' para la patente '{patente}'.")
+    else:
+        print("[WARN] [Acceso] No hay espacios de estacionamiento libres.")
+    return id_espacio
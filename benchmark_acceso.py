@@ -0,0 +1,174 @@
+"""
+Benchmark sin interfaz del pipeline de acceso.
+
+Reproduce un video con la misma lógica de AccessControlTab (ProcesadorAcceso): detección de
+vehículos, detección de placas, OCR, `filtrar_patentes` y consulta de usuarios en la BD.
+Reporta latencias p50/p95/p99 por etapa, FPS de punta a punta, memoria RSS máxima y
+llamadas de OCR por patente confirmada, en JSON para comparar configuraciones.
+Con --grabar también guarda lo que devuelven los modelos, para reproducirlo con reproducir_acceso.py.
+
+Uso:
+    python benchmark_acceso.py --video entrada.mp4 --salida bench.json
+    python benchmark_acceso.py --video entrada.mp4 --grabar grabaciones/porton --salida base.json
+"""
+import argparse
+import contextlib
+import json
+import resource
+import sys
+import time
+from collections import defaultdict
+
+import cv2
+import numpy as np
+
+from acceso import ProcesadorAcceso
+from autorizacion import IndiceAutorizacion
+from base_datos import asegurar_esquema, check_user_in_db, conectar
+from configuracion import DATABASE_PATH, VIDEO_DISPLAY_SIZE, PAUSE_AFTER_DETECTION_MS
+from grabacion import ProcesadorGrabador
+from ocr import BACKENDS_OCR
+
+
+def resumir(muestras_s):
+    """Resume una lista de duraciones en segundos como percentiles en milisegundos."""
+    ms = np.asarray(muestras_s) * 1000.0
+    if ms.size == 0:
+        return {"n": 0}
+    return {
+        "n": int(ms.size),
+        "media_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+
+
+def rss_maximo_mb():
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KB, macOS bytes
+    return maxrss / (1024 * 1024) if sys.platform == "darwin" else maxrss / 1024
+
+
+def ejecutar(args):
+    asegurar_esquema(args.db)  # El índice de autorización lee versiones_tablas
+    indice = None if args.sin_indice_autorizacion else IndiceAutorizacion(args.db)
+    if args.grabar:
+        procesador = ProcesadorGrabador(args.grabar, args.ocr_backend, indice_autorizacion=indice)
+    else:
+        procesador = ProcesadorAcceso(args.ocr_backend, indice_autorizacion=indice)
+    if args.sin_movimiento: procesador.motion_gating = False
+    if args.sin_recorte_zona: procesador.zone_crop_inference = False
+    if args.sin_calidad: procesador.calidad_ocr = False
+
+    tiempos = defaultdict(list)
+    procesador.on_tiempo = lambda etapa, s: tiempos[etapa].append(s)
+    conn = conectar(args.db)
+
+    cap = cv2.VideoCapture(args.video)
+    if not cap.isOpened():
+        raise SystemExit(f"[ERROR] No se pudo abrir el video: {args.video}")
+    fps_video = cap.get(cv2.CAP_PROP_FPS)
+    if not 0 < fps_video <= 120: fps_video = 30.0
+    # Al grabar, el cooldown usa el tiempo del video: la reproducción lo repite sin depender de la velocidad
+    if args.grabar: procesador.reloj = lambda: frames / fps_video
+    # Igual que la GUI: tras una confirmación la detección se pausa PAUSE_AFTER_DETECTION_MS
+    frames_pausa = 0 if args.sin_pausa else int(round(PAUSE_AFTER_DETECTION_MS / 1000.0 * fps_video))
+
+    confirmaciones, frames, pausa_restante = [], 0, 0
+    inicio = time.perf_counter()
+    while args.max_frames is None or frames < args.max_frames:
+        t_frame = time.perf_counter()
+        ret, frame = cap.read()
+        if not ret: break
+        tiempos["decodificacion"].append(time.perf_counter() - t_frame)
+        frames += 1
+
+        t0 = time.perf_counter()
+        display_frame = cv2.resize(frame, VIDEO_DISPLAY_SIZE, interpolation=cv2.INTER_AREA)
+        tiempos["escalado_pantalla"].append(time.perf_counter() - t0)
+
+        if pausa_restante > 0:
+            pausa_restante -= 1
+            if args.grabar: procesador.grabar(frame)
+        else:
+            confirmado = procesador.process_frame_with_zone(frame, display_frame)
+            if confirmado:
+                # Igual que la GUI: se corrige la patente y el cooldown se reclama sobre la corregida
+                t0 = time.perf_counter()
+                if indice is not None:
+                    patente, tipo_usuario = indice.tipo_usuario(confirmado[0])
+                else:
+                    patente, tipo_usuario = confirmado[0], check_user_in_db(conn, confirmado[0])
+                tiempos["consulta_bd"].append(time.perf_counter() - t0)
+            if confirmado and procesador.claim_cooldown(patente):
+                confirmaciones.append({"frame": frames, "patente": patente,
+                                       "tipo_vehiculo": confirmado[1], "tipo_usuario": tipo_usuario})
+                pausa_restante = frames_pausa
+        procesador.clean_cooldown_list()
+        tiempos["punta_a_punta"].append(time.perf_counter() - t_frame)
+    duracion = time.perf_counter() - inicio
+    cap.release()
+    conn.close()
+    if args.grabar:
+        procesador.cerrar(video=args.video, fps=fps_video)
+
+    return {
+        "video": args.video,
+        "configuracion": {
+            "ocr_backend": procesador.ocr_backend.nombre,
+            "compuerta_movimiento": procesador.motion_gating,
+            "recorte_zona": procesador.zone_crop_inference,
+            "compuerta_calidad": procesador.calidad_ocr,
+            "pausa_tras_confirmacion": not args.sin_pausa,
+        },
+        "frames": frames,
+        "frames_omitidos_sin_movimiento": procesador.frames_omitidos,
+        "duracion_s": round(duracion, 3),
+        "fps": round(frames / duracion, 2) if duracion > 0 else 0.0,
+        "rss_maximo_mb": round(rss_maximo_mb(), 1),
+        "ocr_llamadas": procesador.ocr_llamadas,
+        "patentes_confirmadas": len(confirmaciones),
+        "ocr_llamadas_por_confirmacion": (round(procesador.ocr_llamadas / len(confirmaciones), 2)
+                                          if confirmaciones else None),
+        "ocr": procesador.estadisticas_ocr(),
+        # Al grabar, cada frame corre todos los modelos: las etapas de modelos miden eso, no el pipeline con compuertas
+        "grabacion": {"directorio": args.grabar, "ocr_llamadas": procesador.ocr_llamadas_grabacion} if args.grabar else None,
+        "etapas": {etapa: resumir(muestras) for etapa, muestras in tiempos.items()},
+        "confirmaciones": confirmaciones,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sin interfaz del pipeline de control de acceso.")
+    parser.add_argument("--video", required=True, help="Archivo de video a reproducir")
+    parser.add_argument("--db", default=DATABASE_PATH, help="Base de datos para la consulta de usuarios")
+    parser.add_argument("--ocr-backend", default=None, choices=list(BACKENDS_OCR))
+    parser.add_argument("--max-frames", type=int, default=None)
+    parser.add_argument("--sin-movimiento", action="store_true", help="Desactiva la compuerta de movimiento")
+    parser.add_argument("--sin-recorte-zona", action="store_true", help="Detecta vehículos en el frame completo")
+    parser.add_argument("--sin-calidad", action="store_true",
+                        help="Envía al OCR cada recorte de placa, sin compuerta de calidad ni mejor toma")
+    parser.add_argument("--sin-indice-autorizacion", action="store_true",
+                        help="Consulta usuarios con SQL exacto en lugar del índice tolerante a confusiones")
+    parser.add_argument("--sin-pausa", action="store_true", help="No pausar la detección tras una confirmación")
+    parser.add_argument("--grabar", default=None, metavar="DIR",
+                        help="Graba las salidas de los modelos de cada frame en DIR (ver grabacion.py)")
+    parser.add_argument("--salida", default=None, help="Ruta del JSON de resultados (por defecto stdout)")
+    args = parser.parse_args()
+
+    # Los mensajes de carga de modelos van a stderr para que stdout sea JSON válido
+    with contextlib.redirect_stdout(sys.stderr):
+        reporte = ejecutar(args)
+    texto = json.dumps(reporte, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(texto)
+        print(f"[INFO] Resultados guardados en {args.salida}", file=sys.stderr)
+    else:
+        print(texto)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+import math
+
+import cv2
+
+from configuracion import (
+    CALIDAD_ANCHO_MIN, CALIDAD_ALTO_MIN, CALIDAD_ALTO_REF, CALIDAD_NITIDEZ_REF,
+    CALIDAD_CONTRASTE_REF, CALIDAD_ASPECTO_IDEAL
+)
+
+
+def calidad_roi(roi):
+    """
+    Puntaje barato (0 a 1) de qué tan legible es un recorte de placa, para decidir si vale un OCR.
+    Combina tamaño, nitidez (varianza del Laplaciano), contraste (desviación del gris) y la
+    proporción ancho/alto frente a la de una placa. Recortes diminutos o con proporción
+    imposible valen 0 sin más cálculo.
+    """
+    h, w = roi.shape[:2]
+    if w < CALIDAD_ANCHO_MIN or h < CALIDAD_ALTO_MIN: return 0.0
+    # Proporción: 1 en la ideal, 0 a partir del doble o la mitad
+    aspecto = 1.0 - abs(math.log((w / h) / CALIDAD_ASPECTO_IDEAL)) / math.log(2)
+    if aspecto <= 0: return 0.0
+
+    gris = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY) if roi.ndim == 3 else roi
+    nitidez = min(cv2.Laplacian(gris, cv2.CV_64F).var() / CALIDAD_NITIDEZ_REF, 1.0)
+    contraste = min(float(gris.std()) / CALIDAD_CONTRASTE_REF, 1.0)
+    tamano = min(h / CALIDAD_ALTO_REF, 1.0)
+    return 0.35 * nitidez + 0.25 * contraste + 0.2 * tamano + 0.2 * aspecto
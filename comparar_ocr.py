@@ -0,0 +1,126 @@
+"""
+Compara latencia y precisión de los backends de OCR sobre las placas del split de test de carpat-1.
+
+Las placas se recortan con las cajas etiquetadas (formato YOLO) para medir solo el OCR.
+El dataset no trae el texto de las patentes, así que la precisión se reporta como tasa de
+lecturas válidas (pasan `filtrar_patentes`) y acuerdo con el backend 'completo'. Con
+--etiquetas (CSV `imagen,patente`) se calcula además la exactitud contra la verdad.
+
+Uso:
+    python comparar_ocr.py --split models/carpat-1/test --json comparacion_ocr.json
+"""
+import argparse
+import csv
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+from configuracion import OCR_REC_BATCH_SIZE
+from ocr import BACKENDS_OCR, crear_backend_ocr
+
+BACKEND_REFERENCIA = "completo"
+
+
+def cargar_placas(split_dir, limite=None):
+    """Devuelve [(nombre_imagen, roi)] con cada placa etiquetada del split."""
+    images_dir = os.path.join(split_dir, "images")
+    labels_dir = os.path.join(split_dir, "labels")
+    placas = []
+    for nombre in sorted(os.listdir(images_dir)):
+        label_path = os.path.join(labels_dir, os.path.splitext(nombre)[0] + ".txt")
+        if not os.path.exists(label_path): continue
+        img = cv2.imread(os.path.join(images_dir, nombre))
+        if img is None: continue
+        h, w = img.shape[:2]
+        with open(label_path) as f:
+            for linea in f:
+                partes = linea.split()
+                if len(partes) < 5: continue
+                cx, cy, bw, bh = (float(v) for v in partes[1:5])
+                x1, y1 = max(int((cx - bw / 2) * w), 0), max(int((cy - bh / 2) * h), 0)
+                x2, y2 = min(int((cx + bw / 2) * w), w), min(int((cy + bh / 2) * h), h)
+                if x2 > x1 and y2 > y1:
+                    placas.append((nombre, img[y1:y2, x1:x2].copy()))
+        if limite and len(placas) >= limite: break
+    return placas[:limite] if limite else placas
+
+
+def cargar_etiquetas(path):
+    if not path: return {}
+    with open(path, newline="") as f:
+        return {fila[0]: fila[1].strip().upper() for fila in csv.reader(f) if len(fila) >= 2}
+
+
+def medir_backend(backend, rois, batch_size):
+    """Corre el backend sobre todos los ROIs. Devuelve (lecturas, latencias por ROI en ms)."""
+    backend.leer_patentes(rois[:1])  # Calentamiento
+    # La ruta completa procesa un ROI por llamada, como en el pipeline original
+    paso = batch_size if backend.nombre != "completo" else 1
+    lecturas, latencias = [], []
+    for i in range(0, len(rois), paso):
+        lote = rois[i:i + paso]
+        t0 = time.perf_counter()
+        lecturas.extend(backend.leer_patentes(lote))
+        transcurrido_ms = (time.perf_counter() - t0) * 1000
+        latencias.extend([transcurrido_ms / len(lote)] * len(lote))
+    return lecturas, latencias
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Comparación de backends de OCR para placas recortadas.")
+    parser.add_argument("--split", default="models/carpat-1/test", help="Directorio con images/ y labels/")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS_OCR), choices=list(BACKENDS_OCR))
+    parser.add_argument("--batch", type=int, default=OCR_REC_BATCH_SIZE, help="ROIs por llamada en backends con batch")
+    parser.add_argument("--limite", type=int, default=None, help="Máximo de placas a evaluar")
+    parser.add_argument("--etiquetas", default=None, help="CSV opcional imagen,patente con la verdad")
+    parser.add_argument("--json", default=None, help="Ruta donde guardar el reporte en JSON")
+    args = parser.parse_args()
+
+    placas = cargar_placas(args.split, args.limite)
+    etiquetas = cargar_etiquetas(args.etiquetas)
+    nombres = [nombre for nombre, _ in placas]
+    rois = [roi for _, roi in placas]
+    print(f"[INFO] {len(rois)} placas cargadas desde {args.split}")
+
+    lecturas_por_backend, reporte = {}, {"split": args.split, "placas": len(rois), "backends": {}}
+    for nombre_backend in args.backends:
+        print(f"[INFO] Evaluando backend '{nombre_backend}'...")
+        lecturas, latencias = medir_backend(crear_backend_ocr(nombre_backend), rois, args.batch)
+        lecturas_por_backend[nombre_backend] = lecturas
+        validas = sum(1 for p in lecturas if p)
+        resultado = {
+            "latencia_ms_media": float(np.mean(latencias)) if latencias else 0.0,
+            "latencia_ms_p50": float(np.percentile(latencias, 50)) if latencias else 0.0,
+            "latencia_ms_p95": float(np.percentile(latencias, 95)) if latencias else 0.0,
+            "placas_por_segundo": 1000.0 * len(latencias) / sum(latencias) if latencias else 0.0,
+            "tasa_validas": validas / len(rois) if rois else 0.0,
+        }
+        if etiquetas:
+            evaluadas = [(p, etiquetas[n]) for n, p in zip(nombres, lecturas) if n in etiquetas]
+            resultado["exactitud"] = sum(p == gt for p, gt in evaluadas) / len(evaluadas) if evaluadas else 0.0
+        reporte["backends"][nombre_backend] = resultado
+
+    referencia = lecturas_por_backend.get(BACKEND_REFERENCIA)
+    if referencia:
+        for nombre_backend, lecturas in lecturas_por_backend.items():
+            pares = [(a, b) for a, b in zip(lecturas, referencia) if b]
+            reporte["backends"][nombre_backend]["acuerdo_con_referencia"] = (
+                sum(a == b for a, b in pares) / len(pares) if pares else 0.0)
+
+    print(f"\n{'Backend':<10} {'media ms':>9} {'p50 ms':>8} {'p95 ms':>8} {'placas/s':>9} {'válidas':>8} {'acuerdo':>8}")
+    for nombre_backend, r in reporte["backends"].items():
+        print(f"{nombre_backend:<10} {r['latencia_ms_media']:>9.1f} {r['latencia_ms_p50']:>8.1f} "
+              f"{r['latencia_ms_p95']:>8.1f} {r['placas_por_segundo']:>9.1f} {r['tasa_validas']:>8.1%} "
+              f"{r.get('acuerdo_con_referencia', 0.0):>8.1%}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(reporte, f, indent=2)
+        print(f"[INFO] Reporte guardado en {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+# --- Configuración Global ---
+# Modelos de Acceso
+MODELO_PLACAS_PATH = 'models/runs/detect/placas_v112/weights/best.pt'
+MODELO_VEHICULOS_PATH = "models/best_type.pt"
+# Modelo de Monitoreo de Estacionamiento
+MODELO_PARKING_SLOTS_PATH = 'models/parkinslotrun/parking/weights/best.pt'
+MODEL_BACKEND = "pytorch"  # "pytorch", "onnx" u "openvino" (los dos últimos exportados con exportar_modelos.py)
+MODEL_INT8 = False         # Usar la variante cuantizada INT8 si fue exportada
+
+# Base de datos
+DATABASE_PATH = 'database/estacionamiento.db'
+DB_BUSY_TIMEOUT_S = 10  # Espera por el lock de escritura antes de fallar
+EVENTOS_MAX_LOTE = 200   # Eventos de acceso por transacción del hilo escritor
+EVENTOS_FLUSH_S = 1.0    # Espera máxima antes de escribir un lote incompleto
+
+# Monitoreo de Espacios
+CAMARA_MONITOREO = "principal"           # Clave de la geometría calibrada en la BD
+MONITOREO_MODO = "detecciones"           # "detecciones": detector completo + emparejamiento; "recortes": clasifica cada espacio calibrado
+MODELO_CLASIFICADOR_ESPACIOS_PATH = None # Clasificador libre/ocupado, obligatorio para el modo "recortes"
+SLOT_CROP_SIZE = 96                      # Lado de cada recorte de espacio en el lote de clasificación
+SLOT_MATCH_IOU = 0.3                     # IoU mínimo para asignar una detección a un espacio calibrado
+MONITOREO_INTERVALO_S = 1.0              # Cada cuánto se muestrea un frame del video de monitoreo
+MONITOREO_VENTANA = 5                    # Observaciones recientes que votan el estado de cada espacio
+MONITOREO_VOTOS_MINIMOS = 4              # Votos necesarios para cambiar de estado (histéresis)
+
+# Parámetros de Detección de Acceso
+CONFIDENCE_THRESHOLD_PLACAS = 0.6
+CONFIDENCE_THRESHOLD_VEHICLE = 0.5
+NOMBRES_VEHICULOS = [
+    "Persona", "Auto", "Bicicleta", "Bus", "Bus Interurbano",
+    "Bus Articulado", "Camion", "Camionmas2ejes", "Ciclos", "Minibus rural",
+    "Moto", "Taxi basico", "Taxi Bus Publico", "Taxi Colectivo", "Taxi bus privado",
+    "Transporte Escolar", "Semáforo", "Camioneta (Pickup)"
+]
+CLASES_VEHICULOS_ACCESO = [1, 10, 11, 12, 13, 14, 15, 17]
+CONFIRMATION_THRESHOLD = 4
+CONFIRMATION_THRESHOLD_REGISTRADA = 2  # Votos que bastan cuando la lectura coincide fuertemente con una patente registrada
+PAUSE_AFTER_DETECTION_MS = 3000
+VIDEO_DISPLAY_SIZE = (800, 450)
+OCR_CONFIDENCE_THRESHOLD = 0.6
+OCR_BACKEND = "solo_rec"  # "solo_rec" (solo reconocimiento, en batch) o "completo" (det + cls + rec)
+OCR_REC_BATCH_SIZE = 8
+COOLDOWN_SECONDS = 15 # Reducido para pruebas más rápidas
+
+# Índice de autorización en memoria, tolerante a confusiones de OCR (O/0, B/8, I/1, S/5, ...)
+AUTORIZACION_MAX_EDICIONES = 2      # Radio de búsqueda en el árbol BK (ediciones de Levenshtein)
+AUTORIZACION_PUNTAJE_MINIMO = 0.9   # Puntaje para aceptar una patente registrada (solo diferencias por confusiones)
+AUTORIZACION_PUNTAJE_TEMPRANO = 0.95  # Puntaje para votar por la registrada y confirmar con CONFIRMATION_THRESHOLD_REGISTRADA
+AUTORIZACION_REVISION_S = 2.0       # Cada cuánto se revisa si la tabla de usuarios cambió
+TRACKER_IOU_THRESHOLD = 0.3  # IoU mínimo para asociar una detección a un track existente
+TRACKER_MAX_MISSES = 15      # Frames sin detección antes de descartar un track
+PLATE_BATCH_IMGSZ = 640  # Lado del letterbox con que se agrupan los recortes de vehículos
+
+# Compuerta de calidad y mejor toma antes del OCR
+CALIDAD_OCR = True
+CALIDAD_MINIMA = 0.35          # Puntaje (0-1) bajo el cual un recorte de placa no pasa al OCR
+CALIDAD_VENTANA_FRAMES = 3     # Tomas válidas que se juntan por vehículo antes de elegir las mejores
+OCR_TOP_K = 2                  # Mejores tomas de cada ventana que van al OCR
+CALIDAD_ANCHO_MIN = 40         # Recortes más chicos (px) no se leen
+CALIDAD_ALTO_MIN = 12
+CALIDAD_ALTO_REF = 40          # Altura (px) desde la cual el tamaño ya no suma
+CALIDAD_NITIDEZ_REF = 300.0    # Varianza del Laplaciano considerada nítida
+CALIDAD_CONTRASTE_REF = 50.0   # Desviación estándar del gris considerada buen contraste
+CALIDAD_ASPECTO_IDEAL = 2.8    # Ancho/alto de una placa (36 x 13 cm)
+
+# Inferencia multi-resolución: detección sobre la zona, placas desde el frame original
+ZONE_CROP_INFERENCE = True
+ZONE_CROP_PADDING_PX = 120  # Margen (en píxeles de pantalla) alrededor de la zona para no cortar vehículos
+VEHICLE_INFER_SIZE = 480    # Tamaño de inferencia del detector de vehículos (múltiplo de 32)
+
+# Compuerta de movimiento en la zona de detección
+MOTION_GATING = True
+MOTION_DOWNSCALE = 0.25        # Escala del recorte en gris usado para comparar
+MOTION_PIXEL_THRESHOLD = 25    # Diferencia mínima (0-255) para contar un píxel como cambiado
+MOTION_MIN_FRACTION = 0.01     # Fracción de píxeles cambiados que se considera movimiento
+MOTION_BG_ALPHA = 0.05         # Velocidad de adaptación del fondo
+MOTION_HEARTBEAT_FRAMES = 30   # Con la zona quieta, detectar igual cada N frames
+
+# Pipeline de Acceso (captura -> inferencia -> render)
+CAPTURE_RING_SLOTS = 4   # Frames decodificados preasignados; la inferencia toma siempre el último
+RENDER_RING_SLOTS = 3    # Frames de pantalla anotados: uno en escritura, uno mostrado y uno listo
+RENDER_INTERVAL_MS = None  # None = al ritmo de refresco de la pantalla
+INGRESOS_RECIENTES_MAX = 500  # Filas de la tabla de ingresos recientes
+
+# Diagnóstico (ver metricas.py)
+METRICAS_REFRESCO_MS = 1000        # Refresco del panel de diagnóstico
+METRICAS_ARCHIVO_PROMETHEUS = None  # Ruta .prom para el textfile collector de node_exporter (None = no escribir)
+
+# Servidor de inferencia compartido (agrupa solicitudes de todas las pestañas/cámaras)
+INFERENCE_MAX_BATCH = {"vehiculos": 8, "placas": 16, "parking": 64}
+INFERENCE_MAX_WAIT_MS = 5  # Espera máxima desde la primera solicitud antes de ejecutar el batch
+INFERENCE_TIMEOUT_S = 120  # Espera máxima de un resultado (incluye la carga del modelo al arrancar)
+
+# Multi-cámara: un proceso por portón, p. ej. {"id": "norte", "fuente": "videos/norte.mp4"}
+CAMARAS_ACCESO = []
+CAMARA_ACCESO_GUI = "principal"  # Cámara con que la pestaña de acceso firma sus eventos
+MULTICAM_THREADS_PER_WORKER = 1  # Hilos de OpenCV/torch por proceso, para no sobre-suscribir núcleos
+MULTICAM_RECONEXION_INICIAL_S = 1.0  # Espera antes de reabrir una transmisión caída (se duplica en cada fallo)
+MULTICAM_RECONEXION_MAX_S = 30.0
+MULTICAM_METRICAS_S = 2.0  # Cada cuánto cada proceso envía sus métricas por etapa al coordinador
+
+# Servicio sin interfaz (servicio.py): API HTTP/WebSocket local
+API_HOST = "127.0.0.1"
+API_PUERTO = 8765
+API_COLA_CLIENTE = 256  # Deltas pendientes por cliente WebSocket antes de desconectarlo por lento
@@ -0,0 +1,94 @@
+"""
+Prueba de estrés de la asignación de espacios con escritores concurrentes.
+
+Crea una base temporal con N espacios libres y lanza varios reclamadores (hilos o procesos),
+cada uno con su propia conexión, que reservan espacios hasta agotarlos. Verifica que ningún
+espacio quede asignado dos veces y reporta las asignaciones por segundo logradas.
+
+Uso:
+    python estres_asignacion.py --espacios 2000 --reclamadores 8 [--procesos]
+"""
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from base_datos import conectar, crear_esquema, reclamar_espacio_libre
+
+
+def preparar_base(db_path, n_espacios):
+    conn = conectar(db_path)
+    crear_esquema(conn)
+    conn.executemany("INSERT INTO estacionamientos (id_espacio, estado) VALUES (?, 'Libre')",
+                     [(f"E-{i:05d}",) for i in range(1, n_espacios + 1)])
+    conn.commit()
+    conn.close()
+
+
+def reclamador(db_path, nombre, resultados, inicio):
+    """Reserva espacios hasta que no quede ninguno y devuelve los IDs obtenidos."""
+    conn = conectar(db_path)
+    inicio.wait()
+    obtenidos, n = [], 0
+    while True:
+        n += 1
+        id_espacio = reclamar_espacio_libre(conn, f"{nombre}-{n}", "00:00:00")
+        if id_espacio is None: break
+        obtenidos.append(id_espacio)
+    conn.close()
+    resultados.put((nombre, obtenidos))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estrés de reclamar_espacio_libre con escritores concurrentes.")
+    parser.add_argument("--espacios", type=int, default=2000)
+    parser.add_argument("--reclamadores", type=int, default=8)
+    parser.add_argument("--procesos", action="store_true", help="Usar procesos en lugar de hilos")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "estres.db")
+        preparar_base(db_path, args.espacios)
+
+        if args.procesos:
+            ctx = mp.get_context("spawn")
+            resultados, inicio = ctx.Queue(), ctx.Event()
+            trabajadores = [ctx.Process(target=reclamador, args=(db_path, f"P{i}", resultados, inicio))
+                            for i in range(args.reclamadores)]
+        else:
+            import queue
+            resultados, inicio = queue.Queue(), threading.Event()
+            trabajadores = [threading.Thread(target=reclamador, args=(db_path, f"H{i}", resultados, inicio))
+                            for i in range(args.reclamadores)]
+
+        for t in trabajadores: t.start()
+        t0 = time.perf_counter()
+        inicio.set()
+        asignaciones = [resultados.get() for _ in trabajadores]
+        duracion = time.perf_counter() - t0
+        for t in trabajadores: t.join()
+
+        ids = [i for _, obtenidos in asignaciones for i in obtenidos]
+        duplicados = [i for i, n in Counter(ids).items() if n > 1]
+        conn = conectar(db_path)
+        reservados = conn.execute("SELECT COUNT(*) FROM estacionamientos WHERE estado = 'Reservado'").fetchone()[0]
+        conn.close()
+
+    print(f"Reclamadores: {args.reclamadores} ({'procesos' if args.procesos else 'hilos'})")
+    for nombre, obtenidos in sorted(asignaciones):
+        print(f"  {nombre}: {len(obtenidos)} espacios")
+    print(f"Asignaciones: {len(ids)} de {args.espacios} espacios, reservados en BD: {reservados}")
+    print(f"Asignaciones dobles: {len(duplicados)}")
+    print(f"Tiempo: {duracion:.2f} s -> {len(ids) / duracion:.0f} asignaciones/s")
+
+    ok = not duplicados and len(ids) == args.espacios == reservados
+    print("RESULTADO:", "OK" if ok else "FALLO")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
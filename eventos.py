@@ -0,0 +1,114 @@
+import datetime
+import queue
+import threading
+import time
+from collections import namedtuple
+
+from base_datos import conectar
+from configuracion import DATABASE_PATH, EVENTOS_MAX_LOTE, EVENTOS_FLUSH_S
+from metricas import cronometrado
+
+# Un acceso confirmado; `ts` es ISO 8601 local con segundos (p. ej. '2024-05-02T14:03:27')
+Evento = namedtuple("Evento", ["ts", "patente", "tipo_vehiculo", "tipo_usuario", "id_espacio", "camara", "confianza"])
+
+
+def nuevo_evento(patente, tipo_vehiculo, tipo_usuario, id_espacio, camara, confianza=None, ts=None):
+    """Crea un Evento con la fecha y hora completas (ahora, o el timestamp epoch `ts`)."""
+    momento = datetime.datetime.fromtimestamp(ts) if ts is not None else datetime.datetime.now()
+    return Evento(momento.isoformat(timespec="seconds"), patente, tipo_vehiculo, tipo_usuario,
+                  id_espacio, camara, confianza)
+
+
+@cronometrado("bd_eventos")
+def escribir_eventos(conn, eventos):
+    """
+    Inserta un lote de eventos y actualiza los agregados por hora en una sola transacción.
+    Los agregados se suman en memoria primero: una fila de eventos_por_hora por (hora, cámara) del lote.
+    """
+    if not eventos: return
+    agregados = {}
+    for e in eventos:
+        fila = agregados.setdefault((e.ts[:13], e.camara or ''), [0, 0, 0])  # hora 'YYYY-MM-DDTHH'
+        fila[0] += 1
+        if e.tipo_usuario: fila[1] += 1
+        if e.id_espacio: fila[2] += 1
+
+    with conn:
+        conn.executemany("""INSERT INTO eventos (ts, patente, tipo_vehiculo, tipo_usuario, id_espacio, camara, confianza)
+                            VALUES (?, ?, ?, ?, ?, ?, ?)""", eventos)
+        conn.executemany("""
+            INSERT INTO eventos_por_hora (hora, camara, ingresos, autorizados, asignados) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(hora, camara) DO UPDATE SET
+                ingresos = ingresos + excluded.ingresos,
+                autorizados = autorizados + excluded.autorizados,
+                asignados = asignados + excluded.asignados
+        """, [clave + tuple(fila) for clave, fila in agregados.items()])
+
+
+def ingresos_por_hora(conn, desde, hasta, camara=None):
+    """
+    Reporte histórico desde los agregados (no recorre la tabla de eventos).
+    `desde`/`hasta` son prefijos ISO ('2024-05-01', '2024-05-01T08'); `hasta` es exclusivo.
+    """
+    sql = "SELECT hora, SUM(ingresos), SUM(autorizados), SUM(asignados) FROM eventos_por_hora WHERE hora >= ? AND hora < ?"
+    params = [desde[:13], hasta[:13]]
+    if camara is not None:
+        sql += " AND camara = ?"
+        params.append(camara)
+    return conn.execute(sql + " GROUP BY hora ORDER BY hora", params).fetchall()
+
+
+def historial_patente(conn, patente, limite=50):
+    """Últimos accesos de una patente, usando el índice (patente, ts)."""
+    return conn.execute("SELECT * FROM eventos WHERE patente = ? ORDER BY ts DESC LIMIT ?", (patente, limite)).fetchall()
+
+
+class EscritorEventos(threading.Thread):
+    """
+    Hilo escritor del registro de accesos. `registrar()` solo encola y vuelve de inmediato;
+    el hilo agrupa hasta EVENTOS_MAX_LOTE eventos o EVENTOS_FLUSH_S segundos por transacción,
+    con su propia conexión, para que la GUI y los trabajadores nunca esperen a la BD.
+    """
+    def __init__(self, db_path=DATABASE_PATH, max_lote=EVENTOS_MAX_LOTE, flush_s=EVENTOS_FLUSH_S):
+        super().__init__(name="escritor-eventos", daemon=True)
+        self.db_path = db_path
+        self.max_lote = max_lote
+        self.flush_s = flush_s
+        self.cola = queue.Queue()
+        self.escritos = 0
+        self.transacciones = 0
+
+    def registrar(self, evento):
+        self.cola.put(evento)
+
+    def run(self):
+        conn = conectar(self.db_path)
+        detener = False
+        while not detener:
+            primero = self.cola.get()
+            if primero is None: break
+            lote = [primero]
+            limite = time.perf_counter() + self.flush_s
+            while len(lote) < self.max_lote:
+                restante = limite - time.perf_counter()
+                if restante <= 0: break
+                try:
+                    evento = self.cola.get(timeout=restante)
+                except queue.Empty:
+                    break
+                if evento is None:
+                    detener = True
+                    break
+                lote.append(evento)
+            try:
+                escribir_eventos(conn, lote)
+                self.escritos += len(lote)
+                self.transacciones += 1
+            except Exception as e:
+                print(f"[ERROR] [Eventos] No se pudieron escribir {len(lote)} eventos: {e}")
+        conn.close()
+
+    def detener(self):
+        """Escribe lo pendiente y termina el hilo."""
+        self.cola.put(None)
+        self.join(timeout=10)
@@ -0,0 +1,193 @@
+"""
+Exporta los modelos YOLO a ONNX y OpenVINO (FP32 e INT8) y compara latencia y mAP por backend.
+
+La cuantización INT8 es post-entrenamiento y se calibra con la partición train de models/carpat-1:
+ONNX con onnxruntime.quantization (estática, QDQ) y OpenVINO con NNCF vía ultralytics. La latencia
+y el mAP se miden sobre la partición de validación, que nunca se usa para calibrar.
+El reporte indica, por modelo, la variante más rápida cuyo mAP50-95 medido no cae más de
+--tolerancia-map respecto de PyTorch; esa es la que conviene poner en MODEL_BACKEND / MODEL_INT8.
+Un modelo sin datos de evaluación (--datos) queda en PyTorch, marcado como no validado.
+
+Uso:
+    python exportar_modelos.py --modelos placas vehiculos --int8 --reporte reporte_modelos.json
+    python exportar_modelos.py --solo-reporte --datos vehiculos=datasets/vehiculos/data.yaml
+"""
+import argparse
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+from ultralytics import YOLO
+
+from acceso import letterbox
+from backends_modelo import ruta_exportada
+from benchmark_acceso import resumir
+from servidor_inferencia import MODELOS_SERVIDOR
+
+DATOS_CALIBRACION = "models/carpat-1/data.yaml"
+IMAGENES_CALIBRACION = "models/carpat-1/train/images"
+IMAGENES_LATENCIA = "models/carpat-1/valid/images"  # Distintas de las de calibración
+# Datos de evaluación por defecto: solo el modelo de placas se entrenó con carpat-1
+DATOS_EVALUACION = {"placas": DATOS_CALIBRACION}
+
+
+def datos_calibracion(ruta_yaml):
+    """
+    Copia del data.yaml con `val` apuntando a `train`, junto al original (las rutas relativas no cambian):
+    ultralytics calibra INT8 con la partición `val`, que queda reservada para evaluar el mAP.
+    """
+    import yaml
+    with open(ruta_yaml, encoding="utf-8") as f:
+        datos = yaml.safe_load(f)
+    datos["val"] = datos["train"]
+    ruta = os.path.join(os.path.dirname(ruta_yaml), "data_calibracion.yaml")
+    with open(ruta, "w", encoding="utf-8") as f:
+        yaml.safe_dump(datos, f, allow_unicode=True)
+    return ruta
+
+
+def listar_imagenes(directorio, limite):
+    nombres = sorted(n for n in os.listdir(directorio) if n.lower().endswith((".jpg", ".jpeg", ".png")))
+    return [os.path.join(directorio, n) for n in nombres[:limite]]
+
+
+def preprocesar(path, imgsz):
+    """Misma entrada que ve el modelo exportado: letterbox, RGB, CHW, float32 en [0, 1]."""
+    lienzo, _, _ = letterbox(cv2.imread(path), imgsz)
+    return np.ascontiguousarray(lienzo[:, :, ::-1].transpose(2, 0, 1)[None], dtype=np.float32) / 255.0
+
+
+def cuantizar_onnx(ruta_onnx, ruta_int8, imagenes, imgsz):
+    """Cuantización estática INT8 (QDQ, pesos por canal) calibrada con `imagenes`."""
+    import onnxruntime as ort
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    nombre_entrada = ort.InferenceSession(ruta_onnx, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+
+    class LectorCalibracion(CalibrationDataReader):
+        def __init__(self):
+            self._iter = iter(imagenes)
+
+        def get_next(self):
+            path = next(self._iter, None)
+            return None if path is None else {nombre_entrada: preprocesar(path, imgsz)}
+
+    quantize_static(ruta_onnx, ruta_int8, LectorCalibracion(), quant_format=QuantFormat.QDQ,
+                    per_channel=True, activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+
+
+def exportar(nombre, ruta_pt, args, imagenes):
+    modelo = YOLO(ruta_pt)
+    if "onnx" in args.formatos:
+        print(f"[INFO] [Exportar] {nombre}: ONNX...")
+        ruta_onnx = modelo.export(format="onnx", imgsz=args.imgsz, dynamic=True, simplify=True)
+        if args.int8:
+            print(f"[INFO] [Exportar] {nombre}: ONNX INT8 ({len(imagenes)} imágenes de calibración)...")
+            cuantizar_onnx(ruta_onnx, ruta_exportada(ruta_pt, "onnx", int8=True), imagenes, args.imgsz)
+    if "openvino" in args.formatos:
+        print(f"[INFO] [Exportar] {nombre}: OpenVINO...")
+        modelo.export(format="openvino", imgsz=args.imgsz, dynamic=True)
+        if args.int8:
+            print(f"[INFO] [Exportar] {nombre}: OpenVINO INT8...")
+            modelo.export(format="openvino", imgsz=args.imgsz, int8=True, data=datos_calibracion(args.calibracion))
+
+
+def medir_variante(ruta, imagenes, imgsz, datos):
+    """Latencia por imagen (batch 1, tras calentamiento) y, si hay datos etiquetados, mAP."""
+    modelo = YOLO(ruta)
+    modelo(imagenes[0], imgsz=imgsz, verbose=False)
+    latencias = []
+    for path in imagenes:
+        img = cv2.imread(path)
+        t0 = time.perf_counter()
+        modelo(img, imgsz=imgsz, verbose=False)
+        latencias.append(time.perf_counter() - t0)
+    resultado = {"ruta": ruta, "latencia": resumir(latencias)}
+    if datos:
+        metricas = modelo.val(data=datos, imgsz=imgsz, batch=1, plots=False, verbose=False)
+        resultado["map50"] = round(float(metricas.box.map50), 4)
+        resultado["map50_95"] = round(float(metricas.box.map), 4)
+    return resultado
+
+
+def recomendar(variantes, tolerancia):
+    """
+    (variante, validada): la más rápida (p50) cuyo mAP50-95 medido queda a `tolerancia` o menos de PyTorch.
+    Sin mAP de PyTorch no hay contra qué validar y se recomienda PyTorch; sin mAP propio, la variante no califica.
+    """
+    base = variantes.get("pytorch", {}).get("map50_95")
+    if base is None:
+        return "pytorch", False
+    aceptables = [(v["latencia"]["p50_ms"], nombre) for nombre, v in variantes.items()
+                  if v.get("map50_95") is not None and v["map50_95"] >= base - tolerancia]
+    return min(aceptables)[1], True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exportación ONNX/OpenVINO, cuantización INT8 y reporte por backend.")
+    parser.add_argument("--modelos", nargs="+", default=list(MODELOS_SERVIDOR), choices=list(MODELOS_SERVIDOR))
+    parser.add_argument("--formatos", nargs="+", default=["onnx", "openvino"], choices=["onnx", "openvino"])
+    parser.add_argument("--int8", action="store_true", help="Generar también las variantes cuantizadas INT8")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--calibracion", default=DATOS_CALIBRACION,
+                        help="data.yaml de calibración INT8 (OpenVINO calibra con su partición train)")
+    parser.add_argument("--imagenes-calibracion", default=IMAGENES_CALIBRACION)
+    parser.add_argument("--imagenes-latencia", default=IMAGENES_LATENCIA)
+    parser.add_argument("--n-calibracion", type=int, default=200, help="Imágenes usadas para calibrar")
+    parser.add_argument("--n-latencia", type=int, default=50, help="Imágenes usadas para medir latencia")
+    parser.add_argument("--datos", action="append", default=[], metavar="MODELO=YAML",
+                        help="data.yaml de evaluación de mAP por modelo (repetible)")
+    parser.add_argument("--tolerancia-map", type=float, default=0.01, help="Caída de mAP50-95 aceptable")
+    parser.add_argument("--solo-reporte", action="store_true", help="No exportar, solo medir lo ya exportado")
+    parser.add_argument("--reporte", default=None, help="Ruta donde guardar el reporte en JSON")
+    args = parser.parse_args()
+
+    datos_eval = dict(DATOS_EVALUACION)
+    for valor in args.datos:
+        nombre, sep, yaml = valor.partition("=")
+        if not sep: parser.error(f"Formato inválido '{valor}', se espera modelo=yaml")
+        datos_eval[nombre] = yaml
+
+    imagenes_cal = listar_imagenes(args.imagenes_calibracion, args.n_calibracion)
+    imagenes_lat = listar_imagenes(args.imagenes_latencia, args.n_latencia)
+    if not imagenes_cal:
+        parser.error(f"No hay imágenes en {args.imagenes_calibracion}")
+    if not imagenes_lat:
+        parser.error(f"No hay imágenes en {args.imagenes_latencia}")
+    if set(imagenes_cal) & set(imagenes_lat):
+        parser.error("Las imágenes de latencia no deben incluir las de calibración")
+
+    reporte = {}
+    for nombre in args.modelos:
+        ruta_pt = MODELOS_SERVIDOR[nombre]
+        if not args.solo_reporte:
+            exportar(nombre, ruta_pt, args, imagenes_cal)
+
+        variantes = {}
+        for backend in ["pytorch"] + args.formatos:
+            for int8 in ([False, True] if backend != "pytorch" else [False]):
+                ruta = ruta_exportada(ruta_pt, backend, int8)
+                if not os.path.exists(ruta): continue
+                etiqueta = backend + ("-int8" if int8 else "")
+                print(f"[INFO] [Exportar] Midiendo {nombre} / {etiqueta}...")
+                variantes[etiqueta] = medir_variante(ruta, imagenes_lat, args.imgsz, datos_eval.get(nombre))
+        recomendado, validado = recomendar(variantes, args.tolerancia_map)
+        reporte[nombre] = {"variantes": variantes, "recomendado": recomendado, "validado": validado}
+
+    for nombre, r in reporte.items():
+        aviso = "" if r["validado"] else f", sin validar: falta --datos {nombre}=data.yaml"
+        print(f"\n=== {nombre} (recomendado: {r['recomendado']}{aviso}) ===")
+        for etiqueta, v in r["variantes"].items():
+            mapa = f"mAP50={v['map50']:.3f} mAP50-95={v['map50_95']:.3f}" if "map50" in v else "mAP: sin datos"
+            print(f"  {etiqueta:<14} p50={v['latencia']['p50_ms']:8.2f} ms  p95={v['latencia']['p95_ms']:8.2f} ms  {mapa}")
+
+    if args.reporte:
+        with open(args.reporte, "w") as f:
+            json.dump({"imgsz": args.imgsz, "modelos": reporte}, f, indent=2, ensure_ascii=False)
+        print(f"\nReporte guardado en {args.reporte}")
+
+
+if __name__ == '__main__':
+    main()
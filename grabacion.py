@@ -0,0 +1,344 @@
+"""
+Grabación y reproducción determinista del pipeline de acceso.
+
+ProcesadorGrabador corre los modelos sobre cada frame y guarda lo que devuelven (movimiento en la
+zona, cajas de vehículos, ROI de la primera placa de cada uno y las lecturas crudas del OCR) en un
+directorio de archivos binarios de registros fijos que se leen con np.memmap:
+
+    meta.json      zona de detección, fps, backend de OCR y cantidad de frames
+    frames.bin     FRAME_DTYPE, uno por frame (marca de tiempo, forma, movimiento, tiempos de los modelos)
+    vehiculos.bin  VEHICULO_DTYPE, los vehículos de cada frame en orden
+    rois.bin       píxeles de las ROI de placas (uint8, BGR), concatenados
+    lecturas.bin   LECTURA_DTYPE, las líneas (texto, score) del OCR de cada ROI
+
+ProcesadorReproduccion responde esas mismas llamadas desde la grabación, sin modelos ni video: la
+votación, el tracker, la compuerta de calidad, el cooldown y la BD corren igual que en vivo, a miles
+de frames por segundo, y con los mismos datos dan siempre las mismas confirmaciones.
+"""
+import datetime
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+from acceso import ProcesadorAcceso
+from base_datos import check_user_in_db, reclamar_espacio_libre
+from configuracion import PAUSE_AFTER_DETECTION_MS
+from ocr import BackendOCR
+
+VERSION_FORMATO = 2
+
+FRAME_DTYPE = np.dtype([
+    ("ts", "<f8"), ("alto", "<i4"), ("ancho", "<i4"), ("movimiento", "?"),
+    ("vehiculo_inicio", "<i8"), ("n_vehiculos", "<i4"),
+    # Segundos que tardó cada modelo en el frame (para estimar la latencia de punta a punta al reproducir)
+    ("t_movimiento", "<f4"), ("t_vehiculos", "<f4"), ("t_placas", "<f4"), ("t_ocr", "<f4"),
+])
+VEHICULO_DTYPE = np.dtype([
+    ("caja", "<i4", (4,)), ("cls", "<i2"),
+    ("roi_inicio", "<i8"), ("roi_forma", "<i4", (3,)),  # roi_inicio = -1 si no se detectó placa
+    ("lectura_inicio", "<i8"), ("n_lecturas", "<i4"),
+])
+LECTURA_DTYPE = np.dtype([("texto", "<U64"), ("score", "<f8")])
+MAX_TEXTO_LECTURA = LECTURA_DTYPE["texto"].itemsize // 4  # Caracteres (UCS-4)
+
+# Un frame de la grabación: reemplaza al frame de video donde ProcesadorAcceso solo necesita su forma
+FrameGrabado = namedtuple("FrameGrabado", ["indice", "shape"])
+
+
+def clave_roi(roi):
+    """Identifica una ROI por su contenido: las mejores tomas son copias de recortes de frames anteriores."""
+    roi = np.ascontiguousarray(roi)
+    return hashlib.blake2b(roi.tobytes(), digest_size=16).digest() + bytes(str(roi.shape), "ascii")
+
+
+class CacheLecturas:
+    """Lecturas del OCR por contenido de ROI, con las últimas `capacidad` entradas."""
+    def __init__(self, capacidad=4096):
+        self.capacidad = capacidad
+        self._datos = OrderedDict()
+
+    def agregar(self, roi, lineas, costo_s):
+        clave = clave_roi(roi)
+        self._datos[clave] = (lineas, costo_s)
+        self._datos.move_to_end(clave)
+        while len(self._datos) > self.capacidad:
+            self._datos.popitem(last=False)
+
+    def leer(self, roi):
+        """Devuelve (lineas, costo_s) de una ROI ya agregada."""
+        clave = clave_roi(roi)
+        if clave not in self._datos:
+            raise KeyError("ROI sin lectura grabada: la grabación no corresponde a esta secuencia de frames")
+        return self._datos[clave]
+
+    def clear(self):
+        self._datos.clear()
+
+
+def _mapear(ruta, dtype):
+    # np.memmap no acepta archivos vacíos (una grabación sin vehículos, p. ej.)
+    if os.path.getsize(ruta) == 0: return np.zeros(0, dtype=dtype)
+    return np.memmap(ruta, dtype=dtype, mode="r")
+
+
+class Grabador:
+    """Escribe una grabación agregando registros al final de cada archivo."""
+    def __init__(self, directorio):
+        os.makedirs(directorio, exist_ok=True)
+        self.directorio = directorio
+        self._archivos = {nombre: open(os.path.join(directorio, f"{nombre}.bin"), "wb")
+                          for nombre in ("frames", "vehiculos", "rois", "lecturas")}
+        self.frames = self.vehiculos = self.bytes_rois = self.lecturas = 0
+
+    def agregar_frame(self, ts, forma, movimiento, vehiculos, tiempos):
+        """`vehiculos` es [(caja, cls_id, roi o None, lineas)]; `tiempos` (movimiento, vehículos, placas, ocr) en segundos."""
+        registros = np.zeros(len(vehiculos), dtype=VEHICULO_DTYPE)
+        lineas_frame = []
+        registros["roi_inicio"] = -1
+        for i, (caja, cls_id, roi, lineas) in enumerate(vehiculos):
+            registros["caja"][i] = caja
+            registros["cls"][i] = cls_id
+            if roi is not None:
+                roi = np.ascontiguousarray(roi)
+                registros["roi_inicio"][i] = self.bytes_rois
+                registros["roi_forma"][i] = roi.shape
+                self._archivos["rois"].write(roi.tobytes())
+                self.bytes_rois += roi.nbytes
+            for texto, _ in lineas:
+                # Truncar cambiaría lo que ve filtrar_patentes al reproducir: mejor fallar al grabar
+                if len(texto) > MAX_TEXTO_LECTURA:
+                    raise ValueError(f"Lectura de OCR de {len(texto)} caracteres (máximo {MAX_TEXTO_LECTURA}): {texto!r}")
+            registros["lectura_inicio"][i] = self.lecturas + len(lineas_frame)
+            registros["n_lecturas"][i] = len(lineas)
+            lineas_frame.extend(lineas)
+
+        frame = np.zeros(1, dtype=FRAME_DTYPE)
+        frame["ts"] = ts
+        frame["alto"], frame["ancho"] = forma[:2]
+        frame["movimiento"] = movimiento
+        frame["vehiculo_inicio"] = self.vehiculos
+        frame["n_vehiculos"] = len(vehiculos)
+        frame["t_movimiento"], frame["t_vehiculos"], frame["t_placas"], frame["t_ocr"] = tiempos
+
+        self._archivos["frames"].write(frame.tobytes())
+        self._archivos["vehiculos"].write(registros.tobytes())
+        self._archivos["lecturas"].write(np.array(lineas_frame, dtype=LECTURA_DTYPE).tobytes())
+        self.frames += 1
+        self.vehiculos += len(vehiculos)
+        self.lecturas += len(lineas_frame)
+
+    def cerrar(self, **meta):
+        for archivo in self._archivos.values():
+            archivo.close()
+        meta.update(version=VERSION_FORMATO, frames=self.frames, vehiculos=self.vehiculos, lecturas=self.lecturas)
+        with open(os.path.join(self.directorio, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2, ensure_ascii=False)
+
+
+class Grabacion:
+    """Lectura de una grabación; los arreglos son memmaps de solo lectura."""
+    def __init__(self, directorio):
+        with open(os.path.join(directorio, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != VERSION_FORMATO:
+            raise ValueError(f"Versión de grabación no soportada: {self.meta.get('version')}")
+        self.directorio = directorio
+        self.frames = _mapear(os.path.join(directorio, "frames.bin"), FRAME_DTYPE)
+        self.vehiculos = _mapear(os.path.join(directorio, "vehiculos.bin"), VEHICULO_DTYPE)
+        self.rois = _mapear(os.path.join(directorio, "rois.bin"), np.uint8)
+        self.lecturas = _mapear(os.path.join(directorio, "lecturas.bin"), LECTURA_DTYPE)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def vehiculos_de(self, indice):
+        frame = self.frames[indice]
+        inicio = int(frame["vehiculo_inicio"])
+        return self.vehiculos[inicio:inicio + int(frame["n_vehiculos"])]
+
+    def roi(self, vehiculo):
+        inicio = int(vehiculo["roi_inicio"])
+        if inicio < 0: return None
+        forma = tuple(int(n) for n in vehiculo["roi_forma"])
+        return self.rois[inicio:inicio + int(np.prod(forma))].reshape(forma)
+
+    def lineas(self, vehiculo):
+        inicio = int(vehiculo["lectura_inicio"])
+        return [(str(l["texto"]), float(l["score"])) for l in self.lecturas[inicio:inicio + int(vehiculo["n_lecturas"])]]
+
+
+class ProcesadorGrabador(ProcesadorAcceso):
+    """
+    ProcesadorAcceso que graba lo que devuelven los modelos. Cada frame se observa completo (movimiento,
+    todos los vehículos de la zona, la placa de cada uno y el OCR de cada placa) aunque la decisión no lo
+    use, para que la reproducción pueda correr con otros umbrales o compuertas. Llamar a `grabar` con
+    los frames que no pasan por `process_frame_with_zone` (p. ej. durante la pausa tras una confirmación).
+    Las etapas de los modelos se miden en `grabar`, con lo que de verdad corrió: en el pipeline solo leen
+    lo ya observado. `ocr_llamadas` sigue contando lo que pidió la decisión; `ocr_llamadas_grabacion`, las reales.
+    """
+    ETAPAS_MODELOS = ("compuerta_movimiento", "deteccion_vehiculos", "deteccion_placas", "ocr")
+
+    def __init__(self, directorio, ocr_backend=None, servidor=None, indice_autorizacion=None):
+        super().__init__(ocr_backend, servidor, indice_autorizacion)
+        self.ocr_llamadas_grabacion = 0
+        self.grabador = Grabador(directorio)
+        self.inicio = time.time()
+        self._lecturas = CacheLecturas()
+        self._observado = (False, [], {})
+
+    def process_frame_with_zone(self, frame_original, frame_to_annotate):
+        self.grabar(frame_original)
+        return super().process_frame_with_zone(frame_original, frame_to_annotate)
+
+    def grabar(self, frame):
+        """Corre los modelos sobre `frame` y lo agrega a la grabación."""
+        zona = self.zona_en_fuente(frame)
+        t0 = time.perf_counter()
+        movimiento = super().hay_movimiento(frame, zona)
+        t1 = time.perf_counter()
+        vehiculos = super().detectar_vehiculos(frame, zona)
+        t2 = time.perf_counter()
+        rois = super().recortar_placas(frame, [caja for caja, _ in vehiculos])
+        t3 = time.perf_counter()
+        validas = [roi for roi in rois if roi is not None]
+        lecturas = iter(super().leer_rois(validas) if validas else [])
+        t4 = time.perf_counter()
+
+        registros = []
+        for (caja, cls_id), roi in zip(vehiculos, rois):
+            lineas = next(lecturas) if roi is not None else []
+            if roi is not None: self._lecturas.agregar(roi, lineas, (t4 - t3) / len(validas))
+            registros.append((caja, cls_id, roi, lineas))
+        self.grabador.agregar_frame(self.reloj(), frame.shape, movimiento, registros, (t1 - t0, t2 - t1, t3 - t2, t4 - t3))
+
+        self._observar_tiempo("compuerta_movimiento", t1 - t0)
+        self._observar_tiempo("deteccion_vehiculos", t2 - t1)
+        if vehiculos: self._observar_tiempo("deteccion_placas", t3 - t2)
+        if validas: self._observar_tiempo("ocr", t4 - t3)
+        self.ocr_llamadas_grabacion += len(validas)
+        self._observado = (movimiento, vehiculos, {tuple(caja): roi for (caja, _), roi in zip(vehiculos, rois)})
+
+    def _medir(self, etapa, t0):
+        if etapa not in self.ETAPAS_MODELOS: super()._medir(etapa, t0)
+
+    def hay_movimiento(self, frame, zona):
+        return self._observado[0]
+
+    def detectar_vehiculos(self, frame, zona):
+        return [(list(caja), cls_id) for caja, cls_id in self._observado[1]]
+
+    def recortar_placas(self, frame, cajas):
+        return [self._observado[2].get(tuple(caja)) for caja in cajas]
+
+    def leer_rois(self, rois):
+        return [self._lecturas.leer(roi)[0] for roi in rois]
+
+    def cerrar(self, **meta):
+        self.grabador.cerrar(detection_zone=list(self.detection_zone), recorte_zona=self.zone_crop_inference,
+                             ocr_backend=self.ocr_backend.nombre, inicio=self.inicio, **meta)
+
+
+class ProcesadorReproduccion(ProcesadorAcceso):
+    """
+    ProcesadorAcceso alimentado por una Grabacion, sin modelos. `tiempo_modelos` acumula lo que
+    tardaron en vivo los modelos que la decisión consultó, para estimar la latencia de punta a punta.
+    """
+    def __init__(self, grabacion, indice_autorizacion=None):
+        super().__init__(indice_autorizacion=indice_autorizacion)
+        self.grabacion = grabacion
+        self.detection_zone = tuple(grabacion.meta["detection_zone"])
+        self._ocr_backend = BackendOCR()  # Solo su postprocesar: las lecturas crudas vienen grabadas
+        self._lecturas = CacheLecturas()
+        self._indice = 0
+        self.reloj = lambda: float(self.grabacion.frames["ts"][self._indice])
+        self.tiempo_modelos = 0.0
+
+    def _cargar_modelos(self, servidor):
+        self.model_placas = self.model_vehiculos = None
+
+    def ir_a(self, indice):
+        """Fija el frame actual (y con él el reloj), se procese o no."""
+        self._indice = indice
+
+    def procesar(self):
+        frame = self.grabacion.frames[self._indice]
+        return self.process_frame_with_zone(FrameGrabado(self._indice, (int(frame["alto"]), int(frame["ancho"]), 3)), None)
+
+    def hay_movimiento(self, frame, zona):
+        registro = self.grabacion.frames[frame.indice]
+        self.tiempo_modelos += float(registro["t_movimiento"])
+        return bool(registro["movimiento"])
+
+    def detectar_vehiculos(self, frame, zona):
+        self.tiempo_modelos += float(self.grabacion.frames["t_vehiculos"][frame.indice])
+        return [(v["caja"].tolist(), int(v["cls"])) for v in self.grabacion.vehiculos_de(frame.indice)]
+
+    def recortar_placas(self, frame, cajas):
+        if not cajas: return []
+        registro = self.grabacion.frames[frame.indice]
+        self.tiempo_modelos += float(registro["t_placas"])
+        vehiculos = self.grabacion.vehiculos_de(frame.indice)
+        con_placa = sum(int(v["roi_inicio"]) >= 0 for v in vehiculos)
+        por_caja = {}
+        for v in vehiculos:
+            roi = self.grabacion.roi(v)
+            if roi is not None:
+                self._lecturas.agregar(roi, self.grabacion.lineas(v), float(registro["t_ocr"]) / con_placa)
+            por_caja[tuple(v["caja"].tolist())] = roi
+        return [por_caja.get(tuple(caja)) for caja in cajas]
+
+    def leer_rois(self, rois):
+        lecturas = []
+        for roi in rois:
+            lineas, costo = self._lecturas.leer(roi)
+            self.tiempo_modelos += costo
+            lecturas.append(lineas)
+        return lecturas
+
+    def reset(self):
+        super().reset()
+        self._lecturas.clear()
+        self._indice = 0
+        self.tiempo_modelos = 0.0
+
+
+def reproducir(procesador, conn, indice_autorizacion=None, pausa=True, asignar_espacios=True):
+    """
+    Recorre la grabación de un ProcesadorReproduccion con la lógica de confirmación de benchmark_acceso.py:
+    cooldown, pausa de PAUSE_AFTER_DETECTION_MS tras cada confirmación (en frames, según el fps grabado),
+    tipo de usuario y, si `asignar_espacios`, reserva de espacio en `conn`.
+    Devuelve (confirmaciones, latencias_s), con la latencia estimada de cada frame (decisión + modelos grabados).
+    """
+    grabacion = procesador.grabacion
+    fps = grabacion.meta.get("fps") or 30.0
+    frames_pausa = int(round(PAUSE_AFTER_DETECTION_MS / 1000.0 * fps)) if pausa else 0
+    confirmaciones, latencias, pausa_restante = [], [], 0
+    for i in range(len(grabacion)):
+        t0 = time.perf_counter()
+        modelos0 = procesador.tiempo_modelos
+        procesador.ir_a(i)
+        if pausa_restante > 0:
+            pausa_restante -= 1
+        else:
+            confirmado = procesador.procesar()
+            if confirmado:
+                if indice_autorizacion is not None:
+                    patente, tipo_usuario = indice_autorizacion.tipo_usuario(confirmado[0])
+                else:
+                    patente, tipo_usuario = confirmado[0], check_user_in_db(conn, confirmado[0])
+            if confirmado and procesador.claim_cooldown(patente):
+                espacio = None
+                if asignar_espacios and tipo_usuario:
+                    # Hora derivada de la grabación, no del reloj actual: la BD resultante es reproducible
+                    ts = grabacion.meta.get("inicio", 0.0) + procesador.reloj()
+                    espacio = reclamar_espacio_libre(conn, patente, datetime.datetime.fromtimestamp(ts).strftime("%H:%M:%S"))
+                confirmaciones.append({"frame": i + 1, "patente": patente, "tipo_vehiculo": confirmado[1],
+                                       "tipo_usuario": tipo_usuario, "espacio": espacio})
+                pausa_restante = frames_pausa
+        procesador.clean_cooldown_list()
+        latencias.append(time.perf_counter() - t0 + procesador.tiempo_modelos - modelos0)
+    return confirmaciones, latencias
@@ -0,0 +1,242 @@
+"""
+Métricas del pipeline en el proceso: histogramas de latencia por etapa, contadores y medidores.
+
+Las etapas instrumentadas (decodificación, detección de vehículos y placas, OCR, reclamo de espacio,
+reconciliación, escritura de eventos y render) se observan en el registro global `registro`.
+El panel de diagnóstico de la GUI lee `resumen()`; `texto_prometheus()` da el formato de exposición
+de Prometheus (endpoint /metrics del servicio, o un archivo para el textfile collector de node_exporter).
+Los procesos trabajadores (multicamara.py) envían periódicamente `extraer()` y el coordinador lo suma
+con `fusionar()`, etiquetado por cámara.
+"""
+import bisect
+import math
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+# Límites superiores (segundos) de los buckets de latencia: de un SELECT a un OCR lento
+BUCKETS_S = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+PREFIJO = "resipark"
+
+
+class Histograma:
+    """Buckets acumulables al estilo Prometheus, más las últimas muestras para percentiles del panel."""
+    def __init__(self, buckets=BUCKETS_S, recientes=512):
+        self.buckets = buckets
+        self.conteos = [0] * (len(buckets) + 1)  # El último es +Inf
+        self.suma = 0.0
+        self.n = 0
+        self.recientes = deque(maxlen=recientes)
+
+    def observar(self, segundos):
+        self.conteos[bisect.bisect_left(self.buckets, segundos)] += 1
+        self.suma += segundos
+        self.n += 1
+        self.recientes.append(segundos)
+
+    def sumar(self, conteos, suma, n, recientes):
+        """Acumula lo observado en otro proceso (ver RegistroMetricas.extraer)."""
+        self.conteos = [a + b for a, b in zip(self.conteos, conteos)]
+        self.suma += suma
+        self.n += n
+        self.recientes.extend(recientes)
+
+    def percentil(self, p):
+        muestras = sorted(self.recientes)
+        return muestras[min(len(muestras) - 1, int(p * len(muestras)))] if muestras else None
+
+
+def aplanar(datos, prefijo=""):
+    """{'a': {'b': 1, 'c': True}} -> {'a_b': 1.0, 'a_c': 1.0}; descarta lo que no es numérico."""
+    plano = {}
+    for clave, valor in datos.items():
+        nombre = f"{prefijo}_{clave}" if prefijo else str(clave)
+        if isinstance(valor, dict):
+            plano.update(aplanar(valor, nombre))
+        elif isinstance(valor, (bool, int, float)):
+            plano[nombre] = float(valor)
+    return plano
+
+
+def _nombre_metrico(nombre):
+    return re.sub(r"[^a-zA-Z0-9_]", "_", f"{PREFIJO}_{nombre}")
+
+
+def _etiquetas(**pares):
+    return ",".join(f'{clave}="{valor}"' for clave, valor in pares.items() if valor is not None)
+
+
+def _numero(valor):
+    if math.isnan(valor): return "NaN"
+    if math.isinf(valor): return "+Inf" if valor > 0 else "-Inf"
+    return repr(float(valor)) if valor != int(valor) else str(int(valor))
+
+
+class RegistroMetricas:
+    """
+    Registro seguro entre hilos. Los medidores son callables sin argumentos que se evalúan al
+    consultar (profundidad de colas, frames descartados); pueden devolver un número o un dict.
+    """
+    def __init__(self, ventana_tasa_s=5.0):
+        self.ventana_tasa_s = ventana_tasa_s
+        self.histogramas = {}
+        self.contadores = {}
+        self.medidores = {}
+        self._marcas = {}  # contador -> deque[(t, n)] para calcular tasas por segundo
+        self.camaras = {}  # camara_id -> RegistroMetricas con lo recibido de su proceso trabajador
+        self._lock = threading.Lock()
+
+    def observar(self, etapa, segundos):
+        with self._lock:
+            histograma = self.histogramas.get(etapa)
+            if histograma is None: histograma = self.histogramas[etapa] = Histograma()
+            histograma.observar(segundos)
+
+    @contextmanager
+    def cronometro(self, etapa):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(etapa, time.perf_counter() - t0)
+
+    def incrementar(self, nombre, n=1):
+        with self._lock:
+            self.contadores[nombre] = self.contadores.get(nombre, 0) + n
+            marcas = self._marcas.get(nombre)
+            if marcas is None: marcas = self._marcas[nombre] = deque(maxlen=4096)
+            marcas.append((time.perf_counter(), n))
+
+    def tasa(self, nombre):
+        """Eventos por segundo de un contador en los últimos `ventana_tasa_s` segundos (p. ej. FPS)."""
+        desde = time.perf_counter() - self.ventana_tasa_s
+        with self._lock:
+            marcas = list(self._marcas.get(nombre, ()))
+        return sum(n for t, n in marcas if t >= desde) / self.ventana_tasa_s
+
+    def extraer(self):
+        """Histogramas y contadores acumulados desde la última extracción; el registro queda en cero."""
+        with self._lock:
+            datos = {"histogramas": {etapa: {"conteos": h.conteos, "suma": h.suma, "n": h.n,
+                                             "recientes": list(h.recientes)}
+                                     for etapa, h in self.histogramas.items() if h.n},
+                     "contadores": dict(self.contadores)}
+            self.histogramas.clear()
+            self.contadores.clear()
+        return datos
+
+    def fusionar(self, datos, camara):
+        """Suma un `extraer()` de otro proceso a las métricas de `camara`."""
+        with self._lock:
+            destino = self.camaras.get(camara)
+            if destino is None: destino = self.camaras[camara] = RegistroMetricas(self.ventana_tasa_s)
+        with destino._lock:
+            for etapa, h in datos["histogramas"].items():
+                histograma = destino.histogramas.get(etapa)
+                if histograma is None: histograma = destino.histogramas[etapa] = Histograma()
+                histograma.sumar(h["conteos"], h["suma"], h["n"], h["recientes"])
+        for nombre, n in datos["contadores"].items():
+            destino.incrementar(nombre, n)
+
+    def medidor(self, nombre, funcion):
+        self.medidores[nombre] = funcion
+
+    def quitar_medidor(self, nombre):
+        self.medidores.pop(nombre, None)
+
+    def _leer_medidores(self):
+        valores = {}
+        for nombre, funcion in list(self.medidores.items()):
+            try:
+                valor = funcion()
+            except Exception:
+                continue  # Un medidor roto (p. ej. un worker ya detenido) no tumba la exportación
+            valores.update(aplanar(valor, nombre) if isinstance(valor, dict) else aplanar({nombre: valor}))
+        return valores
+
+    def resumen(self):
+        """Vista para el panel y /metricas: percentiles recientes por etapa, contadores, tasas y medidores."""
+        with self._lock:
+            etapas = {etapa: {"n": h.n,
+                              "p50_ms": round(h.percentil(0.5) * 1000, 3),
+                              "p95_ms": round(h.percentil(0.95) * 1000, 3),
+                              "max_ms": round(max(h.recientes) * 1000, 3)}
+                      for etapa, h in self.histogramas.items() if h.recientes}
+            contadores = dict(self.contadores)
+            camaras = dict(self.camaras)
+        resumen = {"etapas": etapas, "contadores": contadores,
+                   "tasas": {nombre: round(self.tasa(nombre), 2) for nombre in contadores},
+                   "medidores": self._leer_medidores()}
+        if camaras:
+            resumen["camaras"] = {camara: registro_camara.resumen() for camara, registro_camara in sorted(camaras.items())}
+        return resumen
+
+    def _lineas_histogramas(self, nombre_h, camara=None):
+        lineas = []
+        with self._lock:
+            for etapa, h in sorted(self.histogramas.items()):
+                etiquetas = _etiquetas(etapa=etapa, camara=camara)
+                acumulado = 0
+                for limite, conteo in zip(h.buckets + (float("inf"),), h.conteos):
+                    acumulado += conteo
+                    le = "+Inf" if limite == float("inf") else repr(limite)
+                    lineas.append(f'{nombre_h}_bucket{{{etiquetas},le="{le}"}} {acumulado}')
+                lineas.append(f'{nombre_h}_sum{{{etiquetas}}} {h.suma!r}')
+                lineas.append(f'{nombre_h}_count{{{etiquetas}}} {h.n}')
+        return lineas
+
+    def texto_prometheus(self, extra=None):
+        """Formato de exposición de texto de Prometheus; `extra` ({nombre: valor o dict}) se exporta como gauges."""
+        nombre_h = _nombre_metrico("etapa_segundos")
+        with self._lock:
+            camaras = sorted(self.camaras.items())
+            contadores = [(nombre, "", valor) for nombre, valor in self.contadores.items()]
+        # Las series de cada cámara van en la misma familia que las locales, con la etiqueta `camara`
+        lineas_h = self._lineas_histogramas(nombre_h)
+        for camara, registro_camara in camaras:
+            lineas_h += registro_camara._lineas_histogramas(nombre_h, camara)
+            with registro_camara._lock:
+                contadores += [(nombre, "{" + _etiquetas(camara=camara) + "}", valor)
+                               for nombre, valor in registro_camara.contadores.items()]
+
+        lineas = []
+        if lineas_h:
+            lineas += [f"# HELP {nombre_h} Latencia por etapa del pipeline.", f"# TYPE {nombre_h} histogram"] + lineas_h
+        anterior = None
+        for nombre, etiquetas, valor in sorted(contadores):
+            metrico = _nombre_metrico(nombre) + "_total"
+            if nombre != anterior: lineas.append(f"# TYPE {metrico} counter")
+            lineas.append(f"{metrico}{etiquetas} {_numero(valor)}")
+            anterior = nombre
+
+        medidores = self._leer_medidores()
+        if extra: medidores.update(aplanar(extra))
+        for nombre, valor in sorted(medidores.items()):
+            metrico = _nombre_metrico(nombre)
+            lineas += [f"# TYPE {metrico} gauge", f"{metrico} {_numero(valor)}"]
+        return "\n".join(lineas) + "\n"
+
+    def escribir_prometheus(self, ruta, extra=None):
+        """Escribe el archivo de forma atómica: el collector nunca lee uno a medio escribir."""
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        with open(temporal, "w") as f:
+            f.write(self.texto_prometheus(extra))
+        os.replace(temporal, ruta)
+
+
+registro = RegistroMetricas()
+
+
+def cronometrado(etapa):
+    """Decorador: observa en `registro` la duración de cada llamada bajo `etapa`."""
+    def decorador(funcion):
+        @wraps(funcion)
+        def envoltura(*args, **kwargs):
+            with registro.cronometro(etapa):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorador
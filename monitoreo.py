@@ -0,0 +1,367 @@
+import json
+import time
+from collections import defaultdict, deque, namedtuple
+
+import cv2
+import numpy as np
+
+from configuracion import (
+    SLOT_MATCH_IOU, SLOT_CROP_SIZE, MONITOREO_MODO, MONITOREO_VENTANA, MONITOREO_VOTOS_MINIMOS,
+    MONITOREO_INTERVALO_S, MODELO_CLASIFICADOR_ESPACIOS_PATH
+)
+from metricas import cronometrado
+from seguimiento import iou
+
+# Un cambio de estado lógico de un espacio; `anterior` es None si el espacio es nuevo en la BD
+CambioEspacio = namedtuple("CambioEspacio", ["id_espacio", "anterior", "nuevo"])
+
+# Detecciones del modelo de espacios en un arreglo compacto; `espacio` es el índice en un MapaEspacios (-1 sin asignar)
+DETECCION_DTYPE = np.dtype([("caja", "<f4", (4,)), ("cls", "<i2"), ("score", "<f4"), ("espacio", "<i4")])
+
+
+MODOS_MONITOREO = ("detecciones", "recortes")
+
+
+def validar_modo(modo=MONITOREO_MODO, clasificador=MODELO_CLASIFICADOR_ESPACIOS_PATH):
+    """
+    Lanza ValueError si el modo no existe, o si es "recortes" sin clasificador: el detector de
+    espacios se entrenó con el estacionamiento completo, no con recortes de un solo espacio.
+    """
+    if modo not in MODOS_MONITOREO:
+        raise ValueError(f"Modo de monitoreo desconocido: '{modo}'. Opciones: {', '.join(MODOS_MONITOREO)}")
+    if modo == "recortes" and not clasificador:
+        raise ValueError("El modo 'recortes' requiere MODELO_CLASIFICADOR_ESPACIOS_PATH; use el modo 'detecciones'.")
+
+
+def estado_fisico(nombre_clase):
+    """Traduce la clase del modelo de espacios al estado físico observado."""
+    return 'Ocupado' if 'occupied' in nombre_clase.lower() else 'Libre'
+
+
+def detectar_espacios(modelo, imagen):
+    """Corre el detector de espacios sobre la imagen completa y devuelve [(caja, estado_físico)]."""
+    return detectar_espacios_lote(modelo, [imagen])[0]
+
+
+def detectar_espacios_lote(modelo, imagenes):
+    """detectar_espacios sobre varias imágenes en una sola llamada; una lista [(caja, estado)] por imagen."""
+    nombres = modelo.names
+    return [[(tuple(d["caja"].tolist()), estado_fisico(nombres[int(d["cls"])])) for d in detecciones]
+            for detecciones in detectar_espacios_arreglo(modelo, imagenes)]
+
+
+def detectar_espacios_arreglo(modelo, imagenes):
+    """Como detectar_espacios_lote, pero un arreglo DETECCION_DTYPE por imagen."""
+    return [arreglo_detecciones(resultado) for resultado in modelo(imagenes, verbose=False)]
+
+
+def arreglo_detecciones(resultado):
+    """
+    Copia las cajas de un resultado de ultralytics a un arreglo DETECCION_DTYPE: una transferencia
+    por campo en lugar de una por caja, y sin retener los tensores del resultado.
+    """
+    boxes = resultado.boxes
+    detecciones = np.zeros(len(boxes), dtype=DETECCION_DTYPE)
+    detecciones["espacio"] = -1
+    if len(boxes):
+        detecciones["caja"] = boxes.xyxy.cpu().numpy()
+        detecciones["cls"] = boxes.cls.cpu().numpy()
+        detecciones["score"] = boxes.conf.cpu().numpy()
+    return detecciones
+
+
+def transicion(estado_fisico_detectado, estado_logico_en_db):
+    """
+    Devuelve el nuevo estado lógico de un espacio, o None si no cambia.
+    - Ocupado detectado y la BD no dice Ocupado: se confirma la ocupación (llegada o reserva cumplida).
+    - Libre detectado y la BD dice Ocupado: el vehículo se fue.
+    - Libre detectado sobre Reservado: no se toca, el conductor asignado aún va en camino.
+    """
+    if estado_fisico_detectado == 'Ocupado' and estado_logico_en_db != 'Ocupado':
+        return 'Ocupado'
+    if estado_fisico_detectado == 'Libre' and estado_logico_en_db == 'Ocupado':
+        return 'Libre'
+    return None
+
+
+@cronometrado("reconciliacion")
+def reconciliar_ocupacion(conn, estados_fisicos):
+    """
+    Aplica en bloque los estados físicos detectados ({id_espacio: 'Ocupado'|'Libre'}) a la BD.
+    Lee el estado lógico una sola vez, calcula las transiciones en memoria y escribe solo las
+    filas que cambian con executemany, en una única transacción. Devuelve la lista de CambioEspacio.
+    """
+    propia = not conn.in_transaction
+    if propia: conn.execute("BEGIN IMMEDIATE")
+    try:
+        estados_db = dict(conn.execute("SELECT id_espacio, estado FROM estacionamientos"))
+
+        nuevos, a_ocupado, a_libre, cambios = [], [], [], []
+        for id_espacio, fisico in estados_fisicos.items():
+            anterior = estados_db.get(id_espacio)
+            if anterior is None:
+                # Primera vez que se ve el espacio: se inserta directamente con su estado físico
+                nuevos.append((id_espacio, fisico))
+                cambios.append(CambioEspacio(id_espacio, None, fisico))
+                continue
+            nuevo = transicion(fisico, anterior)
+            if nuevo is None: continue
+            (a_ocupado if nuevo == 'Ocupado' else a_libre).append((id_espacio,))
+            cambios.append(CambioEspacio(id_espacio, anterior, nuevo))
+
+        if nuevos:
+            conn.executemany("INSERT INTO estacionamientos (id_espacio, estado) VALUES (?, ?)", nuevos)
+        if a_ocupado:
+            conn.executemany("UPDATE estacionamientos SET estado = 'Ocupado' WHERE id_espacio = ?", a_ocupado)
+        if a_libre:
+            conn.executemany("UPDATE estacionamientos SET estado = 'Libre', patente_ocupante = NULL, hora_ingreso = NULL WHERE id_espacio = ?", a_libre)
+        if propia: conn.commit()
+    except Exception:
+        if propia: conn.rollback()
+        raise
+    return cambios
+
+
+def cambios_a_delta(cambios):
+    """Convierte una lista de CambioEspacio en un delta {id_espacio: {campo: valor}} para la UI y otros consumidores."""
+    delta = {}
+    for cambio in cambios:
+        if cambio.nuevo == 'Libre':
+            delta[cambio.id_espacio] = {'estado': 'Libre', 'patente_ocupante': None, 'hora_ingreso': None}
+        else:
+            delta[cambio.id_espacio] = {'estado': cambio.nuevo}
+    return delta
+
+
+# --- Mapa persistente de espacios ---
+class IndiceEspacial:
+    """Rejilla uniforme sobre las cajas de los espacios: cada detección solo se compara con los vecinos."""
+    def __init__(self, cajas, celda=None):
+        if celda is None:
+            anchos = sorted(x2 - x1 for x1, _, x2, _ in cajas) or [64]
+            celda = anchos[len(anchos) // 2]
+        self.celda = max(1, int(celda))
+        self.celdas = defaultdict(list)
+        for i, caja in enumerate(cajas):
+            for clave in self._claves(caja):
+                self.celdas[clave].append(i)
+
+    def _claves(self, caja):
+        x1, y1, x2, y2 = caja
+        for cx in range(int(x1) // self.celda, int(x2) // self.celda + 1):
+            for cy in range(int(y1) // self.celda, int(y2) // self.celda + 1):
+                yield cx, cy
+
+    def candidatos(self, caja):
+        return {i for clave in self._claves(caja) for i in self.celdas.get(clave, ())}
+
+
+class MapaEspacios:
+    """
+    Geometría calibrada de los espacios de una cámara: [(id_espacio, polígono)].
+    Los IDs quedan fijos tras la calibración, aunque el detector omita algún espacio después.
+    """
+    def __init__(self, camara, espacios):
+        self.camara = camara
+        self.espacios = espacios
+        self.cajas = [caja_de_poligono(poligono) for _, poligono in espacios]
+        self.indice = IndiceEspacial(self.cajas)
+
+    def __len__(self):
+        return len(self.espacios)
+
+    @classmethod
+    def desde_detecciones(cls, camara, cajas):
+        """Calibra a partir de las cajas de una imagen de referencia, numeradas de arriba a abajo e izquierda a derecha."""
+        ordenadas = sorted(cajas, key=lambda c: (c[1], c[0]))
+        espacios = [(f"E-{i:02d}", [[x1, y1], [x2, y1], [x2, y2], [x1, y2]])
+                    for i, (x1, y1, x2, y2) in enumerate(ordenadas, start=1)]
+        return cls(camara, espacios)
+
+    @classmethod
+    def cargar(cls, conn, camara):
+        """Devuelve el mapa guardado de la cámara, o None si aún no se ha calibrado."""
+        # Orden de inserción (el de la calibración), no el de los IDs como texto: "A10" < "A2"
+        filas = conn.execute("SELECT id_espacio, poligono FROM geometria_espacios WHERE camara = ? ORDER BY rowid",
+                             (camara,)).fetchall()
+        if not filas: return None
+        return cls(camara, [(id_espacio, json.loads(poligono)) for id_espacio, poligono in filas])
+
+    def guardar(self, conn):
+        with conn:
+            conn.execute("DELETE FROM geometria_espacios WHERE camara = ?", (self.camara,))
+            conn.executemany("INSERT INTO geometria_espacios (camara, id_espacio, poligono) VALUES (?, ?, ?)",
+                             [(self.camara, id_espacio, json.dumps(poligono)) for id_espacio, poligono in self.espacios])
+
+    def _parejas(self, cajas, umbral_iou):
+        """Pares (detección, espacio) por IoU descendente, cada uno usado una vez, con el índice espacial."""
+        pares = []
+        for d, caja in enumerate(cajas):
+            for i in self.indice.candidatos(caja):
+                valor = iou(caja, self.cajas[i])
+                if valor >= umbral_iou:
+                    pares.append((valor, d, i))
+        pares.sort(reverse=True)
+
+        parejas, usados_d, usados_i = [], set(), set()
+        for _, d, i in pares:
+            if d in usados_d or i in usados_i: continue
+            usados_d.add(d); usados_i.add(i)
+            parejas.append((d, i))
+        return parejas
+
+    def emparejar(self, detecciones, umbral_iou=SLOT_MATCH_IOU):
+        """
+        Asigna detecciones [(caja, estado)] a los espacios calibrados por IoU, usando el índice espacial.
+        Devuelve {id_espacio: estado}; los espacios sin detección no aparecen (su estado no se toca).
+        """
+        return {self.espacios[i][0]: detecciones[d][1]
+                for d, i in self._parejas([caja for caja, _ in detecciones], umbral_iou)}
+
+    def asignar(self, detecciones, umbral_iou=SLOT_MATCH_IOU):
+        """Completa en el lugar el campo `espacio` de un arreglo DETECCION_DTYPE, con el mismo criterio que `emparejar`."""
+        detecciones["espacio"] = -1
+        for d, i in self._parejas(detecciones["caja"].tolist(), umbral_iou):
+            detecciones["espacio"][d] = i
+        return detecciones
+
+    def estados_detectados(self, detecciones, nombres):
+        """{id_espacio: estado} de un arreglo ya pasado por `asignar`; `nombres` son las clases del modelo."""
+        return {self.espacios[int(d["espacio"])][0]: estado_fisico(nombres[int(d["cls"])])
+                for d in detecciones if d["espacio"] >= 0}
+
+    def recortes(self, imagen, lado=SLOT_CROP_SIZE):
+        """Recorta y escala todos los espacios a lado x lado en un único arreglo (N, lado, lado, 3)."""
+        h, w = imagen.shape[:2]
+        lote = np.empty((len(self.cajas), lado, lado, 3), dtype=imagen.dtype)
+        for i, (x1, y1, x2, y2) in enumerate(self.cajas):
+            x1, y1 = max(int(x1), 0), max(int(y1), 0)
+            x2, y2 = min(int(x2), w), min(int(y2), h)
+            recorte = imagen[y1:y2, x1:x2] if x2 > x1 and y2 > y1 else imagen[0:1, 0:1]
+            lote[i] = cv2.resize(recorte, (lado, lado), interpolation=cv2.INTER_AREA)
+        return lote
+
+    def clasificar(self, modelo, imagen, lado=SLOT_CROP_SIZE):
+        """
+        Clasifica todos los espacios calibrados como Libre/Ocupado en una sola llamada por lotes.
+        Sirve tanto un clasificador (usa `probs`) como el detector de espacios (usa la caja más confiable).
+        """
+        if not self.espacios: return {}
+        estados = clasificar_recortes(modelo, list(self.recortes(imagen, lado)), lado)
+        return {id_espacio: estado for (id_espacio, _), estado in zip(self.espacios, estados) if estado}
+
+
+def clasificar_recortes(modelo, recortes, lado=SLOT_CROP_SIZE):
+    """
+    Estado físico de cada recorte (o None si el detector no encontró nada), en una sola llamada por lotes.
+    Los recortes pueden venir de varias imágenes; el orden se conserva.
+    """
+    if not len(recortes): return []
+    nombres = modelo.names
+    estados = []
+    for resultado in modelo(recortes, imgsz=lado, verbose=False):
+        if getattr(resultado, 'probs', None) is not None:
+            cls_id = int(resultado.probs.top1)
+        elif len(resultado.boxes):
+            cls_id = int(resultado.boxes.cls[int(resultado.boxes.conf.argmax())])
+        else:
+            estados.append(None)
+            continue
+        estados.append(estado_fisico(nombres[cls_id]))
+    return estados
+
+
+def caja_de_poligono(poligono):
+    xs = [p[0] for p in poligono]; ys = [p[1] for p in poligono]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+# --- Monitoreo continuo ---
+class SuavizadorEstados:
+    """
+    Voto por mayoría con histéresis sobre las últimas `ventana` observaciones de cada espacio.
+    Un espacio solo cambia cuando el nuevo estado reúne `votos_minimos` votos en la ventana,
+    así el parpadeo del detector no llega a la BD.
+    """
+    def __init__(self, ventana=MONITOREO_VENTANA, votos_minimos=MONITOREO_VOTOS_MINIMOS):
+        self.ventana = ventana
+        self.votos_minimos = min(votos_minimos, ventana)
+        self.historial = {}
+        self.estados = {}
+
+    def actualizar(self, estados_fisicos):
+        """Agrega una observación {id_espacio: estado} y devuelve solo los espacios cuyo estado suavizado cambió."""
+        cambios = {}
+        for id_espacio, estado in estados_fisicos.items():
+            votos = self.historial.get(id_espacio)
+            if votos is None:
+                votos = self.historial[id_espacio] = deque(maxlen=self.ventana)
+            votos.append(estado)
+            if estado == self.estados.get(id_espacio): continue
+            if votos.count(estado) >= self.votos_minimos:
+                self.estados[id_espacio] = estado
+                cambios[id_espacio] = estado
+        return cambios
+
+    def reset(self):
+        self.historial.clear()
+        self.estados.clear()
+
+
+class MonitorEspacios:
+    """
+    Monitoreo continuo sin Qt: clasifica cada frame muestreado sobre el mapa calibrado, suaviza
+    los estados y reconcilia con la BD solo los espacios cuyo estado suavizado cambió.
+    """
+    def __init__(self, mapa, modelo, conn, modo=MONITOREO_MODO, suavizador=None):
+        self.mapa = mapa
+        self.modelo = modelo
+        self.conn = conn
+        self.modo = modo
+        self.suavizador = suavizador or SuavizadorEstados()
+        self.muestras = 0
+        self.escrituras = 0
+
+    def estados_fisicos(self, frame):
+        if self.modo == "recortes":
+            return self.mapa.clasificar(self.modelo, frame)
+        return self.mapa.emparejar(detectar_espacios(self.modelo, frame))
+
+    def procesar(self, frame):
+        """Procesa un frame muestreado y devuelve la lista de CambioEspacio escritos en la BD."""
+        self.muestras += 1
+        suavizados = self.suavizador.actualizar(self.estados_fisicos(frame))
+        if not suavizados: return []
+        self.escrituras += 1
+        return reconciliar_ocupacion(self.conn, suavizados)
+
+
+def muestrear_video(cap, detenido, intervalo_s=MONITOREO_INTERVALO_S):
+    """
+    Genera un frame cada `intervalo_s` de `cap`, al ritmo de su FPS; los frames intermedios solo
+    se avanzan con grab(). Los archivos se repiten desde el inicio al terminar. `detenido()` corta el ciclo.
+    """
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    if not 0 < fps <= 120: fps = 30.0
+    paso = max(1, int(round(intervalo_s * fps)))
+    next_frame_time = time.perf_counter()
+    n, rebobinado = 0, False
+
+    while not detenido():
+        if n % paso:
+            ret, frame = cap.grab(), None  # Frames intermedios: se avanzan sin convertirlos
+        else:
+            ret, frame = cap.read()
+        if not ret:
+            if rebobinado: break  # La fuente no entrega frames ni desde el inicio
+            cap.set(cv2.CAP_PROP_POS_FRAMES, 0); rebobinado = True; n = 0
+            continue
+        rebobinado = False
+        n += 1
+        if frame is not None:
+            yield frame
+
+        next_frame_time += 1.0 / fps
+        delay = next_frame_time - time.perf_counter()
+        if delay > 0: time.sleep(delay)
+        else: next_frame_time = time.perf_counter()
@@ -0,0 +1,37 @@
+import cv2
+
+from configuracion import (
+    MOTION_DOWNSCALE, MOTION_PIXEL_THRESHOLD, MOTION_MIN_FRACTION, MOTION_BG_ALPHA
+)
+
+
+class DetectorMovimiento:
+    """
+    Pre-filtro barato para saber si algo cambió en la zona de detección.
+    Compara una versión reducida y en gris del recorte contra un fondo de media móvil.
+    """
+    def __init__(self, escala=MOTION_DOWNSCALE, umbral_pixel=MOTION_PIXEL_THRESHOLD,
+                 fraccion_minima=MOTION_MIN_FRACTION, alpha=MOTION_BG_ALPHA):
+        self.escala = escala
+        self.umbral_pixel = umbral_pixel
+        self.fraccion_minima = fraccion_minima
+        self.alpha = alpha
+        self._fondo = None
+
+    def hay_movimiento(self, roi):
+        if roi is None or roi.size == 0: return False
+        gris = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
+        reducido = cv2.resize(gris, None, fx=self.escala, fy=self.escala, interpolation=cv2.INTER_AREA)
+        reducido = cv2.GaussianBlur(reducido, (5, 5), 0)
+
+        if self._fondo is None or self._fondo.shape != reducido.shape:
+            self._fondo = reducido.astype("float32")
+            return True
+
+        diff = cv2.absdiff(reducido, cv2.convertScaleAbs(self._fondo))
+        _, mascara = cv2.threshold(diff, self.umbral_pixel, 255, cv2.THRESH_BINARY)
+        cv2.accumulateWeighted(reducido, self._fondo, self.alpha)
+        return cv2.countNonZero(mascara) / mascara.size >= self.fraccion_minima
+
+    def reset(self):
+        self._fondo = None
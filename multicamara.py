@@ -0,0 +1,242 @@
+"""
+Control de acceso multi-cámara: un proceso trabajador por cada portón.
+
+Cada proceso abre su fuente (archivo de video o URL RTSP), decodifica, preprocesa y corre
+su propio ProcesadorAcceso. Cada proceso envía además, cada MULTICAM_METRICAS_S, sus latencias
+por etapa y contadores, que el coordinador suma al registro de métricas etiquetados por cámara.
+Un archivo termina en su último frame; una transmisión que falla
+se reabre con espera exponencial hasta que el coordinador pide la parada. Las patentes confirmadas llegan por una cola compartida al
+coordinador, que aplica el cooldown global, verifica el usuario y asigna el espacio con
+la misma lógica que la pestaña de acceso.
+
+Uso:
+    python multicamara.py --camara norte=videos/norte.mp4 --camara sur=rtsp://10.0.0.5/stream
+"""
+import argparse
+import datetime
+import multiprocessing as mp
+import queue
+import time
+
+from autorizacion import IndiceAutorizacion
+from base_datos import asignar_espacio_libre, asegurar_esquema, conectar
+from eventos import EscritorEventos, nuevo_evento
+from metricas import registro
+from configuracion import (
+    DATABASE_PATH, PAUSE_AFTER_DETECTION_MS, COOLDOWN_SECONDS,
+    CAMARAS_ACCESO, MULTICAM_THREADS_PER_WORKER, MULTICAM_RECONEXION_INICIAL_S, MULTICAM_RECONEXION_MAX_S,
+    MULTICAM_METRICAS_S
+)
+
+
+def es_transmision(fuente):
+    """URL (rtsp://, http://...) o índice de dispositivo: un read() fallido no significa fin del video."""
+    return "://" in str(fuente) or str(fuente).isdigit()
+
+
+def abrir_fuente(cv2, fuente, camara_id, evento_parada):
+    """Abre `fuente`; una transmisión se reintenta con espera exponencial hasta abrirse o hasta la parada."""
+    espera = MULTICAM_RECONEXION_INICIAL_S
+    while True:
+        cap = cv2.VideoCapture(int(fuente) if str(fuente).isdigit() else fuente)
+        if cap.isOpened() or not es_transmision(fuente):
+            return cap
+        cap.release()
+        print(f"[WARN] [Multicámara] [{camara_id}] No se pudo abrir {fuente}; reintento en {espera:.0f} s")
+        if evento_parada.wait(espera):
+            return cap
+        espera = min(espera * 2, MULTICAM_RECONEXION_MAX_S)
+
+
+def trabajador_camara(camara_id, fuente, cola_eventos, evento_parada, tiempo_real=False, max_frames=None,
+                     db_path=DATABASE_PATH):
+    """Cuerpo de cada proceso: decodifica `fuente` y envía confirmaciones y estadísticas a `cola_eventos`."""
+    # Se importa aquí para que cada proceso cargue sus propios modelos tras el spawn
+    import cv2
+    from acceso import ProcesadorAcceso
+
+    # Un hilo por proceso: el paralelismo viene de tener un proceso por cámara
+    cv2.setNumThreads(MULTICAM_THREADS_PER_WORKER)
+    try:
+        import torch
+        torch.set_num_threads(MULTICAM_THREADS_PER_WORKER)
+    except ImportError:
+        pass
+
+    procesador = ProcesadorAcceso(indice_autorizacion=IndiceAutorizacion(db_path))
+    cap = abrir_fuente(cv2, fuente, camara_id, evento_parada)
+    if not cap.isOpened():
+        if not evento_parada.is_set():
+            print(f"[ERROR] [Multicámara] [{camara_id}] No se pudo abrir la fuente: {fuente}")
+        cola_eventos.put(("fin", camara_id, {"frames": 0, "duracion_s": 0.0}))
+        return
+
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    if not 0 < fps <= 120: fps = 30.0
+    frames_pausa = int(round(PAUSE_AFTER_DETECTION_MS / 1000.0 * fps))
+    pausa_restante, frames, reconexiones = 0, 0, 0
+    inicio = ultimo_envio = time.perf_counter()
+
+    while not evento_parada.is_set() and (max_frames is None or frames < max_frames):
+        t0 = time.perf_counter()
+        ret, frame = cap.read()
+        if not ret:
+            if not es_transmision(fuente): break  # Fin del archivo
+            # Corte de red o de la cámara: el portón no puede quedar deshabilitado por un fallo transitorio
+            print(f"[WARN] [Multicámara] [{camara_id}] Se perdió la transmisión; reconectando...")
+            cap.release()
+            cap = abrir_fuente(cv2, fuente, camara_id, evento_parada)
+            reconexiones += 1
+            continue
+        registro.observar("decodificacion", time.perf_counter() - t0)
+        registro.incrementar("frames_decodificados")
+        frames += 1
+
+        if pausa_restante > 0:
+            pausa_restante -= 1
+        else:
+            confirmado = procesador.process_frame_with_zone(frame, None)  # Sin GUI: nada que anotar
+            if confirmado and procesador.claim_cooldown(confirmado[0]):
+                cola_eventos.put(("confirmacion", camara_id, *confirmado, time.time()))
+                pausa_restante = frames_pausa
+        procesador.clean_cooldown_list()
+
+        # El registro de este proceso no llega a /metrics: se envía lo acumulado y se reinicia
+        if time.perf_counter() - ultimo_envio >= MULTICAM_METRICAS_S:
+            cola_eventos.put(("metricas", camara_id, registro.extraer()))
+            ultimo_envio = time.perf_counter()
+
+        if tiempo_real:
+            atraso = frames / fps - (time.perf_counter() - inicio)
+            if atraso > 0: time.sleep(atraso)
+
+    cap.release()
+    cola_eventos.put(("metricas", camara_id, registro.extraer()))
+    cola_eventos.put(("fin", camara_id, {"frames": frames, "duracion_s": time.perf_counter() - inicio,
+                                         "reconexiones": reconexiones,
+                                         "frames_omitidos": procesador.frames_omitidos,
+                                         "ocr_llamadas": procesador.ocr_llamadas,
+                                         "ocr": procesador.estadisticas_ocr()}))
+
+
+class CoordinadorMulticamara:
+    """Lanza un proceso por cámara y centraliza las confirmaciones en la asignación de espacios."""
+    def __init__(self, camaras, db_path=DATABASE_PATH, tiempo_real=False, max_frames=None):
+        self.camaras = camaras
+        self.db_path = db_path
+        self.tiempo_real = tiempo_real
+        self.max_frames = max_frames
+        self.recent_plates = {}
+        self.estadisticas = {}
+        self.indice_autorizacion = IndiceAutorizacion(db_path)
+
+        self._ctx = mp.get_context("spawn")  # fork tras cargar torch/OpenCV puede colgar los procesos
+        self.cola_eventos = self._ctx.Queue()
+        self.evento_parada = self._ctx.Event()
+        self.procesos = []
+
+    def iniciar(self):
+        for camara in self.camaras:
+            proceso = self._ctx.Process(
+                target=trabajador_camara, name=f"camara-{camara['id']}",
+                args=(camara["id"], camara["fuente"], self.cola_eventos, self.evento_parada,
+                      self.tiempo_real, self.max_frames, self.db_path),
+                daemon=True)
+            proceso.start()
+            self.procesos.append(proceso)
+        print(f"[INFO] [Multicámara] {len(self.procesos)} procesos iniciados.")
+
+    def ejecutar(self, on_ingreso=None):
+        """Consume eventos hasta que todas las cámaras terminan. `on_ingreso(dict)` recibe cada resultado."""
+        conn = conectar(self.db_path)
+        self.escritor_eventos = EscritorEventos(self.db_path)
+        self.escritor_eventos.start()
+        pendientes = {c["id"] for c in self.camaras}
+        inicio = time.perf_counter()
+        try:
+            while pendientes:
+                try:
+                    evento = self.cola_eventos.get(timeout=0.5)
+                except queue.Empty:
+                    if not any(p.is_alive() for p in self.procesos): break
+                    continue
+                if evento[0] == "fin":
+                    _, camara_id, stats = evento
+                    self.estadisticas[camara_id] = stats
+                    pendientes.discard(camara_id)
+                elif evento[0] == "metricas":
+                    registro.fusionar(evento[2], camara=evento[1])
+                elif evento[0] == "confirmacion":
+                    ingreso = self.procesar_confirmacion(conn, *evento[1:])
+                    if ingreso and on_ingreso: on_ingreso(ingreso)
+        finally:
+            self.detener()
+            self.escritor_eventos.detener()
+            conn.close()
+        return time.perf_counter() - inicio
+
+    def procesar_confirmacion(self, conn, camara_id, plate, tipo_vehiculo, confianza, timestamp):
+        # Primero se corrige la lectura: el cooldown va sobre la patente registrada, no sobre la del OCR
+        plate, tipo_usuario = self.indice_autorizacion.tipo_usuario(plate)
+        # Cooldown global: el mismo vehículo visto por dos portones no se registra dos veces
+        if plate in self.recent_plates and timestamp - self.recent_plates[plate] < COOLDOWN_SECONDS:
+            return None
+        self.recent_plates[plate] = timestamp
+
+        hora = datetime.datetime.fromtimestamp(timestamp).strftime("%H:%M:%S")
+        estac_asignado = asignar_espacio_libre(conn, plate, hora) if tipo_usuario else None
+        self.escritor_eventos.registrar(nuevo_evento(plate, tipo_vehiculo, tipo_usuario, estac_asignado,
+                                                     camara_id, confianza, ts=timestamp))
+        return {"camara": camara_id, "patente": plate, "tipo_vehiculo": tipo_vehiculo,
+                "tipo_usuario": tipo_usuario, "hora": hora, "espacio": estac_asignado}
+
+    def detener(self):
+        self.evento_parada.set()
+        for proceso in self.procesos:
+            proceso.join(timeout=5)
+            if proceso.is_alive(): proceso.terminate()
+
+
+def parse_camaras(valores):
+    camaras = []
+    for valor in valores:
+        camara_id, sep, fuente = valor.partition("=")
+        if not sep:
+            raise argparse.ArgumentTypeError(f"Formato inválido '{valor}', se espera id=fuente")
+        camaras.append({"id": camara_id, "fuente": fuente})
+    return camaras
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Control de acceso con un proceso por cámara.")
+    parser.add_argument("--camara", action="append", default=[], metavar="ID=FUENTE",
+                        help="Cámara de entrada (repetible). Por defecto se usa CAMARAS_ACCESO.")
+    parser.add_argument("--db", default=DATABASE_PATH)
+    parser.add_argument("--tiempo-real", action="store_true", help="Limitar cada fuente a su FPS nominal")
+    parser.add_argument("--max-frames", type=int, default=None, help="Frames por cámara")
+    args = parser.parse_args()
+
+    camaras = parse_camaras(args.camara) if args.camara else CAMARAS_ACCESO
+    if not camaras:
+        parser.error("No hay cámaras configuradas: use --camara o CAMARAS_ACCESO en configuracion.py")
+
+    def mostrar(ingreso):
+        print(f"[INFO] [Multicámara] [{ingreso['camara']}] {ingreso['patente']} ({ingreso['tipo_vehiculo']}) "
+              f"usuario={ingreso['tipo_usuario'] or 'No Registrado'} espacio={ingreso['espacio'] or '---'}")
+
+    # Una BD anterior al registro de eventos no tiene sus tablas: crearlas antes de lanzar las cámaras
+    asegurar_esquema(args.db)
+    coordinador = CoordinadorMulticamara(camaras, args.db, args.tiempo_real, args.max_frames)
+    coordinador.iniciar()
+    duracion = coordinador.ejecutar(on_ingreso=mostrar)
+
+    total_frames = sum(s["frames"] for s in coordinador.estadisticas.values())
+    for camara_id, stats in coordinador.estadisticas.items():
+        fps = stats["frames"] / stats["duracion_s"] if stats["duracion_s"] else 0.0
+        print(f"[INFO] [Multicámara] [{camara_id}] {stats['frames']} frames, {fps:.1f} FPS")
+    print(f"[INFO] [Multicámara] Total: {total_frames} frames en {duracion:.1f} s "
+          f"({total_frames / duracion if duracion else 0.0:.1f} FPS agregados)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+import re
+
+from configuracion import OCR_CONFIDENCE_THRESHOLD, OCR_REC_BATCH_SIZE
+
+
+def filtrar_patentes(textos):
+    posibles = []
+    for t in textos:
+        t_limpio = re.sub(r'[^A-Z0-9]', '', t.upper().strip())
+        if len(t_limpio) == 6 and any(c.isdigit() for c in t_limpio) and any(c.isalpha() for c in t_limpio):
+            posibles.append(t_limpio)
+    return posibles
+
+
+class BackendOCR:
+    """
+    Interfaz común de los motores de OCR para placas ya recortadas por YOLO.
+    Las subclases implementan `reconocer`; el filtrado de patentes es compartido.
+    """
+    nombre = "base"
+
+    def reconocer(self, rois):
+        """Devuelve, por cada ROI, una lista de (texto, score) leídos por el motor."""
+        raise NotImplementedError
+
+    def leer_patentes(self, rois):
+        """Devuelve, por cada ROI, la primera patente válida según `filtrar_patentes` o "" si no hay."""
+        indices = [i for i, roi in enumerate(rois) if roi is not None and roi.size > 0]
+        patentes = [""] * len(rois)
+        if not indices: return patentes
+
+        lecturas = self.reconocer([rois[i] for i in indices])
+        for i, patente in zip(indices, self.postprocesar(lecturas)):
+            patentes[i] = patente
+        return patentes
+
+    def postprocesar(self, lecturas):
+        """Aplica el umbral de confianza y `filtrar_patentes` a la salida de `reconocer`."""
+        patentes = []
+        for lineas in lecturas:
+            detected_texts = [text for text, score in lineas if score > OCR_CONFIDENCE_THRESHOLD]
+            valid_plates = filtrar_patentes(detected_texts)
+            patentes.append(valid_plates[0] if valid_plates else "")
+        return patentes
+
+
+class PaddleOCRCompleto(BackendOCR):
+    """Ruta original: detección de texto + clasificación de ángulo + reconocimiento, un ROI por llamada."""
+    nombre = "completo"
+
+    def __init__(self):
+        from paddleocr import PaddleOCR
+        self.ocr_reader = PaddleOCR(use_angle_cls=True, lang='en')
+
+    def reconocer(self, rois):
+        return [self._leer_roi(roi) for roi in rois]
+
+    def _leer_roi(self, roi):
+        results = self.ocr_reader.predict(roi)
+        lineas = []
+        if not results or not results[0]: return lineas
+        result_data = results[0]
+        if isinstance(result_data, dict):
+            if 'rec_texts' in result_data and 'rec_scores' in result_data:
+                lineas.extend(zip(result_data.get('rec_texts', []), result_data.get('rec_scores', [])))
+        elif isinstance(result_data, list):
+            for line in result_data:
+                try:
+                    text, score = line[1]
+                    lineas.append((text, score))
+                except (IndexError, TypeError, ValueError): continue
+        return lineas
+
+
+class PaddleOCRSoloRec(BackendOCR):
+    """
+    Ruta rápida: solo el modelo de reconocimiento, sin detección ni clasificación de ángulo.
+    El recorte de YOLO ya es la línea de texto, así que todos los ROIs se reconocen en batch.
+    Soporta la API de PaddleOCR 3.x (TextRecognition) y la de 2.x (TextRecognizer, ver _reconocedor_v2).
+    """
+    nombre = "solo_rec"
+
+    def __init__(self, batch_size=OCR_REC_BATCH_SIZE):
+        self.batch_size = batch_size
+        try:
+            from paddleocr import TextRecognition
+            self.recognizer = TextRecognition()
+            self._api_v3 = True
+        except ImportError:
+            self.recognizer = _reconocedor_v2(batch_size)
+            self._api_v3 = False
+
+    def reconocer(self, rois):
+        if self._api_v3:
+            resultados = self.recognizer.predict(input=list(rois), batch_size=self.batch_size)
+            return [[(res['rec_text'], res['rec_score'])] for res in resultados]
+        rec_res, _ = self.recognizer(list(rois))
+        return [[(text, score)] for text, score in rec_res]
+
+
+def _reconocedor_v2(batch_size, lang='en'):
+    """
+    TextRecognizer de PaddleOCR 2.x con los mismos parámetros y modelo que arma PaddleOCR.__init__.
+    `det` no es un parámetro del constructor: PaddleOCR(det=False) igual construye (y retiene)
+    el detector en TextSystem, así que aquí se replica solo la parte de reconocimiento.
+    """
+    from pathlib import Path
+    import os
+    from paddleocr import paddleocr as p
+    from paddleocr.paddleocr import predict_system
+
+    params = p.parse_args(mMain=False)
+    params.__dict__.update(lang=lang, rec_batch_num=batch_size, use_angle_cls=False, show_log=False)
+    params.use_gpu = p.check_gpu(params.use_gpu)
+    idioma, _ = p.parse_lang(params.lang)
+    config = p.get_model_config('OCR', params.ocr_version, 'rec', idioma)
+    params.rec_model_dir, url = p.confirm_model_dir_url(
+        params.rec_model_dir, os.path.join(p.BASE_DIR, 'whl', 'rec', idioma), config['url'])
+    params.rec_image_shape = "3, 48, 320" if params.ocr_version in ('PP-OCRv3', 'PP-OCRv4') else "3, 32, 320"
+    if not params.use_onnx:
+        p.maybe_download(params.rec_model_dir, url)
+    if params.rec_char_dict_path is None:
+        params.rec_char_dict_path = str(Path(p.__file__).parent / config['dict_path'])
+    return predict_system.predict_rec.TextRecognizer(params)
+
+
+BACKENDS_OCR = {
+    PaddleOCRCompleto.nombre: PaddleOCRCompleto,
+    PaddleOCRSoloRec.nombre: PaddleOCRSoloRec,
+}
+
+
+def crear_backend_ocr(nombre):
+    if nombre not in BACKENDS_OCR:
+        raise ValueError(f"Backend de OCR desconocido: '{nombre}'. Opciones: {', '.join(BACKENDS_OCR)}")
+    return BACKENDS_OCR[nombre]()
@@ -1,123 +1,374 @@
 import sys
-import datetime
 import time
+T_INICIO = time.perf_counter()  # Referencia para medir tiempo hasta ventana y hasta primera inferencia
+
+import bisect
+import datetime
 import cv2
-import re
-import sqlite3
-import os
-from collections import defaultdict
+import numpy as np
+from collections import Counter
 
-from paddleocr import PaddleOCR
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QLabel, QPushButton,
-    QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem,
+    QVBoxLayout, QHBoxLayout, QTableView,
     QGroupBox, QGridLayout, QFileDialog, QMessageBox, QMainWindow, QTabWidget
 )
-from PyQt5.QtGui import QPixmap, QImage, QColor
-from PyQt5.QtCore import QTimer, Qt, pyqtSignal
-
-from ultralytics import YOLO
-
-# --- Configuración Global ---
-# Modelos de Acceso
-MODELO_PLACAS_PATH = 'models/runs/detect/placas_v112/weights/best.pt'
-MODELO_VEHICULOS_PATH = "models/best_type.pt"
-# Modelo de Monitoreo de Estacionamiento
-MODELO_PARKING_SLOTS_PATH = 'models/parkinslotrun/parking/weights/best.pt'
-
-# Base de datos
-DATABASE_PATH = 'database/estacionamiento.db'
-
-# Parámetros de Detección de Acceso
-CONFIDENCE_THRESHOLD_PLACAS = 0.6
-CONFIDENCE_THRESHOLD_VEHICLE = 0.5
-NOMBRES_VEHICULOS = [
-    "Persona", "Auto", "Bicicleta", "Bus", "Bus Interurbano", 
-    "Bus Articulado", "Camion", "Camionmas2ejes", "Ciclos", "Minibus rural",
-    "Moto", "Taxi basico", "Taxi Bus Publico", "Taxi Colectivo", "Taxi bus privado",
-    "Transporte Escolar", "Semáforo", "Camioneta (Pickup)"
-]
-CONFIRMATION_THRESHOLD = 4
-PAUSE_AFTER_DETECTION_MS = 3000
-VIDEO_DISPLAY_SIZE = (800, 450)
-OCR_CONFIDENCE_THRESHOLD = 0.6
-COOLDOWN_SECONDS = 15 # Reducido para pruebas más rápidas
-
-# --- Funciones de Base de Datos ---
-# --- Funciones de Base de Datos ---
-def inicializar_base_de_datos():
+from PyQt5.QtGui import QImage, QColor, QPainter
+from PyQt5.QtCore import QTimer, QThread, Qt, QRect, pyqtSignal, QAbstractTableModel, QModelIndex
+
+from acceso import AnilloFrames, ProcesadorAcceso
+from autorizacion import IndiceAutorizacion
+from backends_modelo import cargar_modelo
+from base_datos import check_user_in_db, asignar_espacio_libre, conectar, inicializar_base_de_datos
+from servidor_inferencia import ServidorInferencia, MODELOS_SERVIDOR
+from eventos import EscritorEventos, nuevo_evento
+from metricas import registro
+from monitoreo import (
+    reconciliar_ocupacion, cambios_a_delta, detectar_espacios, detectar_espacios_arreglo, muestrear_video,
+    validar_modo, MapaEspacios, MonitorEspacios
+)
+from configuracion import (
+    MODELO_PARKING_SLOTS_PATH, MODELO_CLASIFICADOR_ESPACIOS_PATH, CAMARA_MONITOREO, MONITOREO_MODO, MONITOREO_INTERVALO_S,
+    PAUSE_AFTER_DETECTION_MS, VIDEO_DISPLAY_SIZE,
+    CAPTURE_RING_SLOTS, RENDER_RING_SLOTS, RENDER_INTERVAL_MS, INGRESOS_RECIENTES_MAX, CAMARA_ACCESO_GUI,
+    METRICAS_REFRESCO_MS, METRICAS_ARCHIVO_PROMETHEUS
+)
+
+# --- Modelos de Tabla (alimentados por deltas) ---
+class ModeloEspacios(QAbstractTableModel):
+    """
+    Modelo de la tabla de espacios. Se carga completo una vez y luego recibe deltas
+    {id_espacio: {campo: valor}}: solo las filas afectadas emiten dataChanged y los
+    conteos por estado se actualizan de forma incremental.
     """
-    Inicializa la base de datos.
-    1. Asegura que el directorio y las tablas existan.
-    2. Limpia todos los estacionamientos, poniéndolos en estado 'Libre'.
+    conteos_cambiados = pyqtSignal()
+
+    COLUMNAS = ["ID Espacio", "Estado", "Patente Ocupante", "Hora Ingreso"]
+    CAMPOS = ["id_espacio", "estado", "patente_ocupante", "hora_ingreso"]
+    COLORES = {
+        'Libre': QColor("#2ECC71"),      # Verde
+        'Ocupado': QColor("#E74C3C"),    # Rojo
+        'Reservado': QColor("#ff9b00")   # Amarillo
+    }
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._filas = []   # [id_espacio, estado, patente_ocupante, hora_ingreso], ordenadas por ID
+        self._ids = []
+        self._indice = {}  # id_espacio -> número de fila
+        self.conteos = Counter()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._filas)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNAS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.COLUMNAS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid(): return None
+        fila = self._filas[index.row()]
+        estado = fila[1]
+        if role == Qt.DisplayRole:
+            return str(fila[index.column()] or "---")
+        if role == Qt.BackgroundRole:
+            return self.COLORES.get(estado, QColor("white"))
+        if role == Qt.ForegroundRole and estado in ['Ocupado', 'Reservado']:
+            return QColor("white")
+        return None
+
+    def cargar(self, rows):
+        """Reemplaza todo el contenido con las filas de la BD (carga inicial o refresco manual)."""
+        self.beginResetModel()
+        self._filas = sorted([list(r) for r in rows], key=lambda f: f[0])
+        self._ids = [f[0] for f in self._filas]
+        self._indice = {id_espacio: i for i, id_espacio in enumerate(self._ids)}
+        self.conteos = Counter(f[1] for f in self._filas)
+        self.endResetModel()
+        self.conteos_cambiados.emit()
+
+    def aplicar_cambios(self, delta):
+        for id_espacio, campos in delta.items():
+            fila_idx = self._indice.get(id_espacio)
+            if fila_idx is None:
+                # Espacio nuevo: se inserta en su posición ordenada
+                pos = bisect.bisect_left(self._ids, id_espacio)
+                fila = [id_espacio, campos.get('estado', 'Libre'), campos.get('patente_ocupante'), campos.get('hora_ingreso')]
+                self.beginInsertRows(QModelIndex(), pos, pos)
+                self._filas.insert(pos, fila)
+                self._ids.insert(pos, id_espacio)
+                self._indice = {id_: i for i, id_ in enumerate(self._ids)}
+                self.endInsertRows()
+                self.conteos[fila[1]] += 1
+                continue
+
+            fila = self._filas[fila_idx]
+            self.conteos[fila[1]] -= 1
+            for campo, valor in campos.items():
+                fila[self.CAMPOS.index(campo)] = valor
+            self.conteos[fila[1]] += 1
+            self.dataChanged.emit(self.index(fila_idx, 0), self.index(fila_idx, len(self.COLUMNAS) - 1))
+        if delta:
+            self.conteos_cambiados.emit()
+
+    def estados(self):
+        return {fila[0]: fila[1] for fila in self._filas}
+
+
+class ModeloIngresos(QAbstractTableModel):
+    """Registros de ingreso recientes, el más nuevo arriba y con un máximo de filas."""
+    COLUMNAS = ["Patente", "Tipo Vehículo", "Tipo Usuario", "Hora ingreso", "Estac."]
+
+    def __init__(self, max_filas=INGRESOS_RECIENTES_MAX, parent=None):
+        super().__init__(parent)
+        self.max_filas = max_filas
+        self._filas = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._filas)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNAS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.COLUMNAS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if index.isValid() and role == Qt.DisplayRole:
+            return self._filas[index.row()][index.column()]
+        return None
+
+    def agregar(self, fila):
+        self.beginInsertRows(QModelIndex(), 0, 0)
+        self._filas.insert(0, fila)
+        self.endInsertRows()
+        if len(self._filas) > self.max_filas:
+            ultima = len(self._filas) - 1
+            self.beginRemoveRows(QModelIndex(), ultima, ultima)
+            self._filas.pop()
+            self.endRemoveRows()
+
+
+class ModeloEtapas(QAbstractTableModel):
+    """Latencias recientes por etapa del pipeline, desde registro.resumen()."""
+    COLUMNAS = ["Etapa", "Muestras", "p50 (ms)", "p95 (ms)", "Máx (ms)"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._filas = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._filas)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNAS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.COLUMNAS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if index.isValid() and role == Qt.DisplayRole:
+            return self._filas[index.row()][index.column()]
+        return None
+
+    def cargar(self, etapas):
+        filas = [(etapa, str(e["n"]), f"{e['p50_ms']:.2f}", f"{e['p95_ms']:.2f}", f"{e['max_ms']:.2f}")
+                 for etapa, e in sorted(etapas.items())]
+        if len(filas) != len(self._filas):
+            self.beginResetModel(); self._filas = filas; self.endResetModel()
+        elif filas:
+            self._filas = filas
+            self.dataChanged.emit(self.index(0, 0), self.index(len(filas) - 1, len(self.COLUMNAS) - 1))
+
+
+# --- Vista de video sin copias ---
+class VistaVideo(QLabel):
     """
-    db_dir = os.path.dirname(DATABASE_PATH)
-    os.makedirs(db_dir, exist_ok=True)
+    Muestra frames BGR de OpenCV sin convertirlos ni copiarlos: un QImage envuelve el buffer del frame
+    y se pinta en paintEvent (Qt escala solo si el widget no mide lo mismo que el frame). El frame debe
+    seguir sin reescribirse mientras se muestra; `al_liberar(token)` avisa cuando se reemplaza.
+    Sin frame, se comporta como el QLabel de texto de siempre. Con `etapa`, el pintado se mide en el registro de métricas.
+    """
+    def __init__(self, texto, etapa=None, parent=None):
+        super().__init__(texto, parent)
+        self.etapa = etapa
+        self.al_liberar = None
+        self._frame = self._imagen = self._token = None
+        self._rgb = None  # Solo Qt < 5.14 (sin Format_BGR888): buffer RGB reutilizado
+
+    def mostrar(self, frame, token=None):
+        h, w = frame.shape[:2]
+        if hasattr(QImage, "Format_BGR888"):
+            self._imagen = QImage(frame.data, w, h, frame.strides[0], QImage.Format_BGR888)
+        else:
+            if self._rgb is None or self._rgb.shape != frame.shape: self._rgb = frame.copy()
+            cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self._rgb)
+            self._imagen = QImage(self._rgb.data, w, h, self._rgb.strides[0], QImage.Format_RGB888)
+        anterior, self._frame, self._token = self._token, frame, token
+        if anterior is not None and self.al_liberar: self.al_liberar(anterior)
+        self.update()
+
+    def paintEvent(self, event):
+        if self._imagen is None:
+            return super().paintEvent(event)
+        t0 = time.perf_counter()
+        pintor = QPainter(self)
+        if self._imagen.size() == self.size():
+            pintor.drawImage(0, 0, self._imagen)
+        else:
+            destino = QRect(0, 0, 0, 0)
+            destino.setSize(self._imagen.size().scaled(self.size(), Qt.KeepAspectRatio))
+            destino.moveCenter(self.rect().center())
+            pintor.drawImage(destino, self._imagen)
+        pintor.end()
+        if self.etapa: registro.observar(self.etapa, time.perf_counter() - t0)
+
+
+def intervalo_render():
+    """Período del timer de render: RENDER_INTERVAL_MS o, si es None, el refresco de la pantalla."""
+    if RENDER_INTERVAL_MS: return RENDER_INTERVAL_MS
+    pantalla = QApplication.primaryScreen()
+    hz = pantalla.refreshRate() if pantalla else 60.0
+    return max(1, int(1000 / (hz or 60.0)))
+
+
+def dibujar_zona(frame, zona):
+    x, y, w, h = zona
+    cv2.rectangle(frame, (x, y), (x + w, y + h), (255, 255, 0), 2)
+    cv2.putText(frame, "ZONA DE DETECCION", (x + 5, y + 25), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 0), 2)
+
+
+# --- Pipeline de Acceso: etapas de captura e inferencia ---
+class CaptureWorker(QThread):
+    """
+    Etapa de captura: decodifica el video al ritmo de su FPS directamente sobre los slots
+    preasignados del anillo de captura (sin un array nuevo por frame).
+    """
+    def __init__(self, video_path, anillo, parent=None):
+        super().__init__(parent)
+        self.video_path = video_path
+        self.anillo = anillo
+
+    def run(self):
+        cap = cv2.VideoCapture(self.video_path)
+        if not cap.isOpened():
+            print(f"[ERROR] [Acceso] No se pudo abrir el video: {self.video_path}")
+            return
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        frame_interval = 1.0 / fps if 0 < fps <= 120 else 1.0 / 30
+        next_frame_time = time.perf_counter()
+        rewound = False
+        # Con la resolución conocida el anillo se asigna una vez; si no, con el primer frame
+        w, h = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        forma = (h, w, 3) if w > 0 and h > 0 else None
+
+        while not self.isInterruptionRequested():
+            indice, slot = self.anillo.escribir(forma)
+            forma = None
+            t0 = time.perf_counter()
+            ret, frame = cap.read(slot)
+            registro.observar("decodificacion", time.perf_counter() - t0)
+            if not ret:
+                if rewound: break  # El video no entrega frames ni desde el inicio
+                cap.set(cv2.CAP_PROP_POS_FRAMES, 0); rewound = True
+                continue
+            rewound = False
+            # Se publica a resolución completa: la inferencia recorta la zona y las placas de aquí
+            self.anillo.publicar(indice, frame)
+            registro.incrementar("frames_decodificados")
+
+            next_frame_time += frame_interval
+            delay = next_frame_time - time.perf_counter()
+            if delay > 0: time.sleep(delay)
+            else: next_frame_time = time.perf_counter()  # Vamos atrasados: no acumular deuda
+        cap.release()
+
+
+class InferenceWorker(QThread):
+    """
+    Etapa de inferencia: toma prestado el frame más reciente del anillo de captura, corre modelos
+    y OCR, y escribe el frame de pantalla anotado en un slot del anillo de render.
+    Las confirmaciones se envían por señal.
+    """
+    plate_confirmed = pyqtSignal(str, str, float)
+
+    def __init__(self, procesador, anillo_captura, anillo_render, is_paused, parent=None):
+        super().__init__(parent)
+        self.procesador = procesador
+        self.anillo_captura = anillo_captura
+        self.anillo_render = anillo_render
+        self.is_paused = is_paused
+
+    def run(self):
+        forma_pantalla = (VIDEO_DISPLAY_SIZE[1], VIDEO_DISPLAY_SIZE[0], 3)
+        secuencia = 0
+        while not self.isInterruptionRequested():
+            tomado = self.anillo_captura.tomar(secuencia, timeout=0.1)
+            if tomado is None: continue
+            secuencia, frame = tomado
+            try:
+                # La escala de pantalla es independiente de la resolución de inferencia
+                indice, display_frame = self.anillo_render.escribir(forma_pantalla)
+                if frame.shape == forma_pantalla:
+                    display_frame[...] = frame
+                else:
+                    cv2.resize(frame, VIDEO_DISPLAY_SIZE, dst=display_frame, interpolation=cv2.INTER_AREA)
+
+                if not self.is_paused():
+                    confirmado = self.procesador.process_frame_with_zone(frame, display_frame)
+                    if confirmado:
+                        self.plate_confirmed.emit(*confirmado)
+
+                self.procesador.clean_cooldown_list()
+                dibujar_zona(display_frame, self.procesador.detection_zone)
+                self.anillo_render.publicar(indice, display_frame)
+                registro.incrementar("frames_procesados")
+            finally:
+                self.anillo_captura.devolver(secuencia)
+
 
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    
-    # Crear tablas si no existen (no hará nada si ya existen)
-    cursor.execute('''CREATE TABLE IF NOT EXISTS usuarios (
-        patente TEXT PRIMARY KEY,
-        tipo TEXT NOT NULL CHECK(tipo IN ('Estudiante', 'Profesor')),
-        activo INTEGER NOT NULL DEFAULT 1
-    )''')
-    
-    cursor.execute('''CREATE TABLE IF NOT EXISTS estacionamientos (
-        id_espacio TEXT PRIMARY KEY,
-        estado TEXT NOT NULL CHECK(estado IN ('Libre', 'Ocupado', 'Reservado')),
-        patente_ocupante TEXT,
-        hora_ingreso TEXT,
-        FOREIGN KEY (patente_ocupante) REFERENCES usuarios(patente)
-    )''')
-
-    # --- INICIO DE LA MODIFICACIÓN ---
-    # Limpiar el estado de todos los estacionamientos al iniciar la aplicación.
-    # Esto elimina reservas y ocupaciones de la sesión anterior.
-    print("[INFO] Limpiando estados de estacionamiento de la sesión anterior...")
-    cursor.execute("""
-        UPDATE estacionamientos 
-        SET 
-            estado = 'Libre', 
-            patente_ocupante = NULL, 
-            hora_ingreso = NULL
-    """)
-    # --- FIN DE LA MODIFICACIÓN ---
-    
-    conn.commit()
-    conn.close()
-    print("[INFO] Base de datos inicializada y limpia en:", DATABASE_PATH)
 # --- Pestaña 1: Control de Acceso ---
 class AccessControlTab(QWidget):
-    # Señal que se emitirá cuando el estado de un estacionamiento cambie
-    spot_state_changed = pyqtSignal()
+    # Señal que se emitirá cuando el estado de un estacionamiento cambie: {id_espacio: {campo: valor}}
+    spot_state_changed = pyqtSignal(dict)
 
-    def __init__(self, db_connection):
+    def __init__(self, db_connection, ocr_backend=None, servidor=None, escritor_eventos=None, indice_autorizacion=None):
         super().__init__()
         self.conn = db_connection
+        self.escritor_eventos = escritor_eventos
+        self.indice_autorizacion = indice_autorizacion
         self.video_path = None
-        self.cap = None
-        
-        print("[INFO] [Acceso] Cargando modelos...")
-        self.model_placas = YOLO(MODELO_PLACAS_PATH)
-        self.model_vehiculos = YOLO(MODELO_VEHICULOS_PATH)
-        self.ocr_reader = PaddleOCR(use_angle_cls=True, lang='en')
-        
-        # Zona de detección
-        w, h = VIDEO_DISPLAY_SIZE
-        zone_width = int(w * 0.4)
-        self.detection_zone = ((w - zone_width) // 2, 200, zone_width, (h - zone_width) // 2)
 
-        self.timer_video = QTimer(self)
-        self.timer_video.timeout.connect(self.update_frame)
+        self.procesador = ProcesadorAcceso(ocr_backend, servidor, indice_autorizacion)
+        self.detection_zone = self.procesador.detection_zone
+
+        # Anillos preasignados entre etapas: captura -> inferencia -> render
+        self.anillo_captura = AnilloFrames(CAPTURE_RING_SLOTS)
+        self.anillo_render = AnilloFrames(RENDER_RING_SLOTS)
+        self._secuencia_mostrada = 0
+        registro.medidor("anillo_captura", lambda: {"pendientes": self.anillo_captura.pendientes,
+                                                    "descartados": self.anillo_captura.descartados})
+        registro.medidor("anillo_render", lambda: {"pendientes": self.anillo_render.pendientes,
+                                                   "descartados": self.anillo_render.descartados})
+        self.capture_worker = None
+        self.inference_worker = None
+
+        self.timer_render = QTimer(self)
+        self.timer_render.setTimerType(Qt.PreciseTimer)
+        self.timer_render.timeout.connect(self.render_latest_frame)
         self.pause_timer = QTimer(self)
         self.pause_timer.setSingleShot(True)
         self.pause_timer.timeout.connect(self.resume_detection)
         
         self.detection_paused = False
-        self.detection_buffer = defaultdict(int)
-        self.recent_plates = {}
         
         self.initUI()
     
@@ -126,12 +377,16 @@ class AccessControlTab(QWidget):
         video_group = QGroupBox("📷 Video en vivo: Circulación Vehicular")
         video_layout = QVBoxLayout()
 
-        self.video_label = QLabel("Seleccione un video para comenzar el monitoreo.")
+        self.video_label = VistaVideo("Seleccione un video para comenzar el monitoreo.", etapa="render")
+        self.video_label.al_liberar = self.anillo_render.devolver
         self.video_label.setAlignment(Qt.AlignCenter)
         self.video_label.setStyleSheet("background-color: black; color: white; font-size: 16px;")
         self.video_label.setFixedSize(*VIDEO_DISPLAY_SIZE)
 
         video_layout.addWidget(self.video_label)
+        self.omitidos_lbl = QLabel("Frames omitidos (zona quieta): 0 | OCR evitados (calidad): 0")
+        self.omitidos_lbl.setStyleSheet("font-size: 12px; color: #888888;")
+        video_layout.addWidget(self.omitidos_lbl)
         choose_video_btn = QPushButton("📁 Elegir archivo de video")
         choose_video_btn.clicked.connect(self.choose_video)
         video_layout.addWidget(choose_video_btn)
@@ -159,8 +414,9 @@ class AccessControlTab(QWidget):
         detect_group.setLayout(detect_layout)
 
         table_group = QGroupBox("🗂️ Registros de Ingreso Recientes")
-        self.table = QTableWidget(0, 5)
-        self.table.setHorizontalHeaderLabels(["Patente", "Tipo Vehículo", "Tipo Usuario", "Hora ingreso", "Estac."])
+        self.modelo_ingresos = ModeloIngresos(parent=self)
+        self.table = QTableView()
+        self.table.setModel(self.modelo_ingresos)
         table_layout = QVBoxLayout()
         table_layout.addWidget(self.table)
         table_group.setLayout(table_layout)
@@ -178,67 +434,46 @@ class AccessControlTab(QWidget):
         file_path, _ = QFileDialog.getOpenFileName(self, "Seleccionar archivo de video", "", "Videos (*.mp4 *.avi *.mov)")
         if file_path:
             self.video_path = file_path
-            if self.cap: self.cap.release()
-            self.cap = cv2.VideoCapture(self.video_path)
+            self.stop_video()
             self.reset_detection_state()
-            self.timer_video.start(30) # Un poco más lento para dar tiempo a la CPU
-
-    def update_frame(self):
-        if not self.cap or not self.cap.isOpened(): return
-        ret, frame = self.cap.read()
-        if not ret: self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0); return
-
-        frame = cv2.resize(frame, VIDEO_DISPLAY_SIZE)
-        display_frame = frame.copy()
-
-        if not self.detection_paused:
-            self.process_frame_with_zone(frame, display_frame)
-        else:
+            self.start_pipeline()
+
+    def start_pipeline(self):
+        self.anillo_captura.clear(); self.anillo_render.clear()
+        self.capture_worker = CaptureWorker(self.video_path, self.anillo_captura, self)
+        self.inference_worker = InferenceWorker(self.procesador, self.anillo_captura, self.anillo_render,
+                                                lambda: self.detection_paused, self)
+        self.inference_worker.plate_confirmed.connect(self.process_confirmed_plate)
+        self.capture_worker.start()
+        self.inference_worker.start()
+        self.timer_render.start(intervalo_render())
+
+    def render_latest_frame(self):
+        """
+        Etapa de render (hilo de la GUI), al ritmo de la pantalla: muestra el último frame anotado
+        si hay uno nuevo. El frame se pinta desde el slot del anillo, que queda prestado hasta el siguiente.
+        """
+        tomado = self.anillo_render.tomar(self._secuencia_mostrada, timeout=0)
+        if tomado is None: return
+        self._secuencia_mostrada, display_frame = tomado
+        registro.incrementar("frames_mostrados")
+
+        if self.detection_paused:
             self.estado_lbl.setText("Estado: Procesando entrada...")
             self.estado_lbl.setStyleSheet("font-size: 16px; font-weight: bold; color: #E67E22;")
 
-        self.clean_cooldown_list()
-        self.update_display(display_frame)
+        self.omitidos_lbl.setText(f"Frames omitidos (zona quieta): {self.procesador.frames_omitidos} | "
+                                  f"OCR evitados (calidad): {self.procesador.ocr_evitadas_calidad + self.procesador.ocr_evitadas_topk}")
+        self.video_label.mostrar(display_frame, self._secuencia_mostrada)
 
-    def process_frame_with_zone(self, frame_original, frame_to_annotate):
-        resultados_veh = self.model_vehiculos(frame_original, conf=CONFIDENCE_THRESHOLD_VEHICLE, verbose=False, classes=[1, 10, 11, 12, 13, 14, 15, 17])[0]
-        
-        for box in resultados_veh.boxes:
-            coords = box.xyxy[0].int().tolist()
-            if self.box_intersects_zone(coords):
-                x1v, y1v, x2v, y2v = coords
-                cv2.rectangle(frame_to_annotate, (x1v, y1v), (x2v, y2v), (0, 255, 0), 3)
-                
-                vehicle_crop = frame_original[y1v:y2v, x1v:x2v]
-                if vehicle_crop.size == 0: continue
-
-                resultados_placas = self.model_placas(vehicle_crop, conf=CONFIDENCE_THRESHOLD_PLACAS, verbose=False)[0]
-                if not resultados_placas.boxes: continue
-
-                for box_placa in resultados_placas.boxes:
-                    x1p_crop, y1p_crop, x2p_crop, y2p_crop = box_placa.xyxy[0].int().tolist()
-                    roi = vehicle_crop[y1p_crop:y2p_crop, x1p_crop:x2p_crop]
-                    plate_found = self.ocr_on_plate(roi)
-
-                    if plate_found and plate_found not in self.recent_plates:
-                        self.detection_buffer[plate_found] += 1
-                        if self.detection_buffer[plate_found] >= CONFIRMATION_THRESHOLD:
-                            cls_id = int(box.cls[0])
-                            tipo_vehiculo = NOMBRES_VEHICULOS[cls_id] if cls_id < len(NOMBRES_VEHICULOS) else "Desconocido"
-                            self.process_confirmed_plate(plate_found, tipo_vehiculo)
-                            self.detection_buffer.clear()
-                            return
-                break
-
-    def process_confirmed_plate(self, plate, tipo_vehiculo):
-        current_time = time.time()
-        if plate in self.recent_plates and current_time - self.recent_plates[plate] < COOLDOWN_SECONDS:
+    def process_confirmed_plate(self, plate, tipo_vehiculo, confianza=1.0):
+        # Con el índice en memoria, una lectura con una confusión de OCR se corrige a la patente registrada.
+        # El cooldown va sobre la patente corregida: BCFG34 y 8CFG34 son el mismo vehículo
+        plate, tipo_usuario = self.check_user_in_db(plate)
+        if not self.procesador.claim_cooldown(plate):
             return
 
         print(f"[INFO] [Acceso] Patente '{plate}' confirmada. Verificando...")
-        self.recent_plates[plate] = current_time
-        
-        tipo_usuario = self.check_user_in_db(plate)
         hora = datetime.datetime.now().strftime("%H:%M:%S")
 
         estado_msg, color_hex, estac_asignado = "", "", "---"
@@ -248,7 +483,8 @@ class AccessControlTab(QWidget):
             if estac_asignado:
                 estado_msg = f"Ingreso exitoso. Diríjase a {estac_asignado}"
                 color_hex = "#2ECC71"  # Verde
-                self.spot_state_changed.emit() # ¡EMITIR SEÑAL!
+                self.spot_state_changed.emit({estac_asignado: {  # ¡EMITIR SEÑAL!
+                    'estado': 'Reservado', 'patente_ocupante': plate, 'hora_ingreso': hora}})
             else:
                 estado_msg = "ACCESO DENEGADO: Estacionamiento LLENO"
                 color_hex = "#F39C12" # Naranja
@@ -264,60 +500,28 @@ class AccessControlTab(QWidget):
         self.estado_lbl.setText(f"Estado: {estado_msg}")
         self.estado_lbl.setStyleSheet(f"font-size: 16px; font-weight: bold; color: {color_hex};")
         
-        self.table.insertRow(0)
-        self.table.setItem(0, 0, QTableWidgetItem(plate))
-        self.table.setItem(0, 1, QTableWidgetItem(tipo_vehiculo))
-        self.table.setItem(0, 2, QTableWidgetItem(tipo_usuario or 'No Registrado'))
-        self.table.setItem(0, 3, QTableWidgetItem(hora))
-        self.table.setItem(0, 4, QTableWidgetItem(estac_asignado))
+        self.modelo_ingresos.agregar([plate, tipo_vehiculo, tipo_usuario or 'No Registrado', hora, estac_asignado or '---'])
+        if self.escritor_eventos:
+            # Registro histórico: solo se encola, el hilo escritor lo persiste en lote
+            self.escritor_eventos.registrar(nuevo_evento(plate, tipo_vehiculo, tipo_usuario, estac_asignado or None,
+                                                         CAMARA_ACCESO_GUI, confianza))
         
         self.pause_detection()
 
     def asignar_espacio_libre(self, patente, hora):
-        """Busca un espacio libre en la DB, lo ocupa y devuelve su ID."""
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT id_espacio FROM estacionamientos WHERE estado = 'Libre' ORDER BY id_espacio LIMIT 1")
-        resultado = cursor.fetchone()
-        
-        if resultado:
-            id_espacio = resultado[0]
-            print(f"[INFO] [Acceso] Reservando espacio '{id_espacio}' para la patente '{patente}'.")
-            # <<< CAMBIO 2: CAMBIAR EL ESTADO A 'Reservado' >>>
-            cursor.execute("""
-                UPDATE estacionamientos 
-                SET estado = 'Reservado', patente_ocupante = ?, hora_ingreso = ? 
-                WHERE id_espacio = ?
-            """, (patente, hora, id_espacio))
-            self.conn.commit()
-            return id_espacio
-        else:
-            print("[WARN] [Acceso] No hay espacios de estacionamiento libres.")
-            return None
+        return asignar_espacio_libre(self.conn, patente, hora)
+
     def simulate_entry(self):
         test_plate = "BCFG34"
         test_vehicle_type = "Auto"
         cursor = self.conn.cursor()
         cursor.execute("INSERT OR IGNORE INTO usuarios (patente, tipo, activo) VALUES (?, 'Profesor', 1)", (test_plate,))
         self.conn.commit()
+        if self.indice_autorizacion is not None: self.indice_autorizacion.invalidar()
         self.process_confirmed_plate(test_plate, test_vehicle_type)
         QMessageBox.information(self, "Simulación", f"Se ha simulado la entrada del vehículo {test_vehicle_type} con patente {test_plate}.")
 
     # --- Métodos de ayuda y UI (sin cambios mayores) ---
-    def update_display(self, frame):
-        x, y, w, h = self.detection_zone
-        cv2.rectangle(frame, (x, y), (x + w, y + h), (255, 255, 0), 2)
-        cv2.putText(frame, "ZONA DE DETECCION", (x + 5, y + 25), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 0), 2)
-        rgb_image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        h, w, ch = rgb_image.shape
-        bytes_per_line = ch * w
-        qt_img = QImage(rgb_image.data, w, h, bytes_per_line, QImage.Format_RGB888)
-        self.video_label.setPixmap(QPixmap.fromImage(qt_img))
-
-    def box_intersects_zone(self, box_coords):
-        zx, zy, zw, zh = self.detection_zone; zx2, zy2 = zx + zw, zy + zh
-        bx1, by1, bx2, by2 = box_coords
-        return bx1 < zx2 and bx2 > zx and by1 < zy2 and by2 > zy
-
     def pause_detection(self):
         self.detection_paused = True
         self.pause_timer.start(PAUSE_AFTER_DETECTION_MS)
@@ -334,72 +538,167 @@ class AccessControlTab(QWidget):
 
     def reset_detection_state(self):
         self.detection_paused = False; self.pause_timer.stop()
-        self.detection_buffer.clear(); self.recent_plates.clear()
+        self.procesador.reset()
         self.reset_ui_labels()
 
-    def ocr_on_plate(self, roi):
-        if roi is None or roi.size == 0: return ""
-        results = self.ocr_reader.predict(roi)
-        detected_texts = []
-        if not results or not results[0]: return ""
-        result_data = results[0]
-        if isinstance(result_data, dict):
-            if 'rec_texts' in result_data and 'rec_scores' in result_data:
-                for text, score in zip(result_data.get('rec_texts', []), result_data.get('rec_scores', [])):
-                    if score > OCR_CONFIDENCE_THRESHOLD: detected_texts.append(text)
-        elif isinstance(result_data, list):
-            for line in result_data:
-                try:
-                    text, score = line[1]
-                    if score > OCR_CONFIDENCE_THRESHOLD: detected_texts.append(text)
-                except (IndexError, TypeError, ValueError): continue
-        if not detected_texts: return ""
-        valid_plates = self.filtrar_patentes(detected_texts)
-        return valid_plates[0] if valid_plates else ""
-
-
-    def filtrar_patentes(self, textos):
-        posibles = []
-        for t in textos:
-            t_limpio = re.sub(r'[^A-Z0-9]', '', t.upper().strip())
-            if len(t_limpio) == 6 and any(c.isdigit() for c in t_limpio) and any(c.isalpha() for c in t_limpio):
-                posibles.append(t_limpio)
-        return posibles
-
     def check_user_in_db(self, patente):
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT tipo FROM usuarios WHERE patente = ? AND activo = 1", (patente,))
-        row = cursor.fetchone()
-        return row[0] if row else None
-
-    def clean_cooldown_list(self):
-        current_time = time.time()
-        keys_to_delete = [p for p, ts in self.recent_plates.items() if current_time - ts > COOLDOWN_SECONDS]
-        for key in keys_to_delete:
-            if key in self.recent_plates: del self.recent_plates[key]
+        """Devuelve (patente, tipo_usuario); la patente puede venir corregida por el índice de autorización."""
+        if self.indice_autorizacion is not None:
+            return self.indice_autorizacion.tipo_usuario(patente)
+        return patente, check_user_in_db(self.conn, patente)
 
     def stop_video(self):
-        self.timer_video.stop()
-        if self.cap: self.cap.release(); self.cap = None
+        self.timer_render.stop()
+        for worker in (self.capture_worker, self.inference_worker):
+            if worker:
+                worker.requestInterruption()
+                worker.wait()
+        self.capture_worker = self.inference_worker = None
 
 # --- Pestaña 2: Monitoreo de Estacionamiento ---
+class CapaEspacios:
+    """
+    Anotaciones de los espacios calibrados, mantenidas en una copia de la imagen base. Con una base nueva
+    se dibuja todo; si solo cambian estados, cada espacio cambiado restaura su región desde la base y se
+    redibujan, recortados a esa región, los espacios que la tocan: el costo depende de los cambios, no
+    del tamaño del estacionamiento. La geometría de cada espacio (caja, región pintada y tamaño del texto)
+    se calcula una vez en un arreglo estructurado.
+    """
+    COLORES = {
+        'Libre': (0, 255, 0),       # Verde (BGR)
+        'Ocupado': (0, 0, 255),     # Rojo
+        'Reservado': (0, 155, 255)  # Amarillo
+    }
+    GEOMETRIA_DTYPE = np.dtype([("caja", "<i4", (4,)), ("region", "<i4", (4,)), ("texto", "<i4", (2,))])
+    MARGEN_PX = 3  # Cubre el borde de 3 px y el trazo del texto
+
+    def __init__(self, mapa):
+        self.ids = [id_espacio for id_espacio, _ in mapa.espacios]
+        self.geometria = np.zeros(len(self.ids), dtype=self.GEOMETRIA_DTYPE)
+        m = self.MARGEN_PX
+        for i, (id_espacio, caja) in enumerate(zip(self.ids, mapa.cajas)):
+            x1, y1, x2, y2 = map(int, caja)
+            (w, h), linea_base = cv2.getTextSize(id_espacio, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)
+            self.geometria["caja"][i] = (x1, y1, x2, y2)
+            self.geometria["region"][i] = (x1 - m, y1 - h - 5 - m, max(x2, x1 + w) + m, max(y2, y1 - 5 + linea_base) + m)
+            self.geometria["texto"][i] = (w, h)
+        self.base = self.anotada = None
+        self.estados = [None] * len(self.ids)
+        self.redibujados = 0
+
+    def pintar(self, imagen, estados):
+        """Devuelve la imagen anotada según `estados` ({id_espacio: estado}, 'Libre' si falta). `imagen` no se modifica."""
+        nuevos = [estados.get(id_espacio, 'Libre') for id_espacio in self.ids]
+        if imagen is not self.base:
+            self.base = imagen
+            if self.anotada is None or self.anotada.shape != imagen.shape:
+                self.anotada = np.empty_like(imagen)
+            np.copyto(self.anotada, imagen)
+            self.estados = nuevos
+            for i in range(len(self.ids)):
+                self._dibujar(self.anotada, i, 0, 0)
+            self.redibujados += len(self.ids)
+            return self.anotada
+
+        cambiados = [i for i, (anterior, nuevo) in enumerate(zip(self.estados, nuevos)) if anterior != nuevo]
+        self.estados = nuevos
+        alto, ancho = imagen.shape[:2]
+        regiones = self.geometria["region"]
+        for i in cambiados:
+            x1, y1, x2, y2 = regiones[i]
+            x1, y1, x2, y2 = max(int(x1), 0), max(int(y1), 0), min(int(x2), ancho), min(int(y2), alto)
+            if x2 <= x1 or y2 <= y1: continue
+            vista = self.anotada[y1:y2, x1:x2]  # cv2 dibuja sobre la vista y recorta en sus bordes
+            vista[...] = imagen[y1:y2, x1:x2]
+            # Mismo orden que el dibujo completo: dentro de la región el resultado es idéntico
+            tocan = np.flatnonzero((regiones[:, 0] < x2) & (regiones[:, 2] > x1) & (regiones[:, 1] < y2) & (regiones[:, 3] > y1))
+            for j in tocan:
+                self._dibujar(vista, j, x1, y1)
+            self.redibujados += len(tocan)
+        return self.anotada
+
+    def _dibujar(self, destino, i, ox, oy):
+        x1, y1, x2, y2 = (int(v) - o for v, o in zip(self.geometria["caja"][i], (ox, oy, ox, oy)))
+        w, h = (int(v) for v in self.geometria["texto"][i])
+        cv2.rectangle(destino, (x1, y1), (x2, y2), self.COLORES.get(self.estados[i], (255, 255, 255)), 3)
+        # Fondo negro para que el ID sea legible sobre cualquier color
+        cv2.rectangle(destino, (x1, y1 - h - 5), (x1 + w, y1), (0, 0, 0), -1)
+        cv2.putText(destino, self.ids[i], (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+
+
+class MonitorWorker(QThread):
+    """
+    Monitoreo continuo de un video: muestrea un frame cada MONITOREO_INTERVALO_S, lo clasifica sobre
+    el mapa calibrado y escribe en la BD (con su propia conexión) solo los cambios suavizados.
+    """
+    frame_sampled = pyqtSignal(object)
+    spots_changed = pyqtSignal(dict)
+
+    def __init__(self, video_path, mapa, modelo, parent=None):
+        super().__init__(parent)
+        self.video_path = video_path
+        self.mapa = mapa
+        self.modelo = modelo
+
+    def run(self):
+        cap = cv2.VideoCapture(self.video_path)
+        if not cap.isOpened():
+            print(f"[ERROR] [Monitoreo] No se pudo abrir el video: {self.video_path}")
+            return
+        conn = conectar()
+        monitor = MonitorEspacios(self.mapa, self.modelo, conn)
+        for frame in muestrear_video(cap, self.isInterruptionRequested, MONITOREO_INTERVALO_S):
+            cambios = monitor.procesar(frame)
+            if cambios:
+                self.spots_changed.emit(cambios_a_delta(cambios))
+            self.frame_sampled.emit(frame)
+
+        cap.release()
+        conn.close()
+        print(f"[INFO] [Monitoreo] Video detenido: {monitor.muestras} muestras, {monitor.escrituras} escrituras en BD.")
+
+
 class ParkingStatusTab(QWidget):
-    def __init__(self, db_connection):
+    def __init__(self, db_connection, servidor=None):
         super().__init__()
         self.conn = db_connection
+        self.servidor = servidor
         print("[INFO] [Monitoreo] Cargando modelo...")
         self.model = self.load_model()
+        self._clasificador = None
         self.current_image = None
+        self.monitor_worker = None
+        # Geometría calibrada de los espacios: IDs estables entre imágenes (None hasta calibrar)
+        self.mapa = MapaEspacios.cargar(self.conn, CAMARA_MONITOREO)
+        self.capa = CapaEspacios(self.mapa) if self.mapa is not None else None
         self.initUI()
         self.refresh_from_db() # Cargar estado inicial de la DB
 
     def load_model(self):
         try:
-            return YOLO(MODELO_PARKING_SLOTS_PATH)
+            if self.servidor is not None:
+                return self.servidor.modelo("parking")
+            return cargar_modelo(MODELO_PARKING_SLOTS_PATH)
         except Exception as e:
             QMessageBox.critical(self, "Error de Modelo", f"No se pudo cargar el modelo de estacionamientos: {e}")
             return None
 
+    @property
+    def clasificador(self):
+        """Se carga en el primer uso, no al construir la pestaña."""
+        if self._clasificador is None:
+            self._clasificador = self.load_classifier()
+        return self._clasificador
+
+    def load_classifier(self):
+        """Clasificador libre/ocupado del modo "recortes" (validar_modo garantiza que está configurado)."""
+        try:
+            return cargar_modelo(MODELO_CLASIFICADOR_ESPACIOS_PATH)
+        except Exception as e:
+            # Sin fallback al detector: no está entrenado con recortes de un solo espacio
+            QMessageBox.critical(self, "Error de Modelo", f"No se pudo cargar el clasificador de espacios: {e}")
+            return None
+
     def initUI(self):
         main_layout = QHBoxLayout()
         left_panel = QVBoxLayout()
@@ -408,7 +707,7 @@ class ParkingStatusTab(QWidget):
         # Panel Izquierdo (Imagen)
         image_group = QGroupBox("📷 Imagen del Estacionamiento")
         image_layout = QVBoxLayout()
-        self.image_label = QLabel("Cargue una imagen para analizar y actualizar el estado de los espacios.")
+        self.image_label = VistaVideo("Cargue una imagen para analizar y actualizar el estado de los espacios.")
         self.image_label.setAlignment(Qt.AlignCenter)
         self.image_label.setMinimumSize(640, 480)
         self.image_label.setStyleSheet("border: 1px solid gray;")
@@ -417,9 +716,21 @@ class ParkingStatusTab(QWidget):
         
         choose_image_btn = QPushButton("📁 Analizar Imagen y Actualizar BD")
         choose_image_btn.clicked.connect(self.choose_and_process_image)
+        calibrate_btn = QPushButton("📐 Calibrar Espacios con la Imagen Actual")
+        calibrate_btn.clicked.connect(self.calibrate_slots)
         
         left_panel.addWidget(image_group)
         left_panel.addWidget(choose_image_btn)
+        left_panel.addWidget(calibrate_btn)
+
+        video_layout = QHBoxLayout()
+        monitor_video_btn = QPushButton("🎥 Monitorear Video")
+        monitor_video_btn.clicked.connect(self.choose_and_monitor_video)
+        stop_monitor_btn = QPushButton("⏹️ Detener Monitoreo")
+        stop_monitor_btn.clicked.connect(self.stop_monitoring)
+        video_layout.addWidget(monitor_video_btn)
+        video_layout.addWidget(stop_monitor_btn)
+        left_panel.addLayout(video_layout)
 
         # Panel Derecho (Datos)
         summary_group = QGroupBox("📊 Resumen de Ocupación (Desde BD)")
@@ -439,8 +750,10 @@ class ParkingStatusTab(QWidget):
         summary_group.setLayout(summary_layout)
 
         table_group = QGroupBox("🗂️ Estado Actual de Espacios (Desde BD)")
-        self.table = QTableWidget(0, 4)
-        self.table.setHorizontalHeaderLabels(["ID Espacio", "Estado", "Patente Ocupante", "Hora Ingreso"])
+        self.modelo_espacios = ModeloEspacios(self)
+        self.modelo_espacios.conteos_cambiados.connect(self.update_summary)
+        self.table = QTableView()
+        self.table.setModel(self.modelo_espacios)
         self.table.setColumnWidth(0, 100); self.table.setColumnWidth(1, 100)
         self.table.setColumnWidth(2, 120); self.table.setColumnWidth(3, 100)
         table_layout = QVBoxLayout()
@@ -467,230 +780,308 @@ class ParkingStatusTab(QWidget):
             else:
                 QMessageBox.warning(self, "Error", "No se pudo cargar la imagen.")
 
+    def choose_and_monitor_video(self):
+        file_path, _ = QFileDialog.getOpenFileName(self, "Seleccionar video del estacionamiento", "", "Videos (*.mp4 *.avi *.mov)")
+        if not file_path or self.model is None: return
+        self.stop_monitoring()
+
+        # Sin geometría guardada, el primer frame del video sirve de calibración
+        if self.mapa is None:
+            cap = cv2.VideoCapture(file_path)
+            ret, frame = cap.read()
+            cap.release()
+            if not ret:
+                QMessageBox.warning(self, "Error", "No se pudo leer el video.")
+                return
+            self.current_image = frame
+            if not self.calibrate_slots(): return
+
+        modelo = self.clasificador if MONITOREO_MODO == "recortes" else self.model
+        if modelo is None: return
+        self.monitor_worker = MonitorWorker(file_path, self.mapa, modelo, self)
+        self.monitor_worker.frame_sampled.connect(self.show_monitor_frame)
+        self.monitor_worker.spots_changed.connect(self.apply_changes)
+        self.monitor_worker.start()
+
+    def show_monitor_frame(self, frame):
+        self.current_image = frame
+        self.draw_annotations_on_image(self.modelo_espacios.estados())
+
+    def stop_monitoring(self):
+        if self.monitor_worker:
+            self.monitor_worker.requestInterruption()
+            self.monitor_worker.wait()
+        self.monitor_worker = None
+
+    def calibrate_slots(self):
+        """Guarda la geometría de los espacios detectados en la imagen actual. Los IDs quedan fijos desde aquí."""
+        if self.model is None or self.current_image is None:
+            QMessageBox.warning(self, "Calibración", "Cargue primero una imagen del estacionamiento.")
+            return False
+        self.stop_monitoring()  # El monitoreo en curso usa el mapa anterior
+        cajas = [caja for caja, _ in detectar_espacios(self.model, self.current_image)]
+        if not cajas:
+            QMessageBox.warning(self, "Calibración", "No se detectaron espacios en la imagen.")
+            return False
+        self.mapa = MapaEspacios.desde_detecciones(CAMARA_MONITOREO, cajas)
+        self.mapa.guardar(self.conn)
+        self.capa = CapaEspacios(self.mapa)
+        print(f"[INFO] [Monitoreo] Calibrados {len(self.mapa)} espacios para la cámara '{CAMARA_MONITOREO}'.")
+        self.draw_annotations_on_image(self.modelo_espacios.estados())
+        return True
+
     def process_image_and_update_db(self):
         if self.model is None or self.current_image is None: return
+        self.stop_monitoring()
 
-        # Ejecutar la detección en la imagen
-        results = self.model(self.current_image, verbose=False)
-        
-        # Guardar las detecciones ordenadas en caché para usarlas después al dibujar
-        self.detections_cache = sorted(results[0].boxes, key=lambda box: (box.xyxy[0][1], box.xyxy[0][0]))
-        
-        cursor = self.conn.cursor()
-        class_names = self.model.model.names
-        
-        # --- INICIO DE LA LÓGICA DE ACTUALIZACIÓN MEJORADA ---
+        # Sin geometría guardada, la primera imagen sirve de calibración
+        if self.mapa is None and not self.calibrate_slots(): return
         print("[INFO] [Monitoreo] Analizando imagen y actualizando base de datos...")
-        
-        slot_id_counter = 1
-        processed_slots_count = 0
-
-        for box in self.detections_cache:
-            # Asignar un ID consistente al espacio de estacionamiento
-            slot_id = f"E-{slot_id_counter:02d}"
-            slot_id_counter += 1
-            
-            # Determinar el estado FÍSICO del espacio según la detección del modelo
-            cls_id = int(box.cls[0].item())
-            status_name = class_names[cls_id].lower()
-            estado_fisico_detectado = 'Ocupado' if 'occupied' in status_name else 'Libre'
-
-            # 1. Asegurarse de que el espacio exista en la base de datos.
-            # Si es la primera vez que se detecta, se inserta como 'Libre'.
-            cursor.execute("INSERT OR IGNORE INTO estacionamientos (id_espacio, estado) VALUES (?, 'Libre')", (slot_id,))
-            
-            # 2. Obtener el estado LÓGICO actual del espacio desde la base de datos.
-            cursor.execute("SELECT estado FROM estacionamientos WHERE id_espacio = ?", (slot_id,))
-            db_state_row = cursor.fetchone()
-            if not db_state_row: continue # Si algo falló, saltar a la siguiente detección
-            
-            estado_logico_en_db = db_state_row[0]
-
-            # 3. Aplicar la lógica de transición de estados
-            if estado_fisico_detectado == 'Ocupado' and estado_logico_en_db != 'Ocupado':
-                # CASO A: El modelo ve un coche donde lógicamente no debería haberlo (o estaba reservado).
-                # Esto confirma la ocupación, ya sea de una reserva o de una nueva llegada.
-                # Se actualiza el estado a 'Ocupado'.
-                print(f"[Monitoreo] Espacio {slot_id} detectado como Ocupado (antes {estado_logico_en_db}). Actualizando a 'Ocupado'.")
-                cursor.execute("UPDATE estacionamientos SET estado = 'Ocupado' WHERE id_espacio = ?", (slot_id,))
-                processed_slots_count += 1
-
-            elif estado_fisico_detectado == 'Libre' and estado_logico_en_db == 'Ocupado':
-                # CASO B: El modelo ve un espacio libre donde lógicamente había un coche.
-                # Esto significa que un vehículo se ha ido.
-                # Se libera el espacio, limpiando la patente y la hora de ingreso.
-                print(f"[Monitoreo] Espacio {slot_id} detectado como Libre (antes Ocupado). Actualizando a 'Libre'.")
-                cursor.execute("UPDATE estacionamientos SET estado = 'Libre', patente_ocupante = NULL, hora_ingreso = NULL WHERE id_espacio = ?", (slot_id,))
-                processed_slots_count += 1
-            
-            # CASO C (implícito): Si el estado físico detectado es 'Libre' y el estado lógico en la BD es 'Reservado',
-            # NO HACEMOS NADA. Esto es crucial, ya que le da tiempo al conductor para llegar a su espacio asignado
-            # sin que el sistema lo marque como 'Libre' por error.
-
-            # CASO D (implícito): Si el estado físico coincide con el lógico (Ocupado-Ocupado, Libre-Libre),
-            # tampoco se hace nada, ya que la base de datos ya está sincronizada.
 
-        self.conn.commit()
-        print(f"[INFO] [Monitoreo] Base de datos actualizada. Se modificaron {processed_slots_count} registros.")
+        # Estado FÍSICO de cada espacio calibrado: un lote de recortes, o el detector emparejado por posición
+        if MONITOREO_MODO == "recortes":
+            if self.clasificador is None: return
+            estados_fisicos = self.mapa.clasificar(self.clasificador, self.current_image)
+        else:
+            detecciones = self.mapa.asignar(detectar_espacios_arreglo(self.model, [self.current_image])[0])
+            estados_fisicos = self.mapa.estados_detectados(detecciones, self.model.names)
+
+        # Reconciliación en bloque: una lectura, transiciones en memoria y solo las filas cambiadas
+        cambios = reconciliar_ocupacion(self.conn, estados_fisicos)
+        for cambio in cambios:
+            print(f"[Monitoreo] Espacio {cambio.id_espacio}: {cambio.anterior or 'nuevo'} -> {cambio.nuevo}.")
+        print(f"[INFO] [Monitoreo] Base de datos actualizada. Se modificaron {len(cambios)} registros.")
         
-        # Después de actualizar la BD, se refresca toda la UI para mostrar los cambios.
-        # Esto incluye la tabla, los contadores y las anotaciones en la imagen.
-        self.refresh_from_db()
+        # Solo se actualizan en la UI las filas que cambiaron, y se redibujan las anotaciones.
+        self.apply_changes(cambios_a_delta(cambios))
 
         # Mostrar un mensaje al usuario
         QMessageBox.information(self, "Análisis Completado", 
                                 f"Se ha analizado la imagen y actualizado la base de datos.\n"
-                                f"Se modificó el estado de {processed_slots_count} espacios.")
+                                f"Se modificó el estado de {len(cambios)} espacios.")
 
     def refresh_from_db(self):
         """Carga los datos desde la BD y actualiza toda la UI (tabla, resumen e imagen)."""
         print("[INFO] [Monitoreo] Refrescando vista completa desde la base de datos.")
         cursor = self.conn.cursor()
         cursor.execute("SELECT id_espacio, estado, patente_ocupante, hora_ingreso FROM estacionamientos ORDER BY id_espacio")
-        rows = cursor.fetchall()
-        
-        self.table.setRowCount(0)
-        occupied_count = 0
-        reserved_count = 0
-        
-        # --- INICIO DE LA LÓGICA DE ACTUALIZACIÓN DE UI ---
-        # Define los colores para cada estado
-        colors = {
-            'Libre': QColor("#2ECC71"),      # Verde
-            'Ocupado': QColor("#E74C3C"),    # Rojo
-            'Reservado': QColor("#ff9b00")   # Amarillo
-        }
-
-        # Itera sobre los datos de la BD para llenar la tabla
-        for row_data in rows:
-            row_idx = self.table.rowCount()
-            self.table.insertRow(row_idx)
-            
-            estado = row_data[1]  # El estado está en la segunda columna (índice 1)
-            
-            # Contar cada tipo de estado
-            if estado == 'Ocupado':
-                occupied_count += 1
-            elif estado == 'Reservado':
-                reserved_count += 1
-            
-            # Obtener el color correspondiente al estado
-            color = colors.get(estado, QColor("white")) # Usa blanco si el estado es desconocido
-
-            # Llenar cada celda de la fila y aplicarle el color de fondo
-            for col_idx, cell_data in enumerate(row_data):
-                item = QTableWidgetItem(str(cell_data or "---"))
-                item.setBackground(color)
-                # Opcional: Hacer el texto blanco para mejor contraste en fondos oscuros
-                if estado in ['Ocupado', 'Reservado']:
-                    item.setForeground(QColor("white"))
-                self.table.setItem(row_idx, col_idx, item)
-        
-        # Actualizar los contadores del resumen
-        total_slots = len(rows)
+        self.modelo_espacios.cargar(cursor.fetchall())
+
+        # Si hay una imagen y espacios calibrados, redibujar las anotaciones
+        # para que los colores coincidan con el nuevo estado de la BD.
+        if self.current_image is not None and self.mapa is not None:
+            self.draw_annotations_on_image(self.modelo_espacios.estados())
+
+    def apply_changes(self, delta):
+        """Aplica un delta {id_espacio: {campo: valor}} sin releer la BD: solo cambian las filas afectadas."""
+        self.modelo_espacios.aplicar_cambios(delta)
+        if self.current_image is not None and self.mapa is not None:
+            self.draw_annotations_on_image(self.modelo_espacios.estados())
+
+    def update_summary(self):
+        conteos = self.modelo_espacios.conteos
+        total_slots = self.modelo_espacios.rowCount()
+        occupied_count, reserved_count = conteos['Ocupado'], conteos['Reservado']
         available_count = total_slots - occupied_count - reserved_count
-        
+
         self.total_lbl.setText(f"Total de espacios: {total_slots}")
         self.occupied_lbl.setText(f"Ocupados: {occupied_count}")
-        self.reserved_lbl.setText(f"Reservados: {reserved_count}") # Actualizar el nuevo label
+        self.reserved_lbl.setText(f"Reservados: {reserved_count}")
         self.available_lbl.setText(f"Disponibles: {available_count}")
 
-        # Si hay una imagen y detecciones en caché, redibujar las anotaciones
-        # para que los colores coincidan con el nuevo estado de la BD.
-        if self.current_image is not None and self.detections_cache is not None:
-            self.draw_annotations_on_image()
-
-    def draw_annotations_on_image(self):
-        """Dibuja las detecciones en la imagen, coloreando según el estado actual de la BD."""
-        if self.current_image is None or self.detections_cache is None:
+    def draw_annotations_on_image(self, db_states=None):
+        """
+        Dibuja los espacios calibrados en la imagen, coloreando según el estado actual de la BD
+        (no la detección física). Sobre la misma imagen solo se redibujan los espacios que cambiaron.
+        """
+        if self.current_image is None or self.mapa is None:
             return
-        
-        annotated_image = self.current_image.copy()
-        
-        # --- INICIO DE LA LÓGICA DE DIBUJADO BASADO EN LA BD ---
-        # 1. Obtener el estado actual de TODOS los espacios desde la base de datos
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT id_espacio, estado FROM estacionamientos")
-        # Crear un diccionario para un acceso rápido: {'E-01': 'Libre', 'E-02': 'Reservado', ...}
-        db_states = {row[0]: row[1] for row in cursor.fetchall()}
-        
-        # 2. Definir los colores para OpenCV (formato BGR: Azul, Verde, Rojo)
-        colors_cv = {
-            'Libre': (0, 255, 0),      # Verde
-            'Ocupado': (0, 0, 255),    # Rojo
-            'Reservado': (0, 155, 255)  # Amarillo
-        }
-
-        # 3. Iterar sobre las detecciones cacheadas (las coordenadas de los cuadros)
-        slot_id_counter = 1
-        for box in self.detections_cache:
-            slot_id = f"E-{slot_id_counter:02d}"
-            slot_id_counter += 1
-            
-            x1, y1, x2, y2 = map(int, box.xyxy[0].tolist())
-            
-            # 4. Usar el estado de la BD para elegir el color, no la detección física
-            estado_logico_actual = db_states.get(slot_id, 'Libre') # Default a 'Libre' si no se encuentra
-            color = colors_cv.get(estado_logico_actual, (255, 255, 255)) # Blanco por defecto
-
-            # Dibujar el rectángulo con el color correspondiente
-            cv2.rectangle(annotated_image, (x1, y1), (x2, y2), color, 3) # Borde más grueso
-            
-            # Añadir una etiqueta con el ID del espacio para fácil identificación
-            # Poner un fondo negro al texto para que sea legible sobre cualquier color
-            (w, h), _ = cv2.getTextSize(slot_id, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)
-            cv2.rectangle(annotated_image, (x1, y1 - h - 5), (x1 + w, y1), (0,0,0), -1)
-            cv2.putText(annotated_image, slot_id, (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255,255,255), 2)
-            
-        # 5. Mostrar la imagen final anotada en la interfaz
-        self.display_image(annotated_image)
+
+        # Estado de TODOS los espacios desde la base de datos, si no vino dado: {'E-01': 'Libre', ...}
+        if db_states is None:
+            db_states = dict(self.conn.execute("SELECT id_espacio, estado FROM estacionamientos").fetchall())
+
+        with registro.cronometro("anotacion_espacios"):
+            anotada = self.capa.pintar(self.current_image, db_states)
+        self.display_image(anotada)
 
     def display_image(self, cv_img):
-        rgb_image = cv2.cvtColor(cv_img, cv2.COLOR_BGR2RGB)
-        h, w, ch = rgb_image.shape
-        bytes_per_line = ch * w
-        qt_image = QImage(rgb_image.data, w, h, bytes_per_line, QImage.Format_RGB888)
-        pixmap = QPixmap.fromImage(qt_image)
-        scaled_pixmap = pixmap.scaled(self.image_label.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        self.image_label.setPixmap(scaled_pixmap)
+        # Sin conversión ni reescalado previo: la vista envuelve el buffer y Qt escala al pintar
+        self.image_label.mostrar(cv_img)
+
+# --- Pestaña 3: Diagnóstico ---
+class DiagnosticsTab(QWidget):
+    """
+    Panel de diagnóstico: latencia por etapa, FPS, OCR por confirmación, frames omitidos/descartados
+    y profundidad de colas, refrescado cada METRICAS_REFRESCO_MS. Si METRICAS_ARCHIVO_PROMETHEUS
+    está configurado, el mismo refresco escribe el archivo de texto de Prometheus.
+    """
+    def __init__(self):
+        super().__init__()
+        layout = QVBoxLayout()
+        resumen_group = QGroupBox("⏱️ Rendimiento del pipeline")
+        resumen_layout = QGridLayout()
+        self.fps_lbl = QLabel("FPS: --")
+        self.ocr_lbl = QLabel("OCR por confirmación: --")
+        self.frames_lbl = QLabel("Frames omitidos / descartados: --")
+        self.colas_lbl = QLabel("Colas: --")
+        for i, lbl in enumerate([self.fps_lbl, self.ocr_lbl, self.frames_lbl, self.colas_lbl]):
+            lbl.setStyleSheet("font-size: 14px;")
+            resumen_layout.addWidget(lbl, i, 0)
+        resumen_group.setLayout(resumen_layout)
+
+        etapas_group = QGroupBox("📈 Latencia por etapa (últimas muestras)")
+        self.modelo_etapas = ModeloEtapas(self)
+        self.table = QTableView()
+        self.table.setModel(self.modelo_etapas)
+        etapas_layout = QVBoxLayout()
+        etapas_layout.addWidget(self.table)
+        etapas_group.setLayout(etapas_layout)
+
+        layout.addWidget(resumen_group)
+        layout.addWidget(etapas_group)
+        self.setLayout(layout)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refrescar)
+        self.timer.start(METRICAS_REFRESCO_MS)
+
+    def refrescar(self):
+        if METRICAS_ARCHIVO_PROMETHEUS:
+            try:
+                registro.escribir_prometheus(METRICAS_ARCHIVO_PROMETHEUS)
+            except OSError as e:
+                print(f"[WARN] [Diagnóstico] No se pudo escribir {METRICAS_ARCHIVO_PROMETHEUS}: {e}")
+        if not self.isVisible(): return  # El panel solo se recalcula cuando se está mirando
+
+        resumen = registro.resumen()
+        contadores, tasas, medidores = resumen["contadores"], resumen["tasas"], resumen["medidores"]
+        self.modelo_etapas.cargar(resumen["etapas"])
+        self.fps_lbl.setText(f"FPS: decodificación {tasas.get('frames_decodificados', 0):.1f} | "
+                             f"inferencia {tasas.get('frames_procesados', 0):.1f} | "
+                             f"pantalla {tasas.get('frames_mostrados', 0):.1f}")
+        confirmaciones = contadores.get("confirmaciones", 0)
+        por_confirmacion = f"{contadores.get('ocr_llamadas', 0) / confirmaciones:.1f}" if confirmaciones else "--"
+        self.ocr_lbl.setText(f"OCR por confirmación: {por_confirmacion} ({confirmaciones} confirmaciones, "
+                             f"{contadores.get('ocr_evitadas_calidad', 0) + contadores.get('ocr_evitadas_topk', 0)} OCR evitados)")
+        self.frames_lbl.setText(f"Frames omitidos (zona quieta): {contadores.get('frames_omitidos', 0)} | "
+                                f"descartados: captura {medidores.get('anillo_captura_descartados', 0):.0f}, "
+                                f"render {medidores.get('anillo_render_descartados', 0):.0f}")
+        colas = {nombre: valor for nombre, valor in medidores.items() if nombre.endswith(("pendientes", "cola"))}
+        self.colas_lbl.setText("Colas: " + ("  ".join(f"{n} {v:.0f}" for n, v in sorted(colas.items())) or "--"))
+
+
+# --- Carga en segundo plano ---
+class PreparacionWorker(QThread):
+    """Crea el backend de OCR y calienta el procesador de acceso sin bloquear la ventana."""
+    estado = pyqtSignal(str, str, float)
+
+    def __init__(self, procesador, parent=None):
+        super().__init__(parent)
+        self.procesador = procesador
+
+    def run(self):
+        t0 = time.perf_counter()
+        self.estado.emit("ocr", "cargando", 0.0)
+        try:
+            self.procesador.preparar()
+            self.estado.emit("ocr", "listo", time.perf_counter() - t0)
+        except Exception as e:
+            print(f"[ERROR] [Arranque] No se pudo preparar el OCR: {e}")
+            self.estado.emit("ocr", "error", time.perf_counter() - t0)
+
 
 # --- Ventana Principal de la Aplicación ---
 class SmartParkingApp(QMainWindow):
+    # (componente, estado, segundos); la emiten los hilos de carga y se atiende en el hilo de la GUI
+    estado_carga = pyqtSignal(str, str, float)
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Sistema Integrado de Gestión de Estacionamiento")
         self.setGeometry(50, 50, 1300, 900)
 
-        # Conexión a la base de datos compartida
-        self.db_connection = sqlite3.connect(DATABASE_PATH)
+        # Indicador de carga de modelos en la barra de estado
+        self.estado_componentes = {nombre: "pendiente" for nombre in list(MODELOS_SERVIDOR) + ["ocr"]}
+        self.tiempos_carga = {}
+        self.estado_carga_lbl = QLabel()
+        self.statusBar().addPermanentWidget(self.estado_carga_lbl)
+        self.estado_carga.connect(self.actualizar_estado_carga)
+        self.actualizar_estado_carga(None, None, 0.0)
+
+        # Conexión a la base de datos del hilo de la GUI (compartida por ambas pestañas)
+        self.db_connection = conectar()
 
         # Crear el widget de pestañas
         self.tabs = QTabWidget()
         self.setCentralWidget(self.tabs)
 
+        # Servidor de inferencia compartido: un dueño por modelo, llamadas agrupadas en batches.
+        # Vuelve de inmediato; los modelos se cargan y calientan en sus propios hilos.
+        self.servidor_inferencia = ServidorInferencia(on_estado=self.estado_carga.emit)
+
+        # Registro histórico de accesos, escrito en lotes por su propio hilo
+        self.escritor_eventos = EscritorEventos()
+        self.escritor_eventos.start()
+        registro.medidor("escritor_eventos_cola", self.escritor_eventos.cola.qsize)
+        registro.medidor("inferencia", self.servidor_inferencia.estadisticas)
+
+        # Patentes autorizadas en memoria (se recarga sola cuando cambia la tabla usuarios)
+        self.indice_autorizacion = IndiceAutorizacion()
+
         # Crear e instanciar las pestañas
-        self.access_tab = AccessControlTab(self.db_connection)
-        self.status_tab = ParkingStatusTab(self.db_connection)
+        self.access_tab = AccessControlTab(self.db_connection, servidor=self.servidor_inferencia,
+                                           escritor_eventos=self.escritor_eventos,
+                                           indice_autorizacion=self.indice_autorizacion)
+        self.status_tab = ParkingStatusTab(self.db_connection, servidor=self.servidor_inferencia)
+        self.diagnostics_tab = DiagnosticsTab()
 
         # Añadir las pestañas al widget
         self.tabs.addTab(self.access_tab, "🛂 Control de Acceso")
         self.tabs.addTab(self.status_tab, "📊 Estado del Estacionamiento")
+        self.tabs.addTab(self.diagnostics_tab, "🩺 Diagnóstico")
 
         # Conectar la señal de la pestaña de acceso al slot de la pestaña de estado
-        self.access_tab.spot_state_changed.connect(self.status_tab.refresh_from_db)
+        self.access_tab.spot_state_changed.connect(self.status_tab.apply_changes)
+
+        self.preparacion_worker = PreparacionWorker(self.access_tab.procesador, self)
+        self.preparacion_worker.estado.connect(self.actualizar_estado_carga)
+        self.preparacion_worker.start()
+
+    def actualizar_estado_carga(self, componente, estado, segundos):
+        if componente is not None:
+            self.estado_componentes[componente] = estado
+            if estado == "listo": self.tiempos_carga[componente] = segundos
+        iconos = {"listo": "✅", "error": "❌", "cargando": "⏳", "pendiente": "…"}
+        self.estado_carga_lbl.setText("Modelos: " + "  ".join(
+            f"{nombre} {iconos[e]}" for nombre, e in self.estado_componentes.items()))
+
+        if componente is not None and all(e == "listo" for e in self.estado_componentes.values()):
+            detalle = ", ".join(f"{c} {t:.1f} s" for c, t in self.tiempos_carga.items())
+            print(f"[INFO] [Arranque] Listo para la primera inferencia a los {time.perf_counter() - T_INICIO:.2f} s ({detalle}).")
+            self.statusBar().showMessage("Modelos cargados", 5000)
+
+    def report_window_shown(self):
+        print(f"[INFO] [Arranque] Ventana visible a los {time.perf_counter() - T_INICIO:.2f} s.")
 
     def closeEvent(self, event):
         """Asegurarse de cerrar todo correctamente."""
         print("[INFO] Cerrando aplicación...")
         self.access_tab.stop_video()
+        self.status_tab.stop_monitoring()
+        self.preparacion_worker.wait()
+        self.servidor_inferencia.detener()
+        self.escritor_eventos.detener()
         self.db_connection.close()
         event.accept()
 
 if __name__ == '__main__':
+    validar_modo()  # Falla al arrancar, no al primer análisis, si MONITOREO_MODO no es utilizable
     # Inicializar la base de datos antes de iniciar la app
     inicializar_base_de_datos()
     
     app = QApplication(sys.argv)
     window = SmartParkingApp()
     window.show()
+    QTimer.singleShot(0, window.report_window_shown)  # Corre con el primer ciclo del event loop, tras pintar
     sys.exit(app.exec_())
\ No newline at end of file
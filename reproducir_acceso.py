@@ -0,0 +1,138 @@
+"""
+Reproducción determinista del pipeline de acceso a partir de una grabación (ver grabacion.py).
+
+Corre la votación, el tracker, las compuertas, el cooldown, la consulta de usuarios y la reserva de
+espacios sobre las salidas grabadas de los modelos, sin video ni GPU. La reserva se hace sobre una
+copia temporal de la BD, así cada reproducción parte del mismo estado. Reporta frames por segundo,
+la latencia estimada por frame (decisión + lo que tardaron los modelos en vivo) y las confirmaciones.
+Con --esperado compara las confirmaciones contra un reporte anterior (de benchmark_acceso.py o de
+esta herramienta) y termina con código 1 si difieren: una prueba de regresión de la lógica de decisión.
+
+Uso:
+    python benchmark_acceso.py --video entrada.mp4 --grabar grabaciones/porton --salida base.json
+    python reproducir_acceso.py --grabacion grabaciones/porton --esperado base.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+from autorizacion import IndiceAutorizacion
+from base_datos import asegurar_esquema, conectar
+from benchmark_acceso import resumir
+from configuracion import DATABASE_PATH
+from grabacion import Grabacion, ProcesadorReproduccion, reproducir
+
+# Campos que deben coincidir entre dos corridas (benchmark_acceso.py no reporta el espacio)
+CAMPOS_COMPARADOS = ("frame", "patente", "tipo_vehiculo", "tipo_usuario")
+
+
+def copiar_base(db_path, destino):
+    """Copia consistente de la BD (API de backup de SQLite, segura aunque haya otro escritor)."""
+    origen = sqlite3.connect(db_path)
+    copia = sqlite3.connect(destino)
+    try:
+        origen.backup(copia)
+    finally:
+        copia.close()
+        origen.close()
+
+
+def diferencias(obtenidas, esperadas):
+    """Confirmaciones que no coinciden, comparadas en orden por CAMPOS_COMPARADOS."""
+    clave = lambda c: tuple(c.get(campo) for campo in CAMPOS_COMPARADOS)
+    diffs = []
+    for i in range(max(len(obtenidas), len(esperadas))):
+        obtenida = clave(obtenidas[i]) if i < len(obtenidas) else None
+        esperada = clave(esperadas[i]) if i < len(esperadas) else None
+        if obtenida != esperada:
+            diffs.append({"indice": i, "obtenida": obtenida, "esperada": esperada})
+    return diffs
+
+
+def ejecutar(args, db_path):
+    grabacion = Grabacion(args.grabacion)
+    indice = None if args.sin_indice_autorizacion else IndiceAutorizacion(db_path)
+    procesador = ProcesadorReproduccion(grabacion, indice_autorizacion=indice)
+    if args.sin_movimiento: procesador.motion_gating = False
+    if args.sin_calidad: procesador.calidad_ocr = False
+
+    conn = conectar(db_path)
+    inicio = time.perf_counter()
+    try:
+        confirmaciones, latencias = reproducir(procesador, conn, indice, pausa=not args.sin_pausa,
+                                               asignar_espacios=not args.sin_asignacion)
+    finally:
+        conn.close()
+    duracion = time.perf_counter() - inicio
+
+    return {
+        "grabacion": args.grabacion,
+        "video": grabacion.meta.get("video"),
+        "configuracion": {
+            "compuerta_movimiento": procesador.motion_gating,
+            "compuerta_calidad": procesador.calidad_ocr,
+            "pausa_tras_confirmacion": not args.sin_pausa,
+            "asignacion_espacios": not args.sin_asignacion,
+        },
+        "frames": len(grabacion),
+        "duracion_s": round(duracion, 3),
+        "fps": round(len(grabacion) / duracion, 1) if duracion > 0 else 0.0,
+        "tiempo_modelos_grabado_s": round(procesador.tiempo_modelos, 3),
+        "latencia_estimada": resumir(latencias),
+        "ocr_llamadas": procesador.ocr_llamadas,
+        "patentes_confirmadas": len(confirmaciones),
+        "ocr": procesador.estadisticas_ocr(),
+        "confirmaciones": confirmaciones,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reproduce una grabación del pipeline de acceso sin modelos.")
+    parser.add_argument("--grabacion", required=True, help="Directorio creado con benchmark_acceso.py --grabar")
+    parser.add_argument("--db", default=DATABASE_PATH, help="BD de usuarios y espacios (se usa una copia)")
+    parser.add_argument("--sin-movimiento", action="store_true", help="Desactiva la compuerta de movimiento")
+    parser.add_argument("--sin-calidad", action="store_true", help="Sin compuerta de calidad ni mejor toma")
+    parser.add_argument("--sin-indice-autorizacion", action="store_true",
+                        help="Consulta usuarios con SQL exacto en lugar del índice tolerante a confusiones")
+    parser.add_argument("--sin-pausa", action="store_true", help="No pausar la detección tras una confirmación")
+    parser.add_argument("--sin-asignacion", action="store_true", help="No reservar espacios en la copia de la BD")
+    parser.add_argument("--esperado", default=None, help="Reporte JSON cuyas confirmaciones deben repetirse")
+    parser.add_argument("--salida", default=None, help="Ruta del JSON de resultados (por defecto stdout)")
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp(prefix="resipark_reproduccion_")
+    try:
+        db_path = os.path.join(directorio, "reproduccion.db")
+        copiar_base(args.db, db_path)
+        asegurar_esquema(db_path)  # El índice de autorización lee versiones_tablas
+        with contextlib.redirect_stdout(sys.stderr):
+            reporte = ejecutar(args, db_path)
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    diffs = []
+    if args.esperado:
+        with open(args.esperado, encoding="utf-8") as f:
+            diffs = diferencias(reporte["confirmaciones"], json.load(f)["confirmaciones"])
+        reporte["diferencias"] = diffs
+
+    texto = json.dumps(reporte, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(texto)
+        print(f"[INFO] Resultados guardados en {args.salida}", file=sys.stderr)
+    else:
+        print(texto)
+    if diffs:
+        print(f"[ERROR] {len(diffs)} confirmaciones difieren de {args.esperado}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+import time
+from collections import Counter
+
+from configuracion import TRACKER_IOU_THRESHOLD, TRACKER_MAX_MISSES
+
+
+def iou(a, b):
+    """Intersección sobre unión de dos cajas (x1, y1, x2, y2)."""
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, ix2 - ix1) * max(0, iy2 - iy1)
+    if inter == 0: return 0.0
+    area_a = (a[2] - a[0]) * (a[3] - a[1])
+    area_b = (b[2] - b[0]) * (b[3] - b[1])
+    return inter / float(area_a + area_b - inter)
+
+
+class Track:
+    """Un vehículo seguido entre frames, con sus propios votos de OCR."""
+    def __init__(self, track_id, box, cls_id, inicio=None):
+        self.track_id = track_id
+        self.box = box
+        self.cls_id = cls_id
+        self.misses = 0
+        self.votos = Counter()
+        self.patente_confirmada = None
+        self.tomas = []          # (puntaje, roi) de la ventana de mejor toma en curso
+        self.lecturas_ocr = 0
+        self.inicio = time.perf_counter() if inicio is None else inicio
+
+    @property
+    def confirmado(self):
+        return self.patente_confirmada is not None
+
+
+class SeguidorIoU:
+    """
+    Seguidor multi-objeto liviano (solo CPU) que asocia cajas entre frames por IoU, de forma voraz.
+    Un track se elimina tras `max_misses` frames consecutivos sin detección asociada.
+    """
+    def __init__(self, iou_threshold=TRACKER_IOU_THRESHOLD, max_misses=TRACKER_MAX_MISSES, reloj=time.perf_counter):
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.reloj = reloj  # Marca el inicio de cada track (tiempo hasta confirmación)
+        self.tracks = {}
+        self._next_id = 1
+
+    def update(self, detecciones):
+        """
+        `detecciones` es una lista de (box, cls_id). Devuelve el Track asignado a cada detección,
+        en el mismo orden; las detecciones sin pareja crean un track nuevo.
+        """
+        pares = []
+        for i, (box, _) in enumerate(detecciones):
+            for track_id, track in self.tracks.items():
+                valor = iou(box, track.box)
+                if valor >= self.iou_threshold:
+                    pares.append((valor, i, track_id))
+        pares.sort(reverse=True)
+
+        asignados = [None] * len(detecciones)
+        tracks_usados = set()
+        for _, i, track_id in pares:
+            if asignados[i] is not None or track_id in tracks_usados: continue
+            track = self.tracks[track_id]
+            track.box, track.cls_id = detecciones[i]
+            track.misses = 0
+            asignados[i] = track
+            tracks_usados.add(track_id)
+
+        for track_id in list(self.tracks):
+            if track_id not in tracks_usados:
+                self.tracks[track_id].misses += 1
+                if self.tracks[track_id].misses > self.max_misses:
+                    del self.tracks[track_id]
+
+        for i, (box, cls_id) in enumerate(detecciones):
+            if asignados[i] is None:
+                track = Track(self._next_id, box, cls_id, self.reloj())
+                self.tracks[track.track_id] = track
+                self._next_id += 1
+                asignados[i] = track
+        return asignados
+
+    def reset(self):
+        self.tracks.clear()
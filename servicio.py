@@ -0,0 +1,157 @@
+"""
+Servicio sin interfaz: control de acceso y monitoreo de espacios con una API local.
+
+Corre las mismas piezas que SmartParkingApp sin Qt. El acceso usa el coordinador multi-cámara
+(un proceso por portón) y el monitoreo usa MonitorEspacios sobre un video del estacionamiento.
+Los cambios de ocupación y los accesos se publican como deltas por WebSocket; la ocupación
+completa, el registro de eventos y las métricas se consultan por HTTP (ver api_local.py).
+
+Uso:
+    python servicio.py --camara norte=rtsp://10.0.0.5/stream --monitoreo videos/estacionamiento.mp4
+    python servicio.py --monitoreo videos/estacionamiento.mp4 --puerto 8765
+"""
+import argparse
+import signal
+import threading
+import time
+
+import cv2
+
+from api_local import ServidorAPI
+from backends_modelo import cargar_modelo
+from base_datos import conectar, inicializar_base_de_datos
+from configuracion import (
+    DATABASE_PATH, CAMARAS_ACCESO, CAMARA_MONITOREO, MONITOREO_MODO,
+    MODELO_PARKING_SLOTS_PATH, MODELO_CLASIFICADOR_ESPACIOS_PATH, API_HOST, API_PUERTO
+)
+from monitoreo import MapaEspacios, MonitorEspacios, cambios_a_delta, detectar_espacios, muestrear_video, validar_modo
+from multicamara import CoordinadorMulticamara, parse_camaras
+
+
+class HiloMonitoreo(threading.Thread):
+    """Monitoreo continuo de un video; publica en el bus solo los espacios cuyo estado cambia."""
+    def __init__(self, fuente, bus, db_path=DATABASE_PATH):
+        super().__init__(name="monitoreo", daemon=True)
+        self.fuente = fuente
+        self.bus = bus
+        self.db_path = db_path
+        self.detenido = threading.Event()
+        self.monitor = None
+
+    def run(self):
+        cap = cv2.VideoCapture(self.fuente)
+        if not cap.isOpened():
+            print(f"[ERROR] [Servicio] No se pudo abrir la fuente de monitoreo: {self.fuente}")
+            return
+        conn = conectar(self.db_path)
+        detector = cargar_modelo(MODELO_PARKING_SLOTS_PATH)
+        modelo = detector
+        if MONITOREO_MODO == "recortes":
+            modelo = cargar_modelo(MODELO_CLASIFICADOR_ESPACIOS_PATH)
+
+        # Sin geometría guardada, el primer frame de la fuente sirve de calibración
+        mapa = MapaEspacios.cargar(conn, CAMARA_MONITOREO)
+        if mapa is None:
+            ret, frame = cap.read()
+            cajas = [caja for caja, _ in detectar_espacios(detector, frame)] if ret else []
+            if not cajas:
+                print("[ERROR] [Servicio] No se pudieron calibrar los espacios con el primer frame.")
+                cap.release(); conn.close()
+                return
+            mapa = MapaEspacios.desde_detecciones(CAMARA_MONITOREO, cajas)
+            mapa.guardar(conn)
+            print(f"[INFO] [Servicio] Calibrados {len(mapa)} espacios para la cámara '{CAMARA_MONITOREO}'.")
+
+        self.monitor = MonitorEspacios(mapa, modelo, conn)
+        for frame in muestrear_video(cap, self.detenido.is_set):
+            cambios = self.monitor.procesar(frame)
+            if cambios:
+                self.bus.publicar("espacios", cambios_a_delta(cambios))
+        cap.release()
+        conn.close()
+
+    def metricas(self):
+        if self.monitor is None: return {"activo": False}
+        return {"activo": self.is_alive(), "muestras": self.monitor.muestras, "escrituras": self.monitor.escrituras}
+
+    def detener(self):
+        self.detenido.set()
+        self.join(timeout=5)
+
+
+class HiloAcceso(threading.Thread):
+    """Corre el coordinador multi-cámara y publica cada acceso y la reserva de espacio resultante."""
+    def __init__(self, camaras, bus, db_path=DATABASE_PATH):
+        super().__init__(name="acceso", daemon=True)
+        self.bus = bus
+        self.coordinador = CoordinadorMulticamara(camaras, db_path, tiempo_real=True)
+        self.ingresos = 0
+
+    def run(self):
+        self.coordinador.iniciar()
+        self.coordinador.ejecutar(on_ingreso=self.publicar)
+
+    def publicar(self, ingreso):
+        self.ingresos += 1
+        self.bus.publicar("acceso", ingreso)
+        if ingreso["espacio"]:
+            self.bus.publicar("espacios", {ingreso["espacio"]: {
+                "estado": "Reservado", "patente_ocupante": ingreso["patente"], "hora_ingreso": ingreso["hora"]}})
+
+    def metricas(self):
+        escritor = getattr(self.coordinador, "escritor_eventos", None)
+        return {"activo": self.is_alive(), "camaras": len(self.coordinador.camaras), "ingresos": self.ingresos,
+                "eventos_escritos": escritor.escritos if escritor else 0,
+                "camaras_terminadas": self.coordinador.estadisticas}
+
+    def detener(self):
+        self.coordinador.detener()
+        self.join(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ResiPark sin interfaz, con API HTTP/WebSocket local.")
+    parser.add_argument("--camara", action="append", default=[], metavar="ID=FUENTE",
+                        help="Cámara de acceso (repetible). Por defecto se usa CAMARAS_ACCESO.")
+    parser.add_argument("--monitoreo", default=None, help="Video o URL de la cámara del estacionamiento")
+    parser.add_argument("--db", default=DATABASE_PATH)
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--puerto", type=int, default=API_PUERTO)
+    args = parser.parse_args()
+
+    camaras = parse_camaras(args.camara) if args.camara else CAMARAS_ACCESO
+    if not camaras and not args.monitoreo:
+        parser.error("Nada que ejecutar: use --camara y/o --monitoreo")
+    if args.monitoreo:
+        try:
+            validar_modo()
+        except ValueError as e:
+            parser.error(str(e))
+
+    inicializar_base_de_datos(args.db)
+    inicio = time.perf_counter()
+    api = ServidorAPI(args.host, args.puerto, args.db)
+    hilos = []
+    if camaras: hilos.append(HiloAcceso(camaras, api.bus, args.db))
+    if args.monitoreo: hilos.append(HiloMonitoreo(args.monitoreo, api.bus, args.db))
+    for hilo in hilos:
+        api.fuentes_metricas[hilo.name] = hilo.metricas
+    api.fuentes_metricas["servicio"] = lambda: {"uptime_s": round(time.perf_counter() - inicio, 1)}
+
+    api.iniciar()
+    for hilo in hilos: hilo.start()
+    print(f"[INFO] [Servicio] API en {api.direccion} (/ocupacion, /eventos, /metricas, /ws)")
+
+    parada = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: parada.set())
+    signal.signal(signal.SIGTERM, lambda *_: parada.set())
+    while not parada.is_set() and any(h.is_alive() for h in hilos):
+        parada.wait(1.0)
+
+    print("[INFO] [Servicio] Deteniendo...")
+    for hilo in hilos: hilo.detener()
+    api.detener()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from backends_modelo import cargar_modelo
+from configuracion import (
+    MODELO_VEHICULOS_PATH, MODELO_PLACAS_PATH, MODELO_PARKING_SLOTS_PATH,
+    INFERENCE_MAX_BATCH, INFERENCE_MAX_WAIT_MS, INFERENCE_TIMEOUT_S, VEHICLE_INFER_SIZE, PLATE_BATCH_IMGSZ
+)
+
+MODELOS_SERVIDOR = {
+    "vehiculos": MODELO_VEHICULOS_PATH,
+    "placas": MODELO_PLACAS_PATH,
+    "parking": MODELO_PARKING_SLOTS_PATH,
+}
+# Tamaño de la inferencia de calentamiento de cada modelo (el mismo con que se usará después)
+CALENTAMIENTO_IMGSZ = {"vehiculos": VEHICLE_INFER_SIZE, "placas": PLATE_BATCH_IMGSZ}
+
+
+def _clave_kwargs(kwargs):
+    """Clave hashable de los parámetros de inferencia: solo se agrupan solicitudes con la misma."""
+    return tuple(sorted((k, tuple(v) if isinstance(v, list) else v) for k, v in kwargs.items()))
+
+
+class _Solicitud:
+    __slots__ = ("imagen", "kwargs", "clave", "future")
+
+    def __init__(self, imagen, kwargs):
+        self.imagen = imagen
+        self.kwargs = kwargs
+        self.clave = _clave_kwargs(kwargs)
+        self.future = Future()
+
+
+class _TrabajadorModelo(threading.Thread):
+    """
+    Hilo dueño de un modelo. Primero lo carga y lo calienta con una inferencia de prueba;
+    luego junta solicitudes hasta `max_batch` o hasta que vence `max_wait_ms` desde la
+    primera, y las resuelve con una sola llamada al modelo.
+    """
+    def __init__(self, nombre, ruta, max_batch, max_wait_ms, on_estado=None):
+        super().__init__(name=f"inferencia-{nombre}", daemon=True)
+        self.nombre = nombre
+        self.ruta = ruta
+        self.modelo = None
+        self.error = None
+        self.listo = threading.Event()
+        self.tiempo_carga_s = None
+        self.on_estado = on_estado
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.cola = queue.Queue()
+        self.lotes = 0
+        self.solicitudes = 0
+        self._pendientes = []  # Solicitudes con otros parámetros, para el próximo lote
+        self.detenido = False
+        self._lock = threading.Lock()
+
+    def encolar(self, solicitud):
+        with self._lock:
+            if self.detenido:
+                solicitud.future.set_exception(RuntimeError(f"Servidor de inferencia detenido ('{self.nombre}')"))
+            else:
+                self.cola.put(solicitud)
+
+    def detener(self):
+        # Bajo el lock: ninguna solicitud se encola detrás del centinela
+        with self._lock:
+            self.detenido = True
+            self.cola.put(None)
+
+    def _cargar(self):
+        t0 = time.perf_counter()
+        if self.on_estado: self.on_estado(self.nombre, "cargando", 0.0)
+        try:
+            self.modelo = cargar_modelo(self.ruta)
+            lado = CALENTAMIENTO_IMGSZ.get(self.nombre, 640)
+            self.modelo(np.zeros((lado, lado, 3), dtype=np.uint8), imgsz=lado, verbose=False)
+        except Exception as e:
+            print(f"[ERROR] [Inferencia] No se pudo cargar el modelo '{self.nombre}': {e}")
+            self.error = e
+        self.tiempo_carga_s = time.perf_counter() - t0
+        self.listo.set()
+        if self.on_estado: self.on_estado(self.nombre, "error" if self.error else "listo", self.tiempo_carga_s)
+
+    def run(self):
+        self._cargar()
+        while True:
+            primera = self._pendientes.pop(0) if self._pendientes else self.cola.get()
+            if primera is None: break
+
+            lote = [primera] + [s for s in self._pendientes if s.clave == primera.clave][:self.max_batch - 1]
+            self._pendientes = [s for s in self._pendientes if s not in lote]
+            limite = time.perf_counter() + self.max_wait
+            detener = False
+            while len(lote) < self.max_batch:
+                restante = limite - time.perf_counter()
+                if restante <= 0: break
+                try:
+                    solicitud = self.cola.get(timeout=restante)
+                except queue.Empty:
+                    break
+                if solicitud is None:
+                    detener = True
+                    break
+                if solicitud.clave == primera.clave: lote.append(solicitud)
+                else: self._pendientes.append(solicitud)
+
+            self._ejecutar(lote)
+            if detener: break
+
+        # Lo que quedó sin ejecutar se resuelve con error: ningún productor queda esperando
+        restantes = self._pendientes
+        while True:
+            try:
+                restantes.append(self.cola.get_nowait())
+            except queue.Empty:
+                break
+        error = RuntimeError(f"Servidor de inferencia detenido ('{self.nombre}')")
+        for solicitud in restantes:
+            if solicitud is not None and not solicitud.future.done(): solicitud.future.set_exception(error)
+        self._pendientes = []
+
+    def _ejecutar(self, lote):
+        try:
+            if self.error: raise self.error
+            resultados = self.modelo([s.imagen for s in lote], **lote[0].kwargs)
+            for solicitud, resultado in zip(lote, resultados):
+                solicitud.future.set_result(resultado)
+        except Exception as e:
+            for solicitud in lote:
+                if not solicitud.future.done(): solicitud.future.set_exception(e)
+        self.lotes += 1
+        self.solicitudes += len(lote)
+
+
+class ModeloCompartido:
+    """
+    Reemplazo directo de un objeto YOLO: `modelo(img_o_lista, **kwargs)` devuelve la lista de Results,
+    pero cada imagen se envía al servidor para que se agrupe con las de otros productores.
+    El resto de atributos (p. ej. `.names`) se delegan al YOLO original, esperando a que esté cargado.
+    """
+    def __init__(self, servidor, nombre):
+        self._servidor = servidor
+        self._nombre = nombre
+
+    def __call__(self, source, **kwargs):
+        imagenes = source if isinstance(source, list) else [source]
+        futures = [self._servidor.enviar(self._nombre, img, **kwargs) for img in imagenes]
+        return [f.result(timeout=INFERENCE_TIMEOUT_S) for f in futures]
+
+    def __getattr__(self, attr):
+        return getattr(self._servidor.esperar_modelo(self._nombre), attr)
+
+
+class ServidorInferencia:
+    """
+    Servicio de inferencia en proceso para los tres modelos YOLO.
+    Todas las pestañas y cámaras envían imágenes aquí y reciben futures; cada modelo
+    tiene un hilo que las agrupa en batches dentro de un presupuesto de latencia.
+    El constructor vuelve de inmediato: cada hilo carga y calienta su modelo en segundo plano,
+    y las solicitudes enviadas antes esperan en su cola. `on_estado(nombre, estado, segundos)`
+    informa "cargando" / "listo" / "error" desde esos hilos.
+    """
+    def __init__(self, rutas=None, max_batch=INFERENCE_MAX_BATCH, max_wait_ms=INFERENCE_MAX_WAIT_MS, on_estado=None):
+        rutas = rutas or MODELOS_SERVIDOR
+        self._trabajadores = {}
+        for nombre, ruta in rutas.items():
+            print(f"[INFO] [Inferencia] Cargando modelo '{nombre}' desde {ruta} en segundo plano...")
+            lote_max = max_batch[nombre] if isinstance(max_batch, dict) else max_batch
+            espera = max_wait_ms[nombre] if isinstance(max_wait_ms, dict) else max_wait_ms
+            trabajador = _TrabajadorModelo(nombre, ruta, lote_max, espera, on_estado)
+            trabajador.start()
+            self._trabajadores[nombre] = trabajador
+
+    def enviar(self, nombre, imagen, **kwargs):
+        """Encola una imagen para el modelo `nombre` y devuelve un Future con su Results."""
+        solicitud = _Solicitud(imagen, kwargs)
+        self._trabajadores[nombre].encolar(solicitud)  # Tras detener(), el future ya viene con error
+        return solicitud.future
+
+    def modelo(self, nombre):
+        return ModeloCompartido(self, nombre)
+
+    def esperar_modelo(self, nombre, timeout=None):
+        """Bloquea hasta que el modelo esté cargado y calentado, y lo devuelve."""
+        trabajador = self._trabajadores[nombre]
+        trabajador.listo.wait(timeout)
+        if trabajador.error: raise trabajador.error
+        return trabajador.modelo
+
+    def tiempos_carga(self):
+        """Segundos de carga + calentamiento por modelo (None si aún no termina)."""
+        return {nombre: t.tiempo_carga_s for nombre, t in self._trabajadores.items()}
+
+    def estadisticas(self):
+        """Tamaño medio de batch por modelo, para ajustar INFERENCE_MAX_BATCH / INFERENCE_MAX_WAIT_MS."""
+        return {nombre: {"lotes": t.lotes, "solicitudes": t.solicitudes, "cola": t.cola.qsize(),
+                         "batch_medio": t.solicitudes / t.lotes if t.lotes else 0.0}
+                for nombre, t in self._trabajadores.items()}
+
+    def detener(self):
+        for trabajador in self._trabajadores.values():
+            trabajador.detener()
+        for trabajador in self._trabajadores.values():
+            trabajador.join(timeout=5)